@@ -0,0 +1,9 @@
+"""
+benchmarks for mdfminer on synthetic mdf files
+
+python -m benchmarks --channels 50 --records 1000000 -o results.json
+"""
+from .generate import generate_mdf
+from .run import run_benchmarks
+
+__all__ = ["generate_mdf","run_benchmarks"]
@@ -0,0 +1,225 @@
+# generate.py
+# (C) 2017 Patrick Menschel
+
+
+import datetime
+
+import numpy as np
+
+from mdfminer.mdf import (_build_id_block,
+                          _build_hd_block,
+                          _build_tx_block,
+                          _build_dg_block,
+                          _build_cg_block,
+                          _build_cn_block,
+                          _build_cc_block,
+                          DEFAULT_CHUNK_SIZE,
+                          SIGNAL_DATA_TYPES,
+                          )
+
+
+DTYPES = {"uint8":(0,8),
+          "uint16":(0,16),
+          "uint32":(0,32),
+          "uint64":(0,64),
+          "int8":(1,8),
+          "int16":(1,16),
+          "int32":(1,32),
+          "int64":(1,64),
+          "float32":(2,32),
+          "float64":(3,64),
+          "uint16be":(9,16),
+          "int32be":(10,32),
+          "uint64be":(9,64),
+          "float32be":(11,32),
+          "float64be":(12,64),
+          "uint16le":(13,16),
+          "int32le":(14,32),
+          "int64le":(14,64),
+          "float32le":(15,32),
+          "float64le":(16,64),
+          "bytes8":(8,64),
+          }#name: (signal data type, number of bits), the types with be or le suffix have an explicit byte order
+
+PACKED_BITS = {8:5,16:12,32:27}#number of bits of integer channels with bit packing
+
+CONVERSIONS = ["none","identity","linear","text_table"]
+
+TEXT_TABLE = {0.0:"off",1.0:"on",2.0:"error",3.0:"not available"}
+
+
+def _channel_layout(group_idx,number_of_channels,dtypes,conversions,bit_packing):
+    """
+    calculates the channels of one channel group
+    @param group_idx: the index of the data group, used for unique channel names
+    @param number_of_channels: the number of data channels
+    @param dtypes: the data type names, used round robin
+    @param conversions: the conversion names, used round robin
+    @param bit_packing: True to pack integer channels without byte alignment
+    @return: a tuple (list of channel dictionaries, record size)
+    """
+    chs = [{"short_name":"time","channel_type":"time","signal_data_type":3,"number_of_bits":64,"bit_offset":0,"conversion":"none"},]
+    bit = 64
+    for idx in range(number_of_channels):
+        dtype = dtypes[idx%len(dtypes)]
+        signal_data_type,number_of_bits = DTYPES[dtype]
+        conversion = conversions[idx%len(conversions)]
+        kind = SIGNAL_DATA_TYPES[signal_data_type][0]
+        if kind == "V":
+            conversion = "none"
+        elif conversion == "text_table" and kind not in "ui":
+            conversion = "linear"
+        if bit_packing and signal_data_type in [0,1] and number_of_bits in PACKED_BITS:
+            number_of_bits = PACKED_BITS[number_of_bits]
+        else:
+            bit = ((bit+7)//8)*8
+        chs.append({"short_name":"s{0:02d}_{1:05d}".format(group_idx,idx),
+                    "channel_type":"data",
+                    "signal_data_type":signal_data_type,
+                    "number_of_bits":number_of_bits,
+                    "bit_offset":bit,
+                    "conversion":conversion,
+                    })
+        bit += number_of_bits
+    return (chs,(bit+7)//8)
+
+
+def _channel_values(ch,timestamps,rng):
+    """
+    @return: the raw values of a channel for the given timestamps
+    """
+    num = len(timestamps)
+    signal_data_type = ch["signal_data_type"]
+    number_of_bits = ch["number_of_bits"]
+    if ch["channel_type"] == "time":
+        return timestamps
+    if ch["conversion"] == "text_table":
+        return rng.integers(0,len(TEXT_TABLE),num)
+    kind = SIGNAL_DATA_TYPES[signal_data_type][0]
+    if kind in "uV":
+        return rng.integers(0,2**min(number_of_bits,63),num,dtype=np.uint64)
+    if kind == "i":
+        return rng.integers(-(2**(number_of_bits-1)),2**(number_of_bits-1),num,dtype=np.int64)
+    return (100*np.sin(timestamps))+rng.normal(size=num)
+
+
+def _encode_records(chs,rec_size,timestamps,rng,bord):
+    """
+    @return: the bytes of the records for the given timestamps
+    """
+    num = len(timestamps)
+    recs = np.zeros((num,rec_size),dtype=np.uint8)
+    for ch in chs:
+        vals = _channel_values(ch=ch,timestamps=timestamps,rng=rng)
+        signal_data_type = ch["signal_data_type"]
+        number_of_bits = ch["number_of_bits"]
+        bit_offset = ch["bit_offset"]
+        first = bit_offset//8
+        if bit_offset%8 or number_of_bits%8:
+            #bit packed integer, intel bit order
+            raw = vals.astype(np.int64).astype(np.uint64) & np.uint64((1 << number_of_bits)-1)
+            raw = raw << np.uint64(bit_offset%8)
+            for idx in range(((bit_offset%8)+number_of_bits+7)//8):
+                recs[:,first+idx] |= ((raw >> np.uint64(8*idx)) & np.uint64(0xFF)).astype(np.uint8)
+            continue
+        width = number_of_bits//8
+        fmt,order = SIGNAL_DATA_TYPES[signal_data_type]
+        if fmt == "V":
+            fmt = "u"
+        if (order or bord) == 'little':
+            fmtprefix = '<'
+        else:
+            fmtprefix = '>'
+        recs[:,first:first+width] = vals.astype("{0}{1}{2}".format(fmtprefix,fmt,width)).view(np.uint8).reshape(num,width)
+    return recs.tobytes()
+
+
+def _conversion_block(conversion,bord):
+    if conversion == "identity":
+        return _build_cc_block(65535,bord=bord)
+    if conversion == "linear":
+        return _build_cc_block(0,parameters=(-10.0,0.5),physical_unit="Nm",bord=bord)
+    if conversion == "text_table":
+        return _build_cc_block(11,parameters=TEXT_TABLE,bord=bord)
+    return None
+
+
+def generate_mdf(fname,number_of_channels=10,dtypes=["uint16","int32","float64"],byte_order='little',bit_packing=False,
+                 conversions=["none","linear"],rasters=[0.01,],number_of_records=100000,size=None,seed=0,
+                 timestamp=datetime.datetime(2017,1,1),chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    writes a synthetic sorted version 3.3 mdf file
+    @param fname: path to the new file
+    @param number_of_channels: the number of data channels per channel group
+    @param dtypes: the data type names of the channels, used round robin, see DTYPES
+    @param byte_order: 'little' or 'big'
+    @param bit_packing: True to pack integer channels without byte alignment, only for little endian
+    @param conversions: the conversion names of the channels, used round robin, see CONVERSIONS
+    @param rasters: one data group is written per raster, the raster is the time step in seconds
+    @param number_of_records: the number of records of the first raster
+    @param size: alternatively the approximate size of the data blocks in bytes
+    @param seed: the seed of the random values
+    @param timestamp: the start of the measurement
+    @param chunk_size: the number of records encoded at once
+    @return: a dictionary with the file layout, e.g. number of records and record size per group
+    """
+    if bit_packing and byte_order != 'little':
+        raise ValueError("Bit packing is only supported for little endian files")
+    groups = []
+    for group_idx,raster in enumerate(rasters):
+        chs,rec_size = _channel_layout(group_idx=group_idx,number_of_channels=number_of_channels,dtypes=dtypes,
+                                       conversions=conversions,bit_packing=bit_packing)
+        groups.append({"raster":raster,"channels":chs,"record_size":rec_size})
+    if size is not None:
+        bytes_per_record = sum([group["record_size"]*rasters[0]/group["raster"] for group in groups])
+        number_of_records = max(int(size/bytes_per_record),1)
+    for group in groups:
+        group.update({"number_of_records":max(int(number_of_records*rasters[0]/group["raster"]),1)})
+
+    rng = np.random.default_rng(seed)
+    with open(fname,'wb') as f:
+        f.write(_build_id_block(bord=byte_order))
+        hd_ptr = f.tell()
+        f.write(bytes(208))
+        for group_idx,group in enumerate(groups):
+            cn_ptr = 0
+            for ch in reversed(group["channels"]):
+                cc_ptr = 0
+                cc = _conversion_block(ch["conversion"],bord=byte_order)
+                if cc:
+                    cc_ptr = f.tell()
+                    f.write(cc)
+                ptr = f.tell()
+                f.write(_build_cn_block(cn_ptr,cc_ptr,0,ch["channel_type"],ch["short_name"],ch["bit_offset"],ch["number_of_bits"],
+                                        ch["signal_data_type"],sampling_rate=group["raster"],bord=byte_order))
+                cn_ptr = ptr
+            ct_ptr = f.tell()
+            f.write(_build_tx_block("raster {0}s".format(group["raster"]),bord=byte_order))
+            cg_ptr = f.tell()
+            f.write(_build_cg_block(0,cn_ptr,ct_ptr,0,len(group["channels"]),group["record_size"],group["number_of_records"],bord=byte_order))
+            group.update({"dg_ptr":f.tell(),"cg_ptr":cg_ptr})
+            f.write(bytes(28))
+        for group in groups:
+            group.update({"data_block_ptr":f.tell()})
+            for rec_idx in range(0,group["number_of_records"],chunk_size):
+                num = min(chunk_size,group["number_of_records"]-rec_idx)
+                timestamps = np.arange(rec_idx,rec_idx+num)*group["raster"]
+                f.write(_encode_records(chs=group["channels"],rec_size=group["record_size"],timestamps=timestamps,rng=rng,bord=byte_order))
+        for group_idx,group in enumerate(groups):
+            ndg_ptr = 0
+            if group_idx+1 < len(groups):
+                ndg_ptr = groups[group_idx+1]["dg_ptr"]
+            f.seek(group["dg_ptr"])
+            f.write(_build_dg_block(ndg_ptr,group["cg_ptr"],0,group["data_block_ptr"],bord=byte_order))
+        f.seek(hd_ptr)
+        f.write(_build_hd_block(groups[0]["dg_ptr"],0,0,len(groups),timestamp,author="mdfminer",organisation="benchmarks",
+                                subject="synthetic",bord=byte_order))
+        f.seek(0,2)
+        file_size = f.tell()
+    return {"file_size":file_size,
+            "groups":[{"raster":group["raster"],
+                       "number_of_channels":len(group["channels"]),
+                       "record_size":group["record_size"],
+                       "number_of_records":group["number_of_records"],
+                       } for group in groups],
+            }
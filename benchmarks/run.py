@@ -0,0 +1,249 @@
+# run.py
+# (C) 2017 Patrick Menschel
+
+
+import os
+import gc
+import sys
+import json
+import time
+import platform
+import tempfile
+import tracemalloc
+import argparse
+import importlib.util
+import concurrent.futures
+
+import numpy as np
+
+import mdfminer
+
+from .generate import generate_mdf, DTYPES, CONVERSIONS
+
+
+BENCHMARKS = ["open","records","columns","projection","export_csv","export_xlsx","concurrent"]
+
+XLSX_MAX_RECORDS = 1000000#xlsx sheets end at 1048576 rows
+
+CONCURRENT_WINDOWS = 16#record ranges per data group shared out to the threads of the concurrent benchmark
+
+
+def _get_version():
+    try:
+        from importlib.metadata import version
+        return version("mdfminer")
+    except Exception:
+        return "unknown"
+
+
+def _measure(name,func,trace_memory=True):
+    """
+    runs one benchmark
+    @param name: the name of the benchmark
+    @param func: a function that returns a tuple (number of records, number of bytes) it processed
+    @param trace_memory: record the peak of the python heap, slows down python heavy benchmarks
+    @return: a dictionary with the results
+    """
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    strt = time.perf_counter()
+    records,nbytes = func()
+    elapsed = time.perf_counter()-strt
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {"name":name,
+            "seconds":elapsed,
+            "records":records,
+            "bytes":nbytes,
+            "records_per_second":records/elapsed if elapsed else None,
+            "mb_per_second":nbytes/elapsed/1e6 if elapsed else None,
+            "peak_memory_bytes":peak,
+            }
+
+
+def _get_thread_counts(threads):
+    """
+    @return: the thread counts 1, 2, 4, ... up to and including threads
+    """
+    counts = []
+    num = 1
+    while num < threads:
+        counts.append(num)
+        num *= 2
+    counts.append(max(threads,1))
+    return counts
+
+
+def run_benchmarks(fname,benchmarks=BENCHMARKS,trace_memory=True,workdir=None,threads=None):
+    """
+    times the main code paths of mdfminer on a file
+    @param fname: path to the mdf file
+    @param benchmarks: the names of the benchmarks to run, see BENCHMARKS
+    @param trace_memory: record the peak of the python heap of each benchmark
+    @param workdir: directory for exported files, None for a temporary directory
+    @param threads: the maximum number of threads of the concurrent benchmark, None for the number of cpus
+    @return: a list of result dictionaries
+    @note: the column cache is disabled so repeated runs decode from the file,
+           the concurrent benchmark reads all data groups in CONCURRENT_WINDOWS record ranges each
+           from one mdf object with 1, 2, 4, ... threads and reports the speedup over one thread
+    """
+    if threads is None:
+        threads = os.cpu_count() or 1
+    cache = mdfminer.get_column_cache()
+    byte_budget = cache.byte_budget
+    cache.set_byte_budget(0)
+    results = []
+    m = mdfminer.mdf(fname=fname)
+    dgs = [dg for dg in m.hdblock.get_data_groups() if dg.get_channel_groups()]
+    first_cg = dgs[0].get_channel_groups()[0]
+
+    def bench_open():
+        mdfminer.mdf(fname=fname)
+        return (0,os.path.getsize(fname))
+
+    def bench_records():
+        count = 0
+        for rec in m.get_records_with_timestamp():
+            count += 1
+        return (count,count*first_cg.get_record_size())
+
+    def bench_columns():
+        count = 0
+        nbytes = 0
+        for dg in dgs:
+            cg = dg.get_channel_groups()[0]
+            for t,vals in dg.iter_columns(fname=fname):
+                count += len(t)
+            nbytes += cg.get_number_of_records()*cg.get_record_size()
+        return (count,nbytes)
+
+    def bench_projection():
+        names = dgs[0].get_channel_short_names()[:2]
+        cols = m.get_columns(short_names=names)
+        count = len(cols[names[0]][0])
+        return (count,count*first_cg.get_record_size())
+
+    tmpdir = None
+    if workdir is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        workdir = tmpdir.name
+
+    def bench_export_csv():
+        mdfminer.to_csv_file(m,os.path.join(workdir,"export.csv"))
+        count = first_cg.get_number_of_records()
+        return (count,count*first_cg.get_record_size())
+
+    def bench_export_xlsx():
+        mdfminer.to_xlsx_file(m,os.path.join(workdir,"export.xlsx"))
+        count = first_cg.get_number_of_records()
+        return (count,count*first_cg.get_record_size())
+
+    windows = []
+    for dg in dgs:
+        num_recs = dg.get_channel_groups()[0].get_number_of_records()
+        step = max(-(-num_recs//CONCURRENT_WINDOWS),1)
+        windows.extend([(dg,strt,min(strt+step,num_recs)) for strt in range(0,num_recs,step)])
+
+    def read_window(window):
+        dg,strt,stp = window
+        count = 0
+        for t,vals in dg.iter_columns(fname=fname,start=strt,stop=stp):
+            count += len(t)
+        return count*dg.get_channel_groups()[0].get_record_size()
+
+    def bench_concurrent(num_threads):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
+            nbytes = sum(executor.map(read_window,windows))
+        return (sum([stp-strt for dg,strt,stp in windows]),nbytes)
+
+    funcs = {"open":bench_open,
+             "records":bench_records,
+             "columns":bench_columns,
+             "projection":bench_projection,
+             "export_csv":bench_export_csv,
+             "export_xlsx":bench_export_xlsx,
+             }
+    try:
+        for name in benchmarks:
+            if name == "export_xlsx":
+                if importlib.util.find_spec("openpyxl") is None:
+                    results.append({"name":name,"skipped":"openpyxl not installed"})
+                    continue
+                if first_cg.get_number_of_records() > XLSX_MAX_RECORDS:
+                    results.append({"name":name,"skipped":"too many records for xlsx"})
+                    continue
+            if name == "concurrent":
+                single = None
+                for num_threads in _get_thread_counts(threads):
+                    result = _measure(name=name,func=lambda: bench_concurrent(num_threads),trace_memory=trace_memory)
+                    if single is None:
+                        single = result["seconds"]
+                    result.update({"threads":num_threads,
+                                   "speedup":single/result["seconds"] if result["seconds"] else None})
+                    results.append(result)
+                continue
+            results.append(_measure(name=name,func=funcs[name],trace_memory=trace_memory))
+    finally:
+        cache.set_byte_budget(byte_budget)
+        if tmpdir is not None:
+            tmpdir.cleanup()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="mdfminer benchmarks on synthetic mdf files")
+    parser.add_argument("-f","--file",dest="fname",default=None,
+                        help="benchmark an existing FILE instead of generating one",metavar="FILE")
+    parser.add_argument("--channels",type=int,default=10,help="number of data channels per channel group")
+    parser.add_argument("--dtypes",default="uint16,int32,float64",help="comma separated data types of {0}".format(",".join(DTYPES)))
+    parser.add_argument("--byte-order",default="little",choices=["little","big"])
+    parser.add_argument("--bit-packing",action="store_true",help="pack integer channels without byte alignment")
+    parser.add_argument("--conversions",default="none,linear",help="comma separated conversions of {0}".format(",".join(CONVERSIONS)))
+    parser.add_argument("--rasters",default="0.01",help="comma separated rasters in seconds, one data group per raster")
+    parser.add_argument("--records",type=int,default=100000,help="number of records of the first raster")
+    parser.add_argument("--size-mb",type=float,default=None,help="approximate size of the data instead of --records")
+    parser.add_argument("--benchmarks",default=",".join(BENCHMARKS),help="comma separated benchmarks of {0}".format(",".join(BENCHMARKS)))
+    parser.add_argument("--threads",type=int,default=None,help="maximum number of threads of the concurrent benchmark, default the number of cpus")
+    parser.add_argument("--no-memory",action="store_true",help="do not trace the peak memory")
+    parser.add_argument("-o","--output",default=None,help="write the json report to OUTPUT instead of stdout",metavar="OUTPUT")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fname = args.fname
+        layout = None
+        generate_seconds = None
+        if fname is None:
+            fname = os.path.join(tmpdir,"synthetic.mdf")
+            size = None
+            if args.size_mb is not None:
+                size = args.size_mb*1e6
+            strt = time.perf_counter()
+            layout = generate_mdf(fname=fname,number_of_channels=args.channels,dtypes=args.dtypes.split(","),
+                                  byte_order=args.byte_order,bit_packing=args.bit_packing,
+                                  conversions=args.conversions.split(","),
+                                  rasters=[float(raster) for raster in args.rasters.split(",")],
+                                  number_of_records=args.records,size=size)
+            generate_seconds = time.perf_counter()-strt
+        results = run_benchmarks(fname=fname,benchmarks=args.benchmarks.split(","),trace_memory=not args.no_memory,workdir=tmpdir,
+                                 threads=args.threads)
+        report = {"mdfminer_version":_get_version(),
+                  "python_version":platform.python_version(),
+                  "numpy_version":np.__version__,
+                  "platform":platform.platform(),
+                  "file":{"name":args.fname,
+                          "size":os.path.getsize(fname),
+                          "layout":layout,
+                          "generate_seconds":generate_seconds,
+                          },
+                  "results":results,
+                  }
+    text = json.dumps(report,indent=2)
+    if args.output:
+        with open(args.output,'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text+"\n")
+    return 0
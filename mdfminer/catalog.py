@@ -0,0 +1,288 @@
+# catalog.py
+# (C) 2017 Patrick Menschel
+
+
+import os
+import sqlite3
+import datetime
+
+from .mdf import mdf
+
+
+MDF_SUFFIXES = [".mdf",".dat",".mf4"]#suffixes of mdf files, optionally followed by a compression suffix
+COMPRESSION_SUFFIXES = ["",".gz",".xz",".bz2",".zst"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    version REAL,
+    timestamp TEXT,
+    start_time REAL,
+    end_time REAL,
+    duration REAL,
+    author TEXT,
+    organisation TEXT,
+    subject TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS channels (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    short_name TEXT NOT NULL,
+    description TEXT,
+    unit TEXT,
+    raster REAL,
+    data_group INTEGER,
+    channel_group INTEGER,
+    signal_data_type INTEGER,
+    number_of_bits INTEGER,
+    number_of_records INTEGER
+);
+CREATE INDEX IF NOT EXISTS channels_short_name ON channels (short_name);
+CREATE INDEX IF NOT EXISTS channels_file_id ON channels (file_id);
+CREATE INDEX IF NOT EXISTS files_start_time ON files (start_time);
+"""
+
+_EPOCH = datetime.datetime(1970,1,1)
+
+
+def _to_seconds(dt):
+    """
+    @return: seconds since 1970 of a naive datetime, the header timestamps have no time zone
+    """
+    return (dt-_EPOCH).total_seconds()
+
+
+def _name_condition(short_name):
+    """
+    @return: the sql condition for a short name, exact matches use the index, glob patterns with * ? [ are allowed
+    """
+    if any(c in short_name for c in "*?["):
+        return "channels.short_name GLOB ?"
+    return "channels.short_name = ?"
+
+
+def _is_mdf_file(fname):
+    lname = fname.lower()
+    for suffix in MDF_SUFFIXES:
+        for compression_suffix in COMPRESSION_SUFFIXES:
+            if lname.endswith(suffix+compression_suffix):
+                return True
+    return False
+
+
+def _read_catalog_entry(fname):
+    """
+    reads the header and the channel tree of one file
+    @param fname: path to file
+    @return: a tuple (dictionary of file columns, list of channel row tuples)
+    """
+    m = mdf(fname=fname)
+    hd = m.hdblock
+    first = None
+    last = None
+    channels = []
+    for dg_idx,dg in enumerate(hd.get_data_groups()):
+        try:
+            time_range = dg.get_time_range(fname=fname)
+        except (NotImplementedError,ValueError):
+            time_range = None
+        if time_range:
+            if first is None or time_range[0] < first:
+                first = time_range[0]
+            if last is None or time_range[1] > last:
+                last = time_range[1]
+        for cg_idx,cg in enumerate(dg.get_channel_groups()):
+            num_recs = cg.get_number_of_records()
+            estimated_raster = None
+            if time_range and num_recs > 1:
+                estimated_raster = (time_range[1]-time_range[0])/(num_recs-1)
+            for ch in cg.get_channels():
+                if ch.get_channel_type() != "data" or not ch.get_short_name():
+                    continue
+                unit = ""
+                if ch.conversion_block is not None:
+                    unit = ch.conversion_block.physical_unit
+                raster = ch.sampling_rate or estimated_raster
+                channels.append((ch.get_short_name(),ch.signal_description,unit,raster,dg_idx,cg_idx,
+                                 ch.get_signal_type(),ch.get_bit_size(),num_recs))
+    duration = None
+    start_time = _to_seconds(hd.timestamp)
+    end_time = start_time
+    if first is not None:
+        duration = last-first
+        end_time = start_time+last
+    entry = {"version":m.version,
+             "timestamp":hd.timestamp.isoformat(),
+             "start_time":start_time,
+             "end_time":end_time,
+             "duration":duration,
+             "author":hd.author,
+             "organisation":hd.organisation,
+             "subject":hd.subject,
+             }
+    return (entry,channels)
+
+
+class channel_catalog():
+
+    def __init__(self,db_fname):
+        """
+        sqlite index of the headers and channels of many mdf files
+        @param db_fname: path to the sqlite database, created if it does not exist
+        @return: the catalog object
+        @note: queries only use the database, the mdf files are only read by scan()
+        """
+        self.db_fname = db_fname
+        self.connection = sqlite3.connect(db_fname)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
+        return False
+
+    def add_file(self,fname):
+        """
+        indexes one file if it is new or its size or modification time changed
+        @param fname: path to file
+        @return: "added", "updated", "unchanged" or "failed"
+        @note: files that cannot be read are stored with their error and skipped until they change
+        """
+        path = os.path.abspath(fname)
+        st = os.stat(path)
+        row = self.connection.execute("SELECT id,size,mtime_ns FROM files WHERE path = ?",(path,)).fetchone()
+        if row is not None and row["size"] == st.st_size and row["mtime_ns"] == st.st_mtime_ns:
+            return "unchanged"
+        try:
+            entry,channels = _read_catalog_entry(path)
+            error = None
+        except Exception as e:
+            entry = {}
+            channels = []
+            error = "{0}: {1}".format(type(e).__name__,e)
+        with self.connection:
+            if row is not None:
+                self.connection.execute("DELETE FROM files WHERE id = ?",(row["id"],))
+            cur = self.connection.execute("""INSERT INTO files (path,size,mtime_ns,version,timestamp,start_time,end_time,duration,
+                                             author,organisation,subject,error) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)""",
+                                          (path,st.st_size,st.st_mtime_ns,entry.get("version"),entry.get("timestamp"),
+                                           entry.get("start_time"),entry.get("end_time"),entry.get("duration"),
+                                           entry.get("author"),entry.get("organisation"),entry.get("subject"),error))
+            file_id = cur.lastrowid
+            self.connection.executemany("""INSERT INTO channels (file_id,short_name,description,unit,raster,data_group,channel_group,
+                                           signal_data_type,number_of_bits,number_of_records) VALUES (?,?,?,?,?,?,?,?,?,?)""",
+                                        [(file_id,)+channel for channel in channels])
+        if error is not None:
+            return "failed"
+        if row is not None:
+            return "updated"
+        return "added"
+
+    def scan(self,path,recursive=True,progress_callback=None):
+        """
+        indexes all mdf files of a directory, unchanged files are skipped
+        @param path: the directory
+        @param recursive: also scan sub directories
+        @param progress_callback: a function f(fname,result) called for each file
+        @return: a dictionary with the number of added, updated, unchanged, failed and removed files
+        @note: entries of files below path that no longer exist are removed
+        """
+        counts = {"added":0,"updated":0,"unchanged":0,"failed":0,"removed":0}
+        root = os.path.abspath(path)
+        seen = set()
+        for dirpath,dirnames,filenames in os.walk(root):
+            if not recursive:
+                dirnames[:] = []
+            for filename in sorted(filenames):
+                if not _is_mdf_file(filename):
+                    continue
+                fname = os.path.join(dirpath,filename)
+                result = self.add_file(fname)
+                seen.add(fname)
+                counts[result] += 1
+                if progress_callback is not None:
+                    progress_callback(fname,result)
+        prefix = os.path.join(root,"")
+        for row in self.connection.execute("SELECT path FROM files WHERE substr(path,1,?) = ?",(len(prefix),prefix)).fetchall():
+            if row["path"] in seen:
+                continue
+            if not recursive and os.path.dirname(row["path"]) != root:
+                continue
+            if not os.path.exists(row["path"]):
+                self.remove_file(row["path"])
+                counts["removed"] += 1
+        return counts
+
+    def remove_file(self,fname):
+        with self.connection:
+            self.connection.execute("DELETE FROM files WHERE path = ?",(os.path.abspath(fname),))
+        return
+
+    def find_files(self,short_name=None,start=None,stop=None,raster=None,raster_tolerance=1e-6,**metadata):
+        """
+        searches the catalog
+        @param short_name: only files with this channel, glob patterns like nEng* are allowed
+        @param start: only files recorded at or after this datetime, overlapping recordings count
+        @param stop: only files recorded before or at this datetime, overlapping recordings count
+        @param raster: only files where the channel has this raster in seconds, needs short_name
+        @param raster_tolerance: the allowed difference to raster in seconds
+        @param metadata: exact matches of author, organisation or subject
+        @return: a list of dictionaries with the file columns, sorted by timestamp
+        """
+        conditions = ["files.error IS NULL",]
+        params = []
+        if short_name is not None:
+            channel_conditions = ["channels.file_id = files.id",_name_condition(short_name)]
+            params.append(short_name)
+            if raster is not None:
+                channel_conditions.append("abs(channels.raster - ?) <= ?")
+                params.extend([raster,raster_tolerance])
+            conditions.append("EXISTS (SELECT 1 FROM channels WHERE {0})".format(" AND ".join(channel_conditions)))
+        elif raster is not None:
+            raise ValueError("raster needs short_name")
+        if start is not None:
+            conditions.append("files.end_time >= ?")
+            params.append(_to_seconds(start))
+        if stop is not None:
+            conditions.append("files.start_time <= ?")
+            params.append(_to_seconds(stop))
+        for key,value in metadata.items():
+            if key not in ["author","organisation","subject"]:
+                raise ValueError("Unknown metadata {0}".format(key))
+            conditions.append("files.{0} = ?".format(key))
+            params.append(value)
+        query = "SELECT * FROM files WHERE {0} ORDER BY files.start_time".format(" AND ".join(conditions))
+        return [dict(row) for row in self.connection.execute(query,params)]
+
+    def find_channels(self,short_name,fname=None):
+        """
+        @param short_name: the channel short name, glob patterns like nEng* are allowed
+        @param fname: only channels of this file
+        @return: a list of dictionaries with path and the channel columns
+        """
+        query = "SELECT files.path,channels.* FROM channels JOIN files ON channels.file_id = files.id WHERE {0}".format(_name_condition(short_name))
+        params = [short_name,]
+        if fname is not None:
+            query += " AND files.path = ?"
+            params.append(os.path.abspath(fname))
+        return [dict(row) for row in self.connection.execute(query,params)]
+
+    def get_channel_short_names(self):
+        return [row[0] for row in self.connection.execute("SELECT DISTINCT short_name FROM channels ORDER BY short_name")]
+
+    def get_failed_files(self):
+        """
+        @return: a list of (path, error) of files that could not be read
+        """
+        return [(row["path"],row["error"]) for row in self.connection.execute("SELECT path,error FROM files WHERE error IS NOT NULL")]
@@ -0,0 +1,273 @@
+# cli.py
+# (C) 2017 Patrick Menschel
+
+
+import sys
+import json
+import argparse
+import collections
+import concurrent.futures
+
+import numpy as np
+
+from .mdf import mdf, read_file_info, _to_absolute_time, DEFAULT_CHUNK_SIZE
+from .mdftools import to_sqlite, SQLITE_LAYOUTS
+
+
+EXPORT_FORMATS = ["csv","xlsx","sqlite"]
+
+
+def _split_names(values):
+    """
+    @return: a list of channel short names from repeated and comma separated arguments, None if empty
+    """
+    if not values:
+        return None
+    names = []
+    for value in values:
+        names.extend([name for name in value.split(",") if name])
+    return names
+
+
+def _to_text(col):
+    """
+    @return: the values of a column as strings, byte arrays as hex
+    @note: change columns are expanded here, one chunk at a time
+    """
+    col = np.asarray(col)
+    if col.dtype.kind == "V":
+        return np.array([bytes(val).hex() for val in col.tolist()],dtype=object)
+    return col.astype(str)
+
+
+def _format_csv_chunk(args):
+    """
+    formats one chunk of columns as csv lines, runs in the worker processes
+    @param args: a tuple (timestamps, list of value arrays, separator)
+    @return: the text of the chunk
+    """
+    t,cols,sep = args
+    cols = [t.astype(str),]+[_to_text(col) for col in cols]
+    return "".join([sep.join(row)+"\n" for row in zip(*cols)])
+
+
+def _iter_export_chunks(m,short_names,start,stop,raster,reference_channel,method,chunk_size,raw=False,compact=False):
+    """
+    generator of the columns to export
+    @param compact: True or a list of short names that are read as change columns
+    @return: yields tuples of (timestamps in seconds, list of value arrays and change columns in order of short_names)
+    @note: channels of one data group are read directly, channels of several data groups are resampled
+    """
+    groups = m.hdblock.get_data_groups_for_channels(short_names)
+    if len(groups) == 1 and raster is None and reference_channel is None:
+        for t,vals in m.iter_columns(short_names=short_names,start=start,stop=stop,chunk_size=chunk_size,raw=raw,compact=compact):
+            yield (t,vals)
+        return
+    if raster is None and reference_channel is None:
+        raise ValueError("Channels of {0} data groups need --raster or --reference".format(len(groups)))
+    for t,table in m.iter_resample(short_names=short_names,raster=raster,reference_channel=reference_channel,
+                                   method=method,chunk_size=chunk_size,raw=raw,compact=compact):
+        mask = None
+        if start is not None:
+            mask = t >= start
+        if stop is not None:
+            if mask is None:
+                mask = t <= stop
+            else:
+                mask &= t <= stop
+        if mask is not None:
+            t = t[mask]
+            table = table[mask]
+        if len(t):
+            yield (t,[table[:,idx] for idx in range(table.shape[1])])
+    return
+
+
+def _iter_csv_text(chunks,sep,workers):
+    """
+    generator of formatted csv text, chunks are formatted in worker processes if workers > 1
+    @note: at most 2*workers chunks are in flight, the order of the chunks is kept
+    """
+    if workers <= 1:
+        for t,vals in chunks:
+            yield _format_csv_chunk((t,vals,sep))
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        for t,vals in chunks:
+            pending.append(executor.submit(_format_csv_chunk,(t,vals,sep)))
+            if len(pending) >= 2*workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    return
+
+
+def _write_csv(fname,short_names,chunks,sep,workers):
+    counter = [0,]
+
+    def counted(chunks):
+        for t,vals in chunks:
+            counter[0] += len(t)
+            yield (t,vals)
+
+    with open(fname,'w') as f:
+        f.write(sep.join(["time",]+short_names)+"\n")
+        for text in _iter_csv_text(chunks=counted(chunks),sep=sep,workers=workers):
+            f.write(text)
+    return counter[0]
+
+
+def _write_xlsx(fname,short_names,chunks):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("data")
+    ws.append(["time",]+short_names)
+    num = 0
+    for t,vals in chunks:
+        cols = [np.asarray(col).tolist() if col.dtype.kind != "V" else _to_text(col).tolist() for col in vals]
+        for row in zip(t.tolist(),*cols):
+            ws.append(row)
+        num += len(t)
+    wb.save(fname)
+    return num
+
+
+def cmd_info(args):
+    info = read_file_info(args.fname)
+    if args.json:
+        info.update({"timestamp":info["timestamp"].isoformat()})
+        print(json.dumps(info,indent=2))
+        return 0
+    for key in ["file_identifier","version","program","byte_order","timestamp","author","organisation","subject","number_of_data_groups"]:
+        print("{0:24}{1}".format(key,info[key]))
+    print("{0:>6}{1:>10}{2:>10}{3:>14}".format("group","channels","size","records"))
+    for cg in info["channel_groups"]:
+        print("{0:>6}{1:>10}{2:>10}{3:>14}".format(cg["data_group"],cg["number_of_channels"],cg["record_size"],cg["number_of_records"]))
+    return 0
+
+
+def cmd_channels(args):
+    m = mdf(fname=args.fname)
+    rows = []
+    for dg_idx,dg in enumerate(m.hdblock.get_data_groups()):
+        for cg in dg.get_channel_groups():
+            for ch in cg.get_channels():
+                short_name = ch.get_short_name()
+                if args.pattern and args.pattern not in short_name:
+                    continue
+                unit = ""
+                if ch.conversion_block is not None:
+                    unit = ch.conversion_block.physical_unit
+                rows.append({"data_group":dg_idx,
+                             "short_name":short_name,
+                             "channel_type":ch.get_channel_type(),
+                             "signal_data_type":ch.get_signal_type(),
+                             "number_of_bits":ch.get_bit_size(),
+                             "unit":unit,
+                             "description":ch.signal_description,
+                             })
+    if args.json:
+        print(json.dumps(rows,indent=2))
+        return 0
+    for row in rows:
+        print("{data_group:>4} {short_name:40} {channel_type:6} {signal_data_type:>3} {number_of_bits:>4} {unit:10} {description}".format(**row))
+    return 0
+
+
+def cmd_export(args):
+    fmt = args.format
+    if fmt is None:
+        fmt = args.output.rsplit(".",1)[-1].lower()
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError("Unknown export format {0}, use --format".format(fmt))
+    m = mdf(fname=args.fname)
+    for definition in args.derive or []:
+        name,sep,expr = definition.partition("=")
+        if not sep:
+            raise ValueError("Derived channel {0} is not NAME=EXPR".format(definition))
+        m.derive(name=name.strip(),expr=expr.strip())
+    short_names = _split_names(args.channels)
+    if short_names is None:
+        short_names = m.get_channel_short_names()
+    compact = _split_names(args.compact) or False
+    if fmt == "sqlite":
+        if args.raster is not None or args.reference is not None or args.absolute_time:
+            raise ValueError("sqlite exports one table per data group in seconds, --raster, --reference and --absolute-time do not apply")
+        num = to_sqlite(m,args.output,short_names=short_names,layout=args.layout,start=args.start,stop=args.stop,
+                        raw=args.raw,chunk_size=args.chunk_size,compact=compact)
+        print("exported {0} rows of {1} channels to {2}".format(num,len(short_names),args.output),file=sys.stderr)
+        return 0
+    chunks = _iter_export_chunks(m=m,short_names=short_names,start=args.start,stop=args.stop,raster=args.raster,
+                                 reference_channel=args.reference,method=args.method,chunk_size=args.chunk_size,
+                                 raw=args.raw,compact=compact)
+    if args.absolute_time:
+        chunks = ((_to_absolute_time(t,m.hdblock.timestamp),vals) for t,vals in chunks)
+    if fmt == "csv":
+        num = _write_csv(fname=args.output,short_names=short_names,chunks=chunks,sep=args.sep,workers=args.workers)
+    else:
+        num = _write_xlsx(fname=args.output,short_names=short_names,chunks=chunks)
+    print("exported {0} records of {1} channels to {2}".format(num,len(short_names),args.output),file=sys.stderr)
+    return 0
+
+
+def cmd_cut(args):
+    m = mdf(fname=args.fname)
+    m.cut(args.output,start=args.start,stop=args.stop,short_names=_split_names(args.channels))
+    return 0
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog="mdfminer",description="inspect, export and cut mdf files")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    p = subparsers.add_parser("info",help="print the header and the channel groups without reading the channels")
+    p.add_argument("fname",metavar="FILE")
+    p.add_argument("--json",action="store_true",help="print json instead of text")
+    p.set_defaults(func=cmd_info)
+
+    p = subparsers.add_parser("channels",help="list the channels")
+    p.add_argument("fname",metavar="FILE")
+    p.add_argument("-p","--pattern",default=None,help="only channels whose short name contains PATTERN")
+    p.add_argument("--json",action="store_true",help="print json instead of text")
+    p.set_defaults(func=cmd_channels)
+
+    p = subparsers.add_parser("export",help="export channels to csv, xlsx or sqlite")
+    p.add_argument("fname",metavar="FILE")
+    p.add_argument("-o","--output",required=True,metavar="OUTPUT")
+    p.add_argument("-c","--channels",action="append",help="channel short names, repeated or comma separated, default all")
+    p.add_argument("--start",type=float,default=None,help="start of the time range in seconds")
+    p.add_argument("--stop",type=float,default=None,help="end of the time range in seconds")
+    p.add_argument("-f","--format",choices=EXPORT_FORMATS,default=None,help="default from the suffix of OUTPUT")
+    p.add_argument("--raster",type=float,default=None,help="resample channels of several data groups to RASTER seconds")
+    p.add_argument("--reference",default=None,help="resample channels of several data groups to the time base of this channel")
+    p.add_argument("--method",choices=["previous","linear","nearest"],default="previous",help="resampling method")
+    p.add_argument("--absolute-time",action="store_true",help="write absolute timestamps instead of seconds")
+    p.add_argument("--raw",action="store_true",help="write the stored values without conversion")
+    p.add_argument("-d","--derive",action="append",metavar="NAME=EXPR",help="add a derived channel, e.g. power=trq*nEng/9549")
+    p.add_argument("--compact",action="append",help="slowly changing channels that are read as change points, repeated or comma separated, "
+                                                    "long sqlite tables get one row per change")
+    p.add_argument("--layout",choices=SQLITE_LAYOUTS,default="wide",help="sqlite tables with one column per channel or rows of (time, channel_id, value)")
+    p.add_argument("--sep",default=",",help="csv separator")
+    p.add_argument("-w","--workers",type=int,default=1,help="number of processes formatting csv chunks")
+    p.add_argument("--chunk-size",type=int,default=DEFAULT_CHUNK_SIZE,help="number of records decoded at once")
+    p.set_defaults(func=cmd_export)
+
+    p = subparsers.add_parser("cut",help="write a time range and a subset of channels to a new mdf file")
+    p.add_argument("fname",metavar="FILE")
+    p.add_argument("-o","--output",required=True,metavar="OUTPUT")
+    p.add_argument("-c","--channels",action="append",help="channel short names, repeated or comma separated, default all")
+    p.add_argument("--start",type=float,default=None,help="start of the time range in seconds")
+    p.add_argument("--stop",type=float,default=None,help="end of the time range in seconds")
+    p.set_defaults(func=cmd_cut)
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (ValueError,KeyError,OSError,ImportError,NotImplementedError) as e:
+        print("mdfminer {0}: error: {1}".format(args.command,e),file=sys.stderr)
+        return 1
@@ -2,12 +2,53 @@
 # (C) 2017 Patrick Menschel
 
 
+import os
 import struct
 import datetime
+import time
+import threading
+import collections
+import contextlib
+import ast
+import re
+import operator
+import numbers
+import importlib.util
+
+import numpy as np
+
+from .sources import open_source, get_shared_descriptor
 
 
 MDF_IMPLEMENTED_VERSION = 3.3
 
+DEFAULT_CHUNK_SIZE = 65536#number of records decoded at once by the columnar readers
+OVERVIEW_BUCKET_SIZE = 64#number of records per bucket of the finest overview level
+OVERVIEW_LEVEL_FACTOR = 8#number of buckets combined into one bucket of the next coarser level
+DEFAULT_CACHE_BYTES = 256*1024*1024#byte budget of the process wide column cache
+RECORD_GAP_BYTES = 64*1024#records closer than this are read in one go by the random access readers
+EXPRESSION_FUNCTIONS = ["abs","sqrt","exp","log","log10","sin","cos","tan","arcsin","arccos","arctan","arctan2",
+                        "sinh","cosh","tanh","where","minimum","maximum","clip","floor","ceil","round","sign","isnan"]
+THRESHOLD_OPERATORS = {"<":operator.lt,"<=":operator.le,">":operator.gt,">=":operator.ge,"==":operator.eq,"!=":operator.ne}
+
+SIGNAL_DATA_TYPES = {0:("u",None),#unsigned integer, default byte order
+                     1:("i",None),#signed integer, default byte order
+                     2:("f",None),#IEEE 754 float, default byte order
+                     3:("f",None),#IEEE 754 double, default byte order
+                     7:("S",None),#string, null terminated
+                     8:("V",None),#byte array
+                     9:("u",'big'),
+                     10:("i",'big'),
+                     11:("f",'big'),
+                     12:("f",'big'),
+                     13:("u",'little'),
+                     14:("i",'little'),
+                     15:("f",'little'),
+                     16:("f",'little'),
+                     }#signal data type: (numpy kind, byte order or None for the byte order of the file), floats have 16, 32 or 64 bits
+
+PROGRESS_INTERVAL = 10000#number of records between two progress callbacks of the record wise readers and exporters
+
 
 def get_implemented_mdf_version():
     return MDF_IMPLEMENTED_VERSION
@@ -71,7 +112,8 @@ def _interpret_hd_block(data,vers=3,bord='little'):
                                     "%d:%m:%Y%H:%M:%S")
     auths = data[36:68].rstrip(b'\x00').decode()#author
     orgs = data[68:100].rstrip(b'\x00').decode()#organisation
-    subjs = data[100:132].rstrip(b'\x00').decode()#subject, e.g. vehicle information
+    projs = data[100:132].rstrip(b'\x00').decode()#project
+    subjs = data[132:164].rstrip(b'\x00').decode()#subject, e.g. vehicle information
     
     ret =  {"data_group_pointer":dg_ptr,
             "comment_text_pointer":fc_ptr,
@@ -79,6 +121,7 @@ def _interpret_hd_block(data,vers=3,bord='little'):
             "number_of_data_groups":ndg,
             "author":auths,
             "organisation":orgs,
+            "project":projs,
             "subject":subjs,
             "timestamp":dt,
             }
@@ -130,8 +173,8 @@ def _interpret_tr_block(data,vers=3,bord='little'):
         fmtprefix = '>'
     tc_ptr,num_tevs = struct.unpack("{0}IH".format(fmtprefix),data[4:10])#trigger comment pointer,number of trigger events
     tev_lst = []
-    for tev in num_tevs:
-        tt,prett,posttt = struct.unpack("{0}ddd".format(fmtprefix),data[10+tev:24+tev])
+    for tev in range(num_tevs):
+        tt,prett,posttt = struct.unpack("{0}ddd".format(fmtprefix),data[10+(tev*24):34+(tev*24)])
         tev_lst.append({"trigger_time":tt,
                         "pre_trigger_time":prett,
                         "post_trigger_time":posttt})#trigger time, pre trigger time, post trigger time
@@ -211,6 +254,9 @@ def _interpret_cg_block(data,vers=3,bord='little'):
            "record_size":rec_size,
            "number_of_records":num_recs,
            }
+    if len(data) >= 30:
+        #first sample reduction block pointer, introduced with version 3.3
+        ret.update({"first_sample_reduction_block_pointer":struct.unpack("{0}I".format(fmtprefix),data[26:30])[0]})
     return ret
 
 
@@ -236,9 +282,11 @@ def _interpret_cn_block(data,vers=3.0,bord='little'):
     sd = data[58:186].rstrip(b'\x00').decode()
     so,num_b,sdtp = struct.unpack("{0}HHH".format(fmtprefix),data[186:192])
     
-    vrv = struct.unpack("?",data[192:193])[0]
-    sv_min,sv_max,sv_sr = struct.unpack("{0}ddd".format(fmtprefix),data[193:217])
-    lsnt_ptr,dsn_ptr,adbos = struct.unpack("{0}IIH".format(fmtprefix),data[217:227])
+    vrv = bool(struct.unpack("{0}H".format(fmtprefix),data[192:194])[0])#BOOL is 2 bytes
+    sv_min,sv_max,sv_sr = struct.unpack("{0}ddd".format(fmtprefix),data[194:218])
+    lsnt_ptr,dsn_ptr,adbos = 0,0,0
+    if len(data) >= 228:
+        lsnt_ptr,dsn_ptr,adbos = struct.unpack("{0}IIH".format(fmtprefix),data[218:228])
     
     ret = {"next_channel_pointer":ncb_ptr,
            "conversion_formula_pointer":cf_ptr,
@@ -275,9 +323,9 @@ def _interpret_cc_block(data,vers=3.0,bord='little'):
         fmtprefix = '<'
     else:
         fmtprefix = '>'
-    prv = struct.unpack("{0}?".format(fmtprefix),data[4:5])[0]
-    ps_min,ps_max = struct.unpack("{0}dd".format(fmtprefix),data[5:21])
-    pu = data[21:42].strip(b'\x00').decode()
+    prv = bool(struct.unpack("{0}H".format(fmtprefix),data[4:6])[0])#BOOL is 2 bytes
+    ps_min,ps_max = struct.unpack("{0}dd".format(fmtprefix),data[6:22])
+    pu = data[22:42].strip(b'\x00').decode("latin1")
     ct,si = struct.unpack("{0}HH".format(fmtprefix),data[42:46])
     ct_dict = {0:"parametric,linear",
                1:"tabular with interpolation",
@@ -358,9 +406,17 @@ def _interpret_cd_block(data,vers=3.0,bord='little'):
                         "channel_group_pointer":cg_ptr,
                         "channel_pointer":ch_ptr,
                         })
+    sizes = []
+    if dt >= 256:
+        #N-dimensional dependency, the size of each dimension follows the pointers
+        strt = 8+(num_sd*12)
+        num_dims = min(dt-256,(len(data)-strt)//2)
+        sizes = list(struct.unpack("{0}{1}H".format(fmtprefix,num_dims),data[strt:strt+(num_dims*2)]))
     ret = {"dependency_type":dt,
            "number_of_dependencies":num_sd,
-           "dependencies":dp_list,}
+           "dependencies":dp_list,
+           "sizes_of_dimensions":sizes,
+           }
     return ret
 
 
@@ -405,7 +461,215 @@ def _interpret_ce_block(data,vers=3.0,bord='little'):
     return ret
 
 
-def _interpret_record(rec,chs,bord):
+def _build_block(block_id,body,bord='little'):
+    """
+    prepends block id and block size to the contents of a block
+    @param block_id: the two character block id
+    @param body: the bytes of the block after the block size
+    @param bord: byte order of contents
+    @return: the bytes of the block
+    """
+    if bord == 'little':
+        fmtprefix = '<'
+    else:
+        fmtprefix = '>'
+    return block_id.encode()+struct.pack("{0}H".format(fmtprefix),4+len(body))+bytes(body)
+
+
+def _build_id_block(bord='little',program="mdfminer"):
+    """
+    builds the id block of a version 3.3 mdf file
+    @param bord: byte order of contents
+    @param program: the program identifier, 8 characters at most
+    @return: the 64 bytes of the id block
+    """
+    if bord == 'little':
+        fmtprefix = '<'
+        bord_raw = 0
+    else:
+        fmtprefix = '>'
+        bord_raw = 1
+    data = b"MDF     "+b"3.30    "+program.encode().ljust(8,b'\x00')[:8]
+    data += struct.pack("{0}HHHH".format(fmtprefix),bord_raw,0,int(MDF_IMPLEMENTED_VERSION*100),0)
+    data += bytes(28)+struct.pack("{0}HH".format(fmtprefix),0,0)
+    return data
+
+
+def _build_hd_block(dg_ptr,fc_ptr,pb_ptr,ndg,timestamp,author="",organisation="",project="",subject="",bord='little'):
+    """
+    builds a version 3.3 hd block of 208 bytes
+    @param dg_ptr: pointer to the first data group
+    @param fc_ptr: pointer to the file comment
+    @param pb_ptr: pointer to the program block
+    @param ndg: the number of data groups
+    @param timestamp: a datetime.datetime of the start of the measurement
+    @param bord: byte order of contents
+    @return: the bytes of the block
+    """
+    if bord == 'little':
+        fmtprefix = '<'
+    else:
+        fmtprefix = '>'
+    body = struct.pack("{0}IIIH".format(fmtprefix),dg_ptr,fc_ptr,pb_ptr,ndg)
+    body += timestamp.strftime("%d:%m:%Y%H:%M:%S").encode()
+    for text in [author,organisation,project,subject]:
+        body += text.encode("latin1").ljust(32,b'\x00')[:32]
+    nanoseconds = int((timestamp-datetime.datetime(1970,1,1)).total_seconds())*1000000000
+    body += struct.pack("{0}QhH".format(fmtprefix),nanoseconds,0,0)+b"Local PC Reference Time".ljust(32,b'\x00')
+    return _build_block("HD",body,bord)
+
+
+def _build_tx_block(text,bord='little'):
+    return _build_block("TX",text.encode("latin1")+b'\x00',bord)
+
+
+def _build_tr_block(tc_ptr,trigger_events,bord='little'):
+    """
+    builds a tr block
+    @param tc_ptr: pointer to the trigger comment
+    @param trigger_events: a list of dictionaries with trigger_time, pre_trigger_time and post_trigger_time
+    @param bord: byte order of contents
+    @return: the bytes of the block
+    """
+    if bord == 'little':
+        fmtprefix = '<'
+    else:
+        fmtprefix = '>'
+    body = struct.pack("{0}IH".format(fmtprefix),tc_ptr,len(trigger_events))
+    for tev in trigger_events:
+        body += struct.pack("{0}ddd".format(fmtprefix),tev["trigger_time"],tev["pre_trigger_time"],tev["post_trigger_time"])
+    return _build_block("TR",body,bord)
+
+
+def _build_dg_block(ndg_ptr,fcgb_ptr,tb_ptr,db_ptr,num_cg=1,num_rid=0,bord='little'):
+    if bord == 'little':
+        fmtprefix = '<'
+    else:
+        fmtprefix = '>'
+    return _build_block("DG",struct.pack("{0}IIIIHHI".format(fmtprefix),ndg_ptr,fcgb_ptr,tb_ptr,db_ptr,num_cg,num_rid,0),bord)
+
+
+def _build_cg_block(ncgb_ptr,fcb_ptr,ct_ptr,rid,num_ch,rec_size,num_recs,srb_ptr=0,bord='little'):
+    if bord == 'little':
+        fmtprefix = '<'
+    else:
+        fmtprefix = '>'
+    return _build_block("CG",struct.pack("{0}IIIHHHII".format(fmtprefix),ncgb_ptr,fcb_ptr,ct_ptr,rid,num_ch,rec_size,num_recs,srb_ptr),bord)
+
+
+def _build_cn_block(ncb_ptr,cf_ptr,ct_ptr,channel_type,short_name,bit_offset,number_of_bits,signal_data_type,
+                    description="",sampling_rate=0.0,range_valid=False,signal_min=0.0,signal_max=0.0,sde_ptr=0,db_ptr=0,bord='little'):
+    """
+    builds a version 3.3 cn block
+    @param ncb_ptr: pointer to the next channel
+    @param cf_ptr: pointer to the conversion formula
+    @param ct_ptr: pointer to the channel comment
+    @param channel_type: "data" or "time"
+    @param short_name: the short signal name, 31 characters at most
+    @param bit_offset: the bit offset of the signal in the record
+    @param number_of_bits: the number of bits of the signal
+    @param signal_data_type: the signal data type number
+    @param bord: byte order of contents
+    @return: the bytes of the block
+    """
+    if bord == 'little':
+        fmtprefix = '<'
+    else:
+        fmtprefix = '>'
+    ctp = {"data":0,"time":1}[channel_type]
+    body = struct.pack("{0}IIIIIH".format(fmtprefix),ncb_ptr,cf_ptr,sde_ptr,db_ptr,ct_ptr,ctp)
+    body += short_name.encode("latin1").ljust(32,b'\x00')[:31]+b'\x00'
+    body += description.encode("latin1").ljust(128,b'\x00')[:127]+b'\x00'
+    body += struct.pack("{0}HHHHddd".format(fmtprefix),bit_offset,number_of_bits,signal_data_type,int(range_valid),signal_min,signal_max,sampling_rate)
+    body += struct.pack("{0}IIH".format(fmtprefix),0,0,0)
+    return _build_block("CN",body,bord)
+
+
+def _build_cd_block(dependency_type,dependencies,sizes_of_dimensions=(),bord='little'):
+    """
+    builds a cd block
+    @param dependency_type: 1 vector, 2 matrix or 256 plus the number of dimensions
+    @param dependencies: a list of tuples (data group pointer, channel group pointer, channel pointer)
+    @param sizes_of_dimensions: the size of each dimension of an N-dimensional dependency
+    @param bord: byte order of contents
+    @return: the bytes of the block
+    """
+    if bord == 'little':
+        fmtprefix = '<'
+    else:
+        fmtprefix = '>'
+    body = struct.pack("{0}HH".format(fmtprefix),dependency_type,len(dependencies))
+    for dep in dependencies:
+        body += struct.pack("{0}III".format(fmtprefix),*dep)
+    body += struct.pack("{0}{1}H".format(fmtprefix,len(sizes_of_dimensions)),*sizes_of_dimensions)
+    return _build_block("CD",body,bord)
+
+
+def _build_ce_block(can_id,can_ch,msg_name,snd_name,bord='little'):
+    """
+    builds a ce block of a Vector CAN extention
+    @param can_id: the identifier of the can message
+    @param can_ch: the index of the can channel
+    @param msg_name: the name of the message, 35 characters at most
+    @param snd_name: the name of the sender, 35 characters at most
+    @param bord: byte order of contents
+    @return: the bytes of the block
+    """
+    if bord == 'little':
+        fmtprefix = '<'
+    else:
+        fmtprefix = '>'
+    body = struct.pack("{0}HII".format(fmtprefix),19,can_id,can_ch)
+    for text in [msg_name,snd_name]:
+        body += text.encode("latin1").ljust(36,b'\x00')[:35]+b'\x00'
+    return _build_block("CE",body,bord)
+
+
+def _build_cc_block(conversion_type,parameters=None,physical_unit="",range_valid=False,signal_min=0.0,signal_max=0.0,bord='little'):
+    """
+    builds a cc block
+    @param conversion_type: the conversion type number, 0 linear, 11 text table or 65535 1:1 conversion
+    @param parameters: (offset,factor) for linear, a dictionary of value: text for text table
+    @param physical_unit: the physical unit, 19 characters at most
+    @param bord: byte order of contents
+    @return: the bytes of the block
+    """
+    if bord == 'little':
+        fmtprefix = '<'
+    else:
+        fmtprefix = '>'
+    if conversion_type == 0:
+        size_information = 2
+        params = struct.pack("{0}dd".format(fmtprefix),*parameters)
+    elif conversion_type == 11:
+        size_information = len(parameters)
+        params = b"".join([struct.pack("{0}d".format(fmtprefix),val)+txt.encode("latin1").ljust(32,b'\x00')[:31]+b'\x00'
+                           for val,txt in sorted(parameters.items())])
+    elif conversion_type == 65535:
+        size_information = 0
+        params = b""
+    else:
+        raise NotImplementedError("Building conversion type {0} not implemented".format(conversion_type))
+    body = struct.pack("{0}Hdd".format(fmtprefix),int(range_valid),signal_min,signal_max)
+    body += physical_unit.encode("latin1").ljust(20,b'\x00')[:19]+b'\x00'
+    body += struct.pack("{0}HH".format(fmtprefix),conversion_type,size_information)+params
+    return _build_block("CC",body,bord)
+
+
+def _get_signal_layout(ch,bord):
+    """
+    @param ch: the channel
+    @param bord: byte order of the file
+    @return: a tuple (numpy kind, byte order) of the values of the channel, see SIGNAL_DATA_TYPES
+    """
+    signal_type = ch.get_signal_type()
+    if signal_type not in SIGNAL_DATA_TYPES:
+        raise NotImplementedError("unhandled {0}".format(signal_type))
+    kind,order = SIGNAL_DATA_TYPES[signal_type]
+    return (kind,order or bord)
+
+
+def _interpret_record(rec,chs,bord,raw=False):
     vals = []
     for ch in chs:
         bit_offset = ch.get_bit_offset()
@@ -413,51 +677,32 @@ def _interpret_record(rec,chs,bord):
         byte_offset = ch.get_byte_offset()#did not find any program that actually uses this
         if byte_offset:
             raise NotImplementedError("byte_offset {0} is set but not used".format(byte_offset))
-        signal_type = ch.get_signal_type()
-        if bit_offset%8:
-            raise NotImplementedError("bit_offset cannot be divided by 8")
-        offset = int(bit_offset/8)
-        if bit_size%8:
-            raise NotImplementedError("bit_size cannot be divided by 8")
-        size = int(bit_size/8)
-        sig_data = rec[offset:offset+size]
-        if signal_type == 0:
-            #unsigned integer
-            fmt = "I"
-            if bord == 'little':
-                fmtprefix = '<'
-                sig_data_just = sig_data.ljust(4,b'\x00')
-            else:
-                fmtprefix = '>'
-                sig_data_just = sig_data.rjust(4,b'\x00')
-            val = struct.unpack("{0}{1}".format(fmtprefix,fmt),sig_data_just)[0]
-        elif signal_type == 1:
-            #signed integer
-            fmt = "i"
-            if bord == 'little':
-                fmtprefix = '<'
-                sig_data_just = sig_data.ljust(4,b'\x00')
-            else:
-                fmtprefix = '>'
-                sig_data_just = sig_data.rjust(4,b'\x00')
-            val = struct.unpack("{0}{1}".format(fmtprefix,fmt),sig_data_just)[0]
-        elif signal_type == 3:
-            #float64, e.g. double
-            fmt = "d"
-            if bord == 'little':
+        kind,order = _get_signal_layout(ch,bord)
+        shift = bit_offset%8
+        offset = bit_offset//8
+        size = (shift+bit_size+7)//8
+        sig_data = bytes(rec[offset:offset+size])
+        if kind in "ui":
+            val = int.from_bytes(sig_data,order)
+            if shift or bit_size%8:
+                #bit field, the bytes that contain it are read as one integer
+                val = (val >> shift) & ((1 << bit_size)-1)
+            if kind == "i" and val >= (1 << (bit_size-1)):
+                val -= (1 << bit_size)
+        elif kind == "f":
+            if shift or size not in [2,4,8]:
+                raise NotImplementedError("unhandled float of {0} bits at bit offset {1}".format(bit_size,bit_offset))
+            if order == 'little':
                 fmtprefix = '<'
-                sig_data_just = sig_data.ljust(8,b'\x00')#just trying
             else:
                 fmtprefix = '>'
-                sig_data_just = sig_data.rjust(8,b'\x00')
-            val = struct.unpack("{0}{1}".format(fmtprefix,fmt),sig_data_just)[0]
-        elif signal_type == 7:
-            #string
+            val = struct.unpack("{0}{1}".format(fmtprefix,{2:"e",4:"f",8:"d"}[size]),sig_data)[0]
+        elif kind == "S":
             val = sig_data.rstrip(b'\x00').decode()
         else:
-            raise NotImplementedError("unhandled {0}".format(signal_type))
+            val = sig_data
         conversion_formula = ch.get_conversion_formula()
-        if conversion_formula != None:
+        if conversion_formula != None and not (raw and ch.get_channel_type() != "time"):
             phy_val = conversion_formula(val)
         else:
             phy_val = val
@@ -465,135 +710,1456 @@ def _interpret_record(rec,chs,bord):
             phy_val = datetime.timedelta(seconds=phy_val)
         vals.append(phy_val)
     return vals
-    
 
-class mdf_block():
-    
-    def __init__(self,fobj,foffset,*args,**kwargs):
-        """
-        parent class for all block structures in the mdf file
-        @param fobj: the file object
-        @param foffset: the offset in the file where the block starts 
-        @return: the block as an object        
-        """
-        self.data = bytearray()
-        self.block_data = {}
-        if fobj:
-            if foffset:
-                fobj.seek(foffset)
-            self.data.extend(fobj.read(4))
-            if len(self.data) >= 4:
-                block_id = self.data[:2].decode()
-                block_size = struct.unpack("H",self.data[2:4])[0]
-                self.data.extend(fobj.read(block_size-len(self.data)))
-                if len(self.data) != block_size:
-                    raise ValueError("Block {0} length invalid block_size={1} len(data)={2}".format(block_id,block_size,len(self.data)))
-                else:
-                    self.block_data.update({"block_id":block_id})
 
-    def __str__(self):
-        return str(self.block_data)
+def _composed_view(buf,num_recs,rec_size,chs,shape,bord):
+    """
+    views the elements of a composed channel in the records without copying them
+    @param buf: the bytes of the records
+    @param num_recs: the number of records
+    @param rec_size: the size of a record
+    @param chs: the element channels in order of the dependencies
+    @param shape: the shape of the composed channel
+    @param bord: byte order of contents
+    @return: a read only numpy array of shape (num_recs,)+shape or None if the elements are not
+             byte aligned numbers of one type at evenly spaced offsets
+    """
+    layouts = set()
+    offsets = []
+    for ch in chs:
+        kind,order = _get_signal_layout(ch,bord)
+        bit_size = ch.get_bit_size()
+        if kind not in "uif" or ch.get_bit_offset()%8 or bit_size not in [8,16,32,64] or ch.get_byte_offset():
+            return None
+        if kind == "f" and bit_size == 8:
+            return None
+        layouts.add((kind,order,bit_size))
+        offsets.append(ch.get_bit_offset()//8)
+    if len(layouts) != 1 or not offsets:
+        return None
+    kind,order,bit_size = layouts.pop()
+    dtype = np.dtype("{0}{1}{2}".format({"little":"<","big":">"}[order],kind,bit_size//8))
+    offsets = np.array(offsets).reshape(shape)
+    #the offset of an element must be a linear function of its index
+    strides = [int(offsets[tuple(np.eye(len(shape),dtype=int)[axis])]-offsets.flat[0]) if shape[axis] > 1 else 0
+               for axis in range(len(shape))]
+    expected = offsets.flat[0]+sum([np.indices(shape)[axis]*strides[axis] for axis in range(len(shape))])
+    if not np.array_equal(offsets,expected):
+        return None
+    return np.ndarray(shape=(num_recs,)+tuple(shape),dtype=dtype,buffer=buf,offset=int(offsets.flat[0]),
+                      strides=(rec_size,)+tuple(strides))
 
-    
-class id_block(mdf_block):
 
-    def __init__(self,fobj,foffset=0,*args,**kwargs):
-        """
-        the id block at the top of each mdf file,
-        located at the first 64 bytes,
-        there is one id block in one mdf file,
-        gives basic file information
-        @param fobj: the file object
-        @param foffset: the offset in the file where the block starts 
-        @return: the block as an object
-        """        
-        self.block_data = {"block_id":"ID"}
-        self.data = fobj.read(64)
-        self.block_data.update(_interpret_id_block(self.data))
-        self.text = self.block_data.pop("file_identifier")
+def _gather_column(sig_data,dtype):
+    """
+    @param sig_data: a 2d uint8 numpy array with the bytes of one value per row
+    @param dtype: the numpy dtype of the value
+    @return: a contiguous 1d array of the values in native byte order
+    @note: the bytes of each row are viewed as one value in place, so only one strided copy of the values is made,
+           values of the other byte order are swapped during this copy
+    """
+    dtype = np.dtype(dtype)
+    if sig_data.strides[1] != 1:
+        sig_data = np.ascontiguousarray(sig_data)
+    return sig_data.view(dtype)[:,0].astype(dtype.newbyteorder("="))
 
-    def get_version(self):
-        return self.block_data['version_number']
 
-    def get_byte_order(self):
-        return self.block_data['default_byte_order']
+def _decode_column(recs,ch,bord):
+    """
+    decodes one channel of a block of records at once
+    @param recs: a 2d uint8 numpy array with one record per row
+    @param ch: the channel to extract
+    @param bord: byte order of contents
+    @return: a numpy array with the raw values of the channel in native byte order,
+             strings as object array, byte arrays as fixed width void view of the records
+    """
+    bit_offset = ch.get_bit_offset()
+    bit_size = ch.get_bit_size()
+    byte_offset = ch.get_byte_offset()
+    if byte_offset:
+        raise NotImplementedError("byte_offset {0} is set but not used".format(byte_offset))
+    kind,order = _get_signal_layout(ch,bord)
+    shift = bit_offset%8
+    first = bit_offset//8
+    size = (shift+bit_size+7)//8
+    sig_data = recs[:,first:first+size]
+    if order == 'little':
+        fmtprefix = '<'
+    else:
+        fmtprefix = '>'
+    if kind in "ui":
+        for width in [1,2,4,8]:
+            if (bit_size+7)//8 <= width:
+                break
+        if shift or bit_size%8:
+            #bit field, the bytes that contain it are read as one integer, shifted and masked
+            if size > 8:
+                raise NotImplementedError("unhandled bit field of {0} bits at bit offset {1}".format(bit_size,bit_offset))
+            padded = np.zeros((sig_data.shape[0],8),dtype=np.uint8)
+            if order == 'little':
+                padded[:,:size] = sig_data
+            else:
+                padded[:,8-size:] = sig_data
+            val = _gather_column(padded,"{0}u8".format(fmtprefix))
+            if shift:
+                val >>= np.uint64(shift)
+            val &= np.uint64((1 << bit_size)-1)
+            if kind == "i":
+                #sign extension of the highest bit
+                val = val.view(np.int64)
+                val <<= 64-bit_size
+                val >>= 64-bit_size
+            return val.astype("{0}{1}".format(kind,width))
+        #unsigned and signed integer, padded to the next numpy integer size
+        if size > 8:
+            raise NotImplementedError("unhandled integer of {0} bits".format(bit_size))
+        if size != width:
+            padded = np.zeros((sig_data.shape[0],width),dtype=np.uint8)
+            if order == 'little':
+                padded[:,:size] = sig_data
+            else:
+                padded[:,width-size:] = sig_data
+            sig_data = padded
+        val = _gather_column(sig_data,"{0}{1}{2}".format(fmtprefix,kind,width))
+        if kind == "i" and size != width:
+            #sign extension of the padded bytes
+            shift = 8*(width-size)
+            val = (val << shift) >> shift
+    elif kind == "f":
+        if shift or size not in [2,4,8]:
+            raise NotImplementedError("unhandled float of {0} bits at bit offset {1}".format(bit_size,bit_offset))
+        val = _gather_column(sig_data,"{0}f{1}".format(fmtprefix,size))
+    elif kind == "S":
+        #string, numpy strips the trailing null bytes
+        if sig_data.strides[1] != 1:
+            sig_data = np.ascontiguousarray(sig_data)
+        val = np.array([txt.decode() for txt in sig_data.view("S{0}".format(size))[:,0].tolist()],dtype=object)
+    else:
+        #byte array, a view of the records without copy
+        if sig_data.strides[1] != 1:
+            sig_data = np.ascontiguousarray(sig_data)
+        val = sig_data.view("V{0}".format(size))[:,0]
+    return val
 
-    def __str__(self):
-        return self.text
 
+def _interpret_column(recs,ch,bord,instr=None,raw=False):
+    """
+    interprets one channel of a block of records at once
+    @param recs: a 2d uint8 numpy array with one record per row
+    @param ch: the channel to extract
+    @param bord: byte order of contents
+    @param instr: an instrumentation object that times decoding and conversion separately or None
+    @param raw: True to skip the conversion
+    @return: a numpy array with the physical values of the channel, the stored values if raw
+    """
+    conversion_formula = None
+    if not raw:
+        conversion_formula = ch.get_column_conversion_formula()
+    if instr is None:
+        val = _decode_column(recs=recs,ch=ch,bord=bord)
+        if conversion_formula != None:
+            return conversion_formula(val)
+        return val
+    with instr.phase("decode"):
+        val = _decode_column(recs=recs,ch=ch,bord=bord)
+    if conversion_formula == None:
+        return val
+    with instr.phase("convert"):
+        phy_val = conversion_formula(val)
+    instr.count_values(len(val))
+    return phy_val
+
+
+def _concatenate_chunks(chunks,count):
+    """
+    joins the chunks of a column generator
+    @param chunks: a generator that yields (timestamps,list of value arrays)
+    @param count: the number of value arrays per chunk
+    @return: a tuple (timestamps, list of value arrays)
+    """
+    chunks = list(chunks)
+    if not chunks:
+        return (np.empty(0),[np.empty(0) for i in range(count)])
+    vals = []
+    for idx in range(count):
+        cols = [chunk[1][idx] for chunk in chunks]
+        if isinstance(cols[0],change_column):
+            vals.append(change_column.concatenate(cols))
+        else:
+            vals.append(np.concatenate(cols))
+    return (np.concatenate([chunk[0] for chunk in chunks]),vals)
 
-class hd_block(mdf_block):
 
-    def __init__(self,fobj,vers,bord,ignore_channels=[],foffset=64,*args,**kwargs):
-        """
-        header block for the mdf file
-        @param fobj: the file object
-        @param foffset: the offset in the file where the block starts, 64 bytes for hd block 
-        @param vers: mdf file version 
-        @param bord: byte order of contents
-        @param ignore_channels: a list of strings which channels are to be ignored, i.e. program specific stuff         
-        @return: the block as an object
-        """
-        super(hd_block,self).__init__(fobj=fobj,foffset=foffset,*args,**kwargs)
-        assert(self.block_data["block_id"] == "HD")
-        self.block_data.update(_interpret_hd_block(data=self.data,vers=vers,bord=bord))
+def _get_compact_flags(compact,short_names):
+    """
+    @param compact: True, False or a list of short names to read as change columns
+    @param short_names: the short names of a read
+    @return: a list with one bool per short name, None if nothing is compacted
+    """
+    if not compact:
+        return None
+    return [compact is True or short_name in compact for short_name in short_names]
 
 
-        self.author = self.block_data.pop("author")
-        self.organisation = self.block_data.pop("organisation")
-        self.subject = self.block_data.pop("subject")
-        self.timestamp = self.block_data.pop("timestamp")
+def _compact_chunk(chunk,flags):
+    """
+    replaces the value arrays of a chunk by change columns
+    @param chunk: a tuple (timestamps,list of value arrays)
+    @param flags: a list with one bool per value array, True to compact it, None to keep the chunk
+    @return: a tuple (timestamps, list of value arrays and change columns)
+    """
+    if not flags:
+        return chunk
+    t,vals = chunk
+    return (t,[change_column.from_values(t=t,vals=val) if flag else val for val,flag in zip(vals,flags)])
 
-        self.ignore_channels = ignore_channels
-        
-        self.data_groups = []
-        dg_ptr = self.block_data.pop("data_group_pointer")
-        while dg_ptr > 0:
-            dgb = dg_block(fobj=fobj,vers=vers,bord=bord,foffset=dg_ptr,timestamp=self.timestamp,ignore_channels=self.ignore_channels)
-            self.data_groups.append(dgb)
-            dg_ptr = dgb.block_data.pop("next_data_group_pointer")       
 
-        self.text = ""
-        ct_ptr = self.block_data.pop("comment_text_pointer")
-        if ct_ptr:
-            self.text = str(tx_block(fobj=fobj,vers=vers,bord=bord,foffset=ct_ptr))
+def _shift_time_column(recs,ch,bord,offset):
+    """
+    adds an offset to the raw values of a time channel in place
+    @param recs: a writable 2d uint8 numpy array with one record per row
+    @param ch: the time channel
+    @param bord: byte order of contents
+    @param offset: the offset in seconds
+    @return: the records
+    """
+    if not offset:
+        return recs
+    factor = 1.0
+    ccb = ch.conversion_block
+    if ccb is not None and ccb.conversion_type == "parametric,linear":
+        factor = ccb.parameters[1]
+    offset = offset/factor
+    first = ch.get_bit_offset()//8
+    size = ch.get_bit_size()//8
+    kind,order = _get_signal_layout(ch,bord)
+    if order == 'little':
+        fmtprefix = '<'
+    else:
+        fmtprefix = '>'
+    if ch.get_bit_offset()%8 or ch.get_bit_size()%8 or size not in [1,2,4,8]:
+        raise NotImplementedError("Time channel with {0} bits at bit offset {1} cannot be shifted".format(ch.get_bit_size(),ch.get_bit_offset()))
+    if kind not in "uif":
+        raise NotImplementedError("Time channel of signal type {0} cannot be shifted".format(ch.get_signal_type()))
+    dtype = "{0}{1}{2}".format(fmtprefix,kind,size)
+    if kind != "f":
+        offset = int(round(offset))
+    col = np.ascontiguousarray(recs[:,first:first+size]).view(dtype)
+    col += offset
+    recs[:,first:first+size] = col.view(np.uint8).reshape(-1,size)
+    return recs
+
+
+def _get_record_layout(mdf_obj):
+    """
+    @param mdf_obj: an mdf object
+    @return: a list with record size and channel layout of each data group, used to compare files
+    """
+    ret = []
+    for dg in mdf_obj.hdblock.get_data_groups():
+        for cg in dg.get_channel_groups():
+            ret.append((cg.get_record_size(),[(ch.get_short_name(),ch.get_channel_type(),ch.get_signal_type(),ch.get_bit_offset(),ch.get_bit_size())
+                                              for ch in cg.get_channels()]))
+    return ret
 
-        pb_ptr = self.block_data.pop("program_block_pointer")
-        self.program_data = None
-        if pb_ptr:
-            self.program_data = pr_block(fobj=fobj,vers=vers,bord=bord,foffset=ct_ptr)["data"]
 
+def _to_absolute_time(timestamps,starttime):
+    """
+    converts relative timestamps in seconds to absolute numpy datetimes
+    @param timestamps: a numpy array of seconds relative to starttime
+    @param starttime: a datetime.datetime
+    @return: a numpy datetime64 array
+    """
+    return np.datetime64(starttime,'us') + np.round(timestamps*1e6).astype('timedelta64[us]')
 
-        self.number_of_data_groups = self.block_data.pop("number_of_data_groups")
-        assert (self.number_of_data_groups == len(self.data_groups))
-  
-    def __str__(self):
-        return self.text
 
-    def get_data_groups(self):
-        return self.data_groups
+def _get_expression_names(expr):
+    """
+    @return: the variable names of an expression in order of appearance, without functions
+    """
+    names = []
+    nodes = [node for node in ast.walk(ast.parse(expr,mode="eval")) if isinstance(node,ast.Name)]
+    for node in sorted(nodes,key = lambda x: x.col_offset):
+        if node.id not in EXPRESSION_FUNCTIONS+["np",] and node.id not in names:
+            names.append(node.id)
+    return names
 
-    def print_data_group_statistics(self):
-        data_groups = self.get_data_groups()
-        for idx,dg in enumerate(data_groups):
-            strt,stp = dg.calc_data_block_range()
-            basestr = "Block {0} of {1}".format(idx+1,len(data_groups))
-            if strt:
-                print("{0}, Raw Data Block from {1:08X} to {2:08X}(included)".format(basestr,strt,stp))
-            else:
-                print("{0}, No Raw Data Block".format(basestr))
-        return
-                
-    def check_data_block_consistency(self):
-        data_groups = self.get_data_groups()
-        blocks = []
-        for idx,dg in enumerate(data_groups):
-            strt,stp = dg.calc_data_block_range()
-            if strt:
-                blocks.append((strt,stp))
-        for idx in range(len(blocks)-1):
-            if blocks[idx][1]+1 != blocks[idx+1][0]:
-                raise NotImplementedError("Inconsistent Data Blocks [from,to] {0} (X) {1} (X+1)".format(blocks[idx],blocks[idx+1]))
+
+def _evaluate_expression(code,variables,num):
+    """
+    evaluates a compiled expression element wise with numpy
+    @param code: the compiled expression
+    @param variables: a dictionary of variable name: numpy array
+    @param num: the number of values
+    @return: a numpy array with num values
+    """
+    namespace = {name:getattr(np,name) for name in EXPRESSION_FUNCTIONS}
+    namespace.update({"np":np,"__builtins__":{}})
+    val = np.asarray(eval(code,namespace,variables))
+    if val.ndim == 0:
+        val = np.full(num,val)
+    return val
+
+
+def _hold_state(enter,stay,state):
+    """
+    vectorized switch with hysteresis
+    @param enter: boolean array, the switch turns on where it is True
+    @param stay: boolean array, the switch turns off where it is False, enter must imply stay
+    @param state: the state of the switch before the first value
+    @return: boolean array of the state of the switch after each value
+    """
+    idx = np.where(enter | ~stay,np.arange(len(enter)),-1)
+    np.maximum.accumulate(idx,out=idx)
+    return np.where(idx >= 0,enter[np.maximum(idx,0)],state)
+
+
+def _align_column(t,vals,tt,method):
+    """
+    aligns the samples of one channel onto a new time base
+    @param t: the sorted timestamps of the channel
+    @param vals: the values of the channel
+    @param tt: the new time base
+    @param method: "previous" (hold last value), "linear" (interpolate) or "nearest"
+    @return: a numpy array with one value per entry of tt
+    @note: values before the first sample are nan or None, nearest takes the first sample there,
+           linear interpolation also ends with the last sample, text is held instead of interpolated
+    """
+    if isinstance(vals,change_column):
+        return vals.align(tt=tt,method=method)
+    numeric = vals.dtype.kind in "biuf"
+    if method == "linear" and numeric and len(t):
+        return np.interp(tt,t,vals,left=np.nan,right=np.nan)
+    if method == "nearest" and len(t):
+        idx = np.searchsorted(t,tt)
+        prv = np.clip(idx-1,0,len(t)-1)
+        nxt = np.clip(idx,0,len(t)-1)
+        idx = np.where(np.abs(tt-t[prv]) <= np.abs(t[nxt]-tt),prv,nxt)
+        return vals[idx]
+    if method not in ["previous","linear","nearest"]:
+        raise ValueError("unknown method {0}".format(method))
+    idx = np.searchsorted(t,tt,side="right")-1
+    if numeric:
+        ret = np.full(len(tt),np.nan)
+    else:
+        ret = np.full(len(tt),None,dtype=object)
+    valid = idx >= 0
+    ret[valid] = vals[idx[valid]]
+    return ret
+
+
+class _column_stream():
+
+    def __init__(self,chunks,count):
+        """
+        buffers a chunked column generator so it can be aligned to time bases chunk by chunk
+        @param chunks: a generator that yields (timestamps,list of value arrays)
+        @param count: the number of value arrays per chunk
+        @return: the stream object
+        """
+        self.chunks = chunks
+        self.t = np.empty(0)
+        self.vals = [np.empty(0) for i in range(count)]
+        self.exhausted = False
+
+    def fill(self,tmax):
+        while not self.exhausted and (not len(self.t) or self.t[-1] < tmax):
+            try:
+                t,vals = next(self.chunks)
+            except StopIteration:
+                self.exhausted = True
+                break
+            self.t = np.concatenate((self.t,t))
+            self.vals = [self._join(old,new) for old,new in zip(self.vals,vals)]
+        return
+
+    @staticmethod
+    def _join(old,new):
+        if not len(old):
+            return new
+        if isinstance(new,change_column):
+            return change_column.concatenate([old,new])
+        return np.concatenate((old,new))
+
+    def drop(self,tmin):
+        #keep the last sample before tmin for the next chunk
+        idx = max(np.searchsorted(self.t,tmin,side="right")-1,0)
+        self.t = self.t[idx:]
+        self.vals = [val.get_tail(idx) if isinstance(val,change_column) else val[idx:] for val in self.vals]
+        return
+
+    def align(self,tt,method):
+        self.fill(tt[-1])
+        ret = [_align_column(self.t,val,tt,method) for val in self.vals]
+        self.drop(tt[-1])
+        return ret
+
+
+def _is_changed(a,b):
+    """
+    @return: a boolean array, True where the values of a and b differ, nan equals nan
+    """
+    changed = a != b
+    if a.dtype.kind == "f":
+        changed &= ~(np.isnan(a) & np.isnan(b))
+    return changed
+
+
+class change_column():
+
+    def __init__(self,index,values,times,end_times,length):
+        """
+        compact column of a slowly changing channel that only holds the runs of equal values
+        @param index: the index of the first sample of each run
+        @param values: the value of each run
+        @param times: the timestamp of the first sample of each run
+        @param end_times: the timestamp of the last sample of each run
+        @param length: the number of samples
+        @return: the column object
+        @note: the samples are expanded on demand by indexing or np.asarray(),
+               statistics and alignment onto other time bases work on the runs,
+               the time of the last sample of each run keeps linear and nearest alignment exact
+        """
+        self.index = index
+        self.values = values
+        self.times = times
+        self.end_times = end_times
+        self.length = length
+
+    @classmethod
+    def from_values(cls,t,vals):
+        """
+        @param t: the timestamps of the samples
+        @param vals: the values of the samples
+        @return: the change column of the values
+        """
+        change = np.flatnonzero(_is_changed(vals[:-1],vals[1:]))+1
+        if not len(vals):
+            return cls(index=change,values=vals[:0],times=t[:0],end_times=t[:0],length=0)
+        index = np.concatenate(([0,],change))
+        last = np.append(change-1,len(vals)-1)
+        return cls(index=index,values=vals[index],times=t[index],end_times=t[last],length=len(vals))
+
+    @classmethod
+    def concatenate(cls,cols):
+        """
+        @param cols: a list of change columns of consecutive samples
+        @return: one change column, runs of equal values across the borders are joined
+        """
+        cols = [col for col in cols if col.length]
+        if not cols:
+            return cls(index=np.empty(0,dtype=np.intp),values=np.empty(0),times=np.empty(0),end_times=np.empty(0),length=0)
+        offsets = np.cumsum([0,]+[col.length for col in cols])
+        index = np.concatenate([col.index+offset for col,offset in zip(cols,offsets)])
+        values = np.concatenate([col.values for col in cols])
+        times = np.concatenate([col.times for col in cols])
+        end_times = np.concatenate([col.end_times for col in cols])
+        #the first run of a column continues the last run of the previous column if the values are equal
+        keep = np.ones(len(values),dtype=bool)
+        borders = np.cumsum([len(col.values) for col in cols])[:-1]
+        keep[borders] = _is_changed(values[borders-1],values[borders])
+        kept = np.flatnonzero(keep)
+        last = np.append(kept[1:]-1,len(values)-1)
+        return cls(index=index[kept],values=values[kept],times=times[kept],end_times=end_times[last],length=int(offsets[-1]))
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    @property
+    def shape(self):
+        return (self.length,)
+
+    @property
+    def nbytes(self):
+        return self.index.nbytes+self.values.nbytes+self.times.nbytes+self.end_times.nbytes
+
+    def __len__(self):
+        return self.length
+
+    def get_run_lengths(self):
+        return np.diff(np.append(self.index,self.length))
+
+    def get_tail(self,start):
+        """
+        @param start: the index of the first sample to keep
+        @return: the change column of the samples from start on, without expanding them
+        @note: the first run keeps its first timestamp, the value held before start is the same
+        """
+        run = max(np.searchsorted(self.index,start,side="right")-1,0)
+        return change_column(index=np.maximum(self.index[run:]-start,0),values=self.values[run:],times=self.times[run:],
+                             end_times=self.end_times[run:],length=max(self.length-start,0))
+
+    def expand(self):
+        """
+        @return: a numpy array with one value per sample
+        """
+        return np.repeat(self.values,self.get_run_lengths())
+
+    def __array__(self,dtype=None,copy=None):
+        ret = self.expand()
+        if dtype is not None:
+            ret = ret.astype(dtype)
+        return ret
+
+    def __getitem__(self,key):
+        """
+        @param key: a sample index, a slice or an array of sample indexes
+        @return: the values of the samples, only these are expanded
+        """
+        if isinstance(key,slice):
+            key = np.arange(*key.indices(self.length))
+        elif np.ndim(key) == 0:
+            key = int(key)
+            if key < 0:
+                key += self.length
+            if not 0 <= key < self.length:
+                raise IndexError("index {0} is out of range".format(key))
+        else:
+            key = np.asarray(key)
+            key = np.where(key < 0,key+self.length,key)
+        return self.values[np.searchsorted(self.index,key,side="right")-1]
+
+    def align(self,tt,method="previous"):
+        """
+        aligns the runs onto a new time base, see _align_column
+        @param tt: the new time base
+        @param method: "previous" (hold last value), "linear" (interpolate) or "nearest"
+        @return: a numpy array with one value per entry of tt
+        """
+        numeric = self.values.dtype.kind in "biuf"
+        if method == "linear" and numeric:
+            #the samples at both ends of each run describe the signal exactly
+            t = np.column_stack((self.times,self.end_times)).ravel()
+            vals = np.repeat(self.values,2)
+            return np.interp(tt,t,vals,left=np.nan,right=np.nan)
+        if method == "nearest" and self.length:
+            #a run is nearest up to the middle of the gap to the next run
+            borders = (self.end_times[:-1]+self.times[1:])/2
+            return self.values[np.searchsorted(borders,tt,side="left")]
+        if method not in ["previous","linear","nearest"]:
+            raise ValueError("unknown method {0}".format(method))
+        idx = np.searchsorted(self.times,tt,side="right")-1
+        if numeric:
+            ret = np.full(len(tt),np.nan)
+        else:
+            ret = np.full(len(tt),None,dtype=object)
+        valid = idx >= 0
+        ret[valid] = self.values[idx[valid]]
+        return ret
+
+
+class channel_array():
+
+    def __init__(self,mdf_obj,dg,ch,raw=False):
+        """
+        lazy, read only array of one channel, records are only read and decoded when indexed
+        @param mdf_obj: the mdf object
+        @param dg: the data group of the channel
+        @param ch: the channel
+        @param raw: True for the stored values, see cn_block.convert
+        @return: the array object
+        @note: integers and integer slices index records, slices with float bounds are time ranges in seconds,
+               e.g. arr[600.0:720.0] or arr[720.0:600.0:-1] backwards, np.asarray(arr) decodes the whole channel
+        """
+        self.mdf_obj = mdf_obj
+        self.dg = dg
+        self.cg = dg.get_channel_groups()[0]
+        self.ch = ch
+        self.raw = raw
+        self._dtype = None
+
+    @property
+    def shape(self):
+        return (self.cg.get_number_of_records(),)
+
+    @property
+    def ndim(self):
+        return 1
+
+    @property
+    def size(self):
+        return self.cg.get_number_of_records()
+
+    @property
+    def dtype(self):
+        if self._dtype is None:
+            if len(self):
+                self._dtype = self._read(np.array([0,]))[1].dtype
+            else:
+                self._dtype = np.dtype(np.float64)
+        return self._dtype
+
+    @property
+    def timestamps(self):
+        """
+        @return: a channel_array of the time channel of the channel group
+        """
+        return channel_array(mdf_obj=self.mdf_obj,dg=self.dg,ch=self.cg.get_time_channel())
+
+    def __len__(self):
+        return self.cg.get_number_of_records()
+
+    def __repr__(self):
+        return "channel_array({0}, shape={1})".format(self.ch.get_short_name(),self.shape)
+
+    def _read(self,indexes):
+        """
+        @param indexes: a sorted array of unique record indexes
+        @return: a tuple (timestamps, values) of the records
+        """
+        fname = self.mdf_obj.fname
+        recs = self.cg.read_records(fname=fname,foffset=self.dg.data_block_ptr,indexes=indexes)
+        timestamps = _interpret_column(recs=recs,ch=self.cg.get_time_channel(),bord=self.cg.bord)
+        if self.ch is self.cg.get_time_channel():
+            return (timestamps,timestamps)
+        vals = self.cg._decode_chunk(fname=fname,recs=recs,timestamps=timestamps,chs=[self.ch,],raw=self.raw,
+                                     instr=None,streams={},chunk_size=DEFAULT_CHUNK_SIZE)[0]
+        return (timestamps,vals)
+
+    def _get_indexes(self,key):
+        """
+        @return: a tuple (array of record indexes, True if a single value is requested)
+        """
+        num = len(self)
+        if isinstance(key,slice):
+            #any real number that is no integer makes a time range, e.g. numpy floats
+            if any([isinstance(val,numbers.Real) and not isinstance(val,numbers.Integral) for val in (key.start,key.stop)]):
+                step = int(key.step or 1)
+                if step < 0:
+                    first,last = self.dg.find_record_range(fname=self.mdf_obj.fname,start=key.stop,stop=key.start)
+                    return (np.arange(first,last)[::-1][::-step],False)
+                first,last = self.dg.find_record_range(fname=self.mdf_obj.fname,start=key.start,stop=key.stop)
+                return (np.arange(first,last)[::step],False)
+            return (np.arange(*key.indices(num)),False)
+        if np.ndim(key) == 0:
+            idx = int(key)
+            if idx < 0:
+                idx += num
+            if not 0 <= idx < num:
+                raise IndexError("index {0} is out of range".format(key))
+            return (np.array([idx,]),True)
+        key = np.asarray(key)
+        if key.dtype == bool:
+            if len(key) != num:
+                raise IndexError("boolean index of length {0} for {1} records".format(len(key),num))
+            return (np.flatnonzero(key),False)
+        idx = np.where(key < 0,key+num,key).astype(np.int64)
+        if len(idx) and (idx.min() < 0 or idx.max() >= num):
+            raise IndexError("index out of range for {0} records".format(num))
+        return (idx,False)
+
+    def __getitem__(self,key):
+        """
+        @param key: a record index, a slice of record indexes or of seconds, an index array or a boolean mask
+        @return: the values of the records, only these records are read
+        """
+        idx,scalar = self._get_indexes(key)
+        if not len(idx):
+            return np.empty(0,dtype=self.dtype)
+        #records are read in file order, each only once
+        uniques,inverse = np.unique(idx,return_inverse=True)
+        vals = self._read(uniques)[1]
+        if self._dtype is None:
+            self._dtype = vals.dtype
+        vals = vals[inverse.ravel()]
+        if scalar:
+            return vals[0]
+        return vals
+
+    def __array__(self,dtype=None,copy=None):
+        t,vals = _concatenate_chunks(self.dg.iter_columns(fname=self.mdf_obj.fname,short_names=[self.ch.get_short_name(),],raw=self.raw),count=1)
+        if self.ch is self.cg.get_time_channel():
+            vals = [t,]
+        ret = vals[0]
+        if dtype is not None:
+            ret = ret.astype(dtype)
+        return ret
+
+
+def _reduce_buckets(t,mins,maxs,sums,counts,factor):
+    """
+    combines every factor consecutive buckets into one
+    @param t: the start times of the buckets
+    @param mins: the minimum of each bucket
+    @param maxs: the maximum of each bucket
+    @param sums: the sum of each bucket
+    @param counts: the number of samples of each bucket
+    @param factor: the number of buckets to combine
+    @return: a dictionary with time, min, max, sum and count arrays
+    @note: plain samples are buckets with a count of one
+    """
+    idx = np.arange(0,len(t),factor)
+    return {"time":t[idx],
+            "min":np.minimum.reduceat(mins,idx),
+            "max":np.maximum.reduceat(maxs,idx),
+            "sum":np.add.reduceat(sums,idx),
+            "count":np.add.reduceat(counts,idx),
+            }
+
+
+def _concatenate_levels(levels):
+    return {key:np.concatenate([level[key] for level in levels]) for key in ["time","min","max","sum","count"]}
+
+
+def _rebin_envelope(level,start,stop,width):
+    """
+    reduces the buckets of a time range to a fixed number of bins
+    @param level: a dictionary with time, min, max, sum and count arrays
+    @param start: start of the time range
+    @param stop: end of the time range
+    @param width: the number of bins, e.g. the pixel width of a plot
+    @return: a tuple (bin start times, min, max, mean), empty bins are nan
+    """
+    edges = np.linspace(start,stop,width+1)
+    t = level["time"]
+    #the bucket that contains start belongs to the first bin
+    first = max(np.searchsorted(t,start,side="right")-1,0)
+    last = np.searchsorted(t,stop,side="right")
+    bins = np.clip(np.searchsorted(edges,t[first:last],side="right")-1,0,width-1)
+    mins = np.full(width,np.nan)
+    maxs = np.full(width,np.nan)
+    means = np.full(width,np.nan)
+    if len(bins):
+        idx = np.concatenate(([0,],np.flatnonzero(np.diff(bins))+1))
+        used = bins[idx]
+        mins[used] = np.minimum.reduceat(level["min"][first:last],idx)
+        maxs[used] = np.maximum.reduceat(level["max"][first:last],idx)
+        means[used] = np.add.reduceat(level["sum"][first:last],idx)/np.add.reduceat(level["count"][first:last],idx)
+    return (edges[:-1],mins,maxs,means)
+
+
+def _get_histogram_grid(vmin,vmax,bins):
+    """
+    bin width and position of a histogram of a value range
+    @param vmin: the minimum value
+    @param vmax: the maximum value
+    @param bins: the number of bins
+    @return: a tuple (first, width), the edges are (first+arange(bins+1))*width
+    @note: the width is a power of two and the edges are multiples of it, so the bins of a smaller range
+           always nest in the bins of a larger range, the last edge is above vmax so that no value
+           lies on the closed right edge of np.histogram
+    """
+    if vmax > vmin:
+        #the lower limit keeps the bin numbers exact floats
+        span = max((vmax-vmin)/bins,max(abs(vmin),abs(vmax))*(2.0**-50))
+    else:
+        #equal values are moved by value, not by bin, so any width fits
+        span = 1.0/bins
+    width = 2.0**np.ceil(np.log2(span))
+    first = np.floor(vmin/width)
+    while (first+bins)*width <= vmax:
+        width *= 2
+        first = np.floor(vmin/width)
+    return (first,width)
+
+
+class channel_statistics():
+
+    def __init__(self,histogram_bins=None,signal_range=None):
+        """
+        mergeable accumulator for count, min, max, mean, standard deviation and histogram of a channel
+        @param histogram_bins: None, the number of bins or an array of bin edges
+        @param signal_range: a tuple (min,max) of the valid signal range or None
+        @return: the accumulator object
+        @note: with a number of bins and no signal range, the bins follow the range of the values,
+               their width is a power of two and the edges are multiples of it, see _get_histogram_grid,
+               so the histogram does not depend on the chunks or the order of merges but may span up to
+               four times the value range
+        """
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.nan
+        self.max = np.nan
+        self.signal_range = signal_range
+        self.out_of_range = 0
+        self.first_out_of_range_time = None
+        self.number_of_bins = None
+        self.first = None
+        self.width = None
+        self.edges = None
+        self.histogram = None
+        if histogram_bins is None:
+            pass
+        elif np.ndim(histogram_bins):
+            self.edges = np.asarray(histogram_bins,dtype=np.float64)
+            self.histogram = np.zeros(len(self.edges)-1,dtype=np.int64)
+        else:
+            if int(histogram_bins) <= 0:
+                raise ValueError("The number of histogram bins must be positive, got {0}".format(histogram_bins))
+            self.number_of_bins = int(histogram_bins)
+            if signal_range and signal_range[1] > signal_range[0]:
+                self.edges = np.linspace(signal_range[0],signal_range[1],self.number_of_bins+1)
+                self.histogram = np.zeros(self.number_of_bins,dtype=np.int64)
+
+    def _get_rebinned(self,first,width):
+        """
+        @return: the histogram counts on the grid (first, width) of a range that contains the values
+        """
+        counts = np.zeros(self.number_of_bins,dtype=np.int64)
+        if self.min == self.max:
+            #all values are equal, their bin is known on any grid
+            counts[int(np.floor(self.min/width)-first)] = self.histogram.sum()
+        else:
+            #the grid of a larger range is at least as coarse, each used bin falls into one new bin
+            used = np.flatnonzero(self.histogram)
+            idx = (np.floor((self.first+used)*(self.width/width))-first).astype(np.int64)
+            np.add.at(counts,idx,self.histogram[used])
+        return counts
+
+    def _set_grid(self,vmin,vmax):
+        #moves the histogram to the grid of the value range vmin to vmax
+        first,width = _get_histogram_grid(vmin,vmax,self.number_of_bins)
+        if self.histogram is None:
+            self.histogram = np.zeros(self.number_of_bins,dtype=np.int64)
+        elif (first,width) != (self.first,self.width):
+            self.histogram = self._get_rebinned(first,width)
+        self.first = first
+        self.width = width
+        self.edges = (first+np.arange(self.number_of_bins+1))*width
+        return
+
+    def update(self,vals,timestamps=None):
+        """
+        adds a chunk of values
+        @param vals: a numpy array of values or a change_column
+        @param timestamps: the timestamps of the values, used to report the first out of range value
+        @note: the runs of a change_column are weighted with their lengths, the samples are not expanded
+        """
+        weights = None
+        if isinstance(vals,change_column):
+            weights = vals.get_run_lengths()
+            timestamps = vals.times
+            vals = vals.values
+        vals = np.asarray(vals)
+        if vals.dtype.kind not in "biuf":
+            self.count += len(vals) if weights is None else int(weights.sum())
+            return
+        vals = vals.astype(np.float64)
+        valid = np.isfinite(vals)
+        if not valid.all():
+            vals = vals[valid]
+            if timestamps is not None:
+                timestamps = timestamps[valid]
+            if weights is not None:
+                weights = weights[valid]
+        if not len(vals):
+            return
+        if self.signal_range:
+            outside = (vals < self.signal_range[0]) | (vals > self.signal_range[1])
+            if weights is None:
+                num_outside = np.count_nonzero(outside)
+            else:
+                num_outside = int(weights[outside].sum())
+            if num_outside:
+                if self.first_out_of_range_time is None and timestamps is not None:
+                    self.first_out_of_range_time = timestamps[np.argmax(outside)]
+                self.out_of_range += num_outside
+        chunk = channel_statistics()
+        if weights is None:
+            chunk.count = len(vals)
+            chunk.mean = vals.mean()
+            chunk.m2 = np.square(vals-chunk.mean).sum()
+        else:
+            chunk.count = int(weights.sum())
+            chunk.mean = np.average(vals,weights=weights)
+            chunk.m2 = (np.square(vals-chunk.mean)*weights).sum()
+        chunk.min = vals.min()
+        chunk.max = vals.max()
+        if self.number_of_bins and self.signal_range is None:
+            self._set_grid(np.fmin(self.min,chunk.min),np.fmax(self.max,chunk.max))
+        self._merge_moments(chunk)
+        if self.histogram is not None:
+            self.histogram += np.histogram(vals,bins=self.edges,weights=weights)[0].astype(np.int64)
+        return
+
+    def _merge_moments(self,other):
+        #parallel variant of the Welford algorithm by Chan et al.
+        if not other.count:
+            return
+        count = self.count+other.count
+        delta = other.mean-self.mean
+        self.mean += delta*other.count/count
+        self.m2 += other.m2+(delta*delta*self.count*other.count/count)
+        self.count = count
+        self.min = np.fmin(self.min,other.min)
+        self.max = np.fmax(self.max,other.max)
+        return
+
+    def merge(self,other):
+        """
+        adds the values of another accumulator, e.g. of another chunk or another file
+        @param other: a channel_statistics object with the same histogram settings
+        @note: the merged histogram equals the histogram of all values at once
+        """
+        if other.histogram is not None:
+            if self.number_of_bins and self.signal_range is None:
+                self._set_grid(np.fmin(self.min,other.min),np.fmax(self.max,other.max))
+                self.histogram += other._get_rebinned(self.first,self.width)
+            else:
+                self.histogram += other.histogram
+        self._merge_moments(other)
+        self.out_of_range += other.out_of_range
+        if self.first_out_of_range_time is None:
+            self.first_out_of_range_time = other.first_out_of_range_time
+        return
+
+    def get_results(self):
+        """
+        @return: a dictionary with count, min, max, mean, std, histogram and out of range information
+        @note: std is the population standard deviation, histogram is a tuple (counts, edges)
+        """
+        ret = {"count":self.count,
+               "min":None,
+               "max":None,
+               "mean":None,
+               "std":None,
+               "histogram":None,
+               }
+        if self.count and not np.isnan(self.min):
+            ret.update({"min":self.min,
+                        "max":self.max,
+                        "mean":self.mean,
+                        "std":np.sqrt(self.m2/self.count),
+                        })
+        if self.histogram is not None:
+            ret.update({"histogram":(self.histogram,self.edges)})
+        if self.signal_range:
+            ret.update({"out_of_range":self.out_of_range,
+                        "first_out_of_range_time":self.first_out_of_range_time,
+                        })
+        return ret
+
+
+class column_cache():
+
+    def __init__(self,byte_budget=DEFAULT_CACHE_BYTES):
+        """
+        process wide least recently used cache of decoded columns
+        @param byte_budget: the maximum number of bytes of all cached arrays, 0 disables the cache
+        @return: the cache object
+        @note: keys are (file, data block offset, channel index, conversion state),
+               all entries of a file are dropped when its size or modification time changes,
+               cached arrays are read only because every hit returns the same array
+        """
+        self.byte_budget = byte_budget
+        self.entries = collections.OrderedDict()
+        self.files = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    def get_file_key(self,fname):
+        """
+        @param fname: path to file
+        @return: the key of the file, stale entries of the file are dropped
+        """
+        st = os.stat(fname)
+        path = os.path.realpath(fname)
+        identity = (st.st_size,st.st_mtime_ns)
+        with self.lock:
+            if self.files.get(path) != identity:
+                if path in self.files:
+                    for key in [key for key in self.entries if key[0] == path]:
+                        self.size -= self.entries.pop(key).nbytes
+                        self.invalidations += 1
+                self.files.update({path:identity})
+        return path
+
+    def get(self,key):
+        with self.lock:
+            arr = self.entries.get(key)
+            if arr is None:
+                self.misses += 1
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+        return arr
+
+    def put(self,key,arr):
+        if arr.nbytes > self.byte_budget:
+            return
+        arr.flags.writeable = False
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key).nbytes
+            self.entries.update({key:arr})
+            self.size += arr.nbytes
+            while self.size > self.byte_budget:
+                old_key,old_arr = self.entries.popitem(last=False)
+                self.size -= old_arr.nbytes
+                self.evictions += 1
+        return
+
+    def set_byte_budget(self,byte_budget):
+        self.byte_budget = byte_budget
+        with self.lock:
+            while self.size > self.byte_budget:
+                old_key,old_arr = self.entries.popitem(last=False)
+                self.size -= old_arr.nbytes
+                self.evictions += 1
+        return
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.files.clear()
+            self.size = 0
+        return
+
+    def get_statistics(self):
+        """
+        @return: a dictionary with hits, misses, evictions, invalidations, number of entries and cached bytes
+        @note: the size of object arrays only counts the references, not the objects
+        """
+        with self.lock:
+            return {"hits":self.hits,
+                    "misses":self.misses,
+                    "evictions":self.evictions,
+                    "invalidations":self.invalidations,
+                    "entries":len(self.entries),
+                    "bytes":self.size,
+                    "byte_budget":self.byte_budget,
+                    }
+
+
+_column_cache = column_cache()
+
+
+def get_column_cache():
+    """
+    @return: the process wide column cache shared by all mdf objects
+    """
+    return _column_cache
+
+
+class instrumentation():
+
+    def __init__(self,progress_callback=None,timing_callback=None,parent=None):
+        """
+        counters and phase timers of one mdf file
+        @param progress_callback: a function f(phase,done,total) called while records are decoded or exported,
+                                  total is None if it is not known in advance
+        @param timing_callback: a function f(phase,seconds) called at the end of each timed phase
+        @param parent: another instrumentation object that receives all counts and times as well
+        @return: the instrumentation object
+        @note: the phases are open, decode, convert and export, the columnar readers time decode and convert
+               separately per chunk and channel, the record wise readers include the conversion in decode
+               and export includes the decoding of the exported records
+        """
+        self.progress_callback = progress_callback
+        self.timing_callback = timing_callback
+        self.parent = parent
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.blocks = collections.Counter()
+            self.bytes_read = 0
+            self.reads = 0
+            self.seeks = 0
+            self.records_decoded = 0
+            self.values_converted = 0
+            self.times = collections.Counter()
+            self.calls = collections.Counter()
+        return
+
+    def count_block(self,block_id):
+        with self.lock:
+            self.blocks[block_id] += 1
+        if self.parent is not None:
+            self.parent.count_block(block_id)
+        return
+
+    def count_read(self,nbytes):
+        with self.lock:
+            self.reads += 1
+            self.bytes_read += nbytes
+        if self.parent is not None:
+            self.parent.count_read(nbytes)
+        return
+
+    def count_seek(self):
+        with self.lock:
+            self.seeks += 1
+        if self.parent is not None:
+            self.parent.count_seek()
+        return
+
+    def count_records(self,num):
+        with self.lock:
+            self.records_decoded += num
+        if self.parent is not None:
+            self.parent.count_records(num)
+        return
+
+    def count_values(self,num):
+        with self.lock:
+            self.values_converted += num
+        if self.parent is not None:
+            self.parent.count_values(num)
+        return
+
+    def add_time(self,phase,seconds):
+        with self.lock:
+            self.times[phase] += seconds
+            self.calls[phase] += 1
+        if self.timing_callback is not None:
+            self.timing_callback(phase,seconds)
+        if self.parent is not None:
+            self.parent.add_time(phase,seconds)
+        return
+
+    def progress(self,phase,done,total=None):
+        if self.progress_callback is not None:
+            self.progress_callback(phase,done,total)
+        if self.parent is not None:
+            self.parent.progress(phase,done,total)
+        return
+
+    @contextlib.contextmanager
+    def phase(self,name):
+        """
+        times the code inside a with statement
+        @param name: the name of the phase
+        """
+        strt = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_time(name,time.perf_counter()-strt)
+
+    def get_statistics(self):
+        """
+        @return: a dictionary with the number of blocks parsed per block id, bytes read, read and seek calls,
+                 records decoded, values converted and the seconds and number of timed sections per phase
+        """
+        with self.lock:
+            return {"blocks":dict(self.blocks),
+                    "bytes_read":self.bytes_read,
+                    "reads":self.reads,
+                    "seeks":self.seeks,
+                    "records_decoded":self.records_decoded,
+                    "values_converted":self.values_converted,
+                    "times":dict(self.times),
+                    "calls":dict(self.calls),
+                    }
+
+
+class _instrumented_file():
+
+    def __init__(self,f,instrumentation):
+        """
+        file object wrapper that counts reads and seeks
+        @param f: the file object
+        @param instrumentation: the instrumentation object of the file
+        @return: the wrapped file object
+        """
+        self.f = f
+        self.instrumentation = instrumentation
+
+    def read(self,size=-1):
+        data = self.f.read(size)
+        self.instrumentation.count_read(len(data))
+        return data
+
+    def seek(self,offset,whence=os.SEEK_SET):
+        self.instrumentation.count_seek()
+        return self.f.seek(offset,whence)
+
+    def __getattr__(self,name):
+        return getattr(self.f,name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.f.close()
+        return False
+
+
+class _record_file():
+
+    def __init__(self,f,foffset):
+        """
+        file object wrapper for the records of a contiguous data block
+        @param f: the file object
+        @param foffset: the offset of the data block in the file
+        @return: the wrapped file object, offset 0 is the first record
+        """
+        self.f = f
+        self.foffset = foffset
+
+    def read(self,size=-1):
+        return self.f.read(size)
+
+    def seek(self,offset,whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            offset += self.foffset
+        return self.f.seek(offset,whence)-self.foffset
+
+    def tell(self):
+        return self.f.tell()-self.foffset
+
+    def __getattr__(self,name):
+        return getattr(self.f,name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.f.close()
+        return False
+
+
+def _open_file(fname,instr=None):
+    """
+    opens an mdf file for reading
+    @param fname: path to file
+    @param instr: the instrumentation object of the mdf object that reads or None
+    @return: a seekable binary file object, reads and seeks are counted if instr is given
+    """
+    f = open_source(fname)
+    if instr is not None:
+        return _instrumented_file(f=f,instrumentation=instr)
+    return f
+
+
+class _minmax_pyramid():
+
+    def __init__(self,chunks,count,bucket_size=OVERVIEW_BUCKET_SIZE,factor=OVERVIEW_LEVEL_FACTOR):
+        """
+        multi resolution min/max/mean overview of channels, built in one pass over the data
+        @param chunks: a generator that yields (timestamps,list of value arrays) with chunk sizes divisible by bucket_size
+        @param count: the number of value arrays per chunk
+        @param bucket_size: the number of records per bucket of the finest level
+        @param factor: the number of buckets combined into one bucket of the next coarser level
+        @return: the pyramid object with one list of levels per channel, finest level first
+        """
+        self.bucket_size = bucket_size
+        finest = [[] for i in range(count)]
+        for t,vals in chunks:
+            ones = np.ones(len(t),dtype=np.int64)
+            for idx,val in enumerate(vals):
+                val = np.asarray(val,dtype=np.float64)
+                finest[idx].append(_reduce_buckets(t,val,val,val,ones,bucket_size))
+        self.levels = []
+        for parts in finest:
+            if not parts:
+                self.levels.append([])
+                continue
+            levels = [_concatenate_levels(parts),]
+            while len(levels[-1]["time"]) > factor:
+                level = levels[-1]
+                levels.append(_reduce_buckets(level["time"],level["min"],level["max"],level["sum"],level["count"],factor))
+            self.levels.append(levels)
+
+    def get_levels(self,idx):
+        return self.levels[idx]
+
+
+class mdf_block():
+    
+    def __init__(self,fobj,foffset,bord='little',*args,**kwargs):
+        """
+        parent class for all block structures in the mdf file
+        @param fobj: the file object
+        @param foffset: the offset in the file where the block starts 
+        @param bord: byte order of the block size
+        @return: the block as an object        
+        """
+        self.data = bytearray()
+        self.block_data = {}
+        if fobj:
+            if foffset:
+                fobj.seek(foffset)
+            self.data.extend(fobj.read(4))
+            if len(self.data) >= 4:
+                block_id = self.data[:2].decode()
+                instr = getattr(fobj,"instrumentation",None)
+                if instr is not None:
+                    instr.count_block(block_id)
+                if bord == 'little':
+                    fmtprefix = '<'
+                else:
+                    fmtprefix = '>'
+                block_size = struct.unpack("{0}H".format(fmtprefix),self.data[2:4])[0]
+                self.data.extend(fobj.read(block_size-len(self.data)))
+                if len(self.data) != block_size:
+                    raise ValueError("Block {0} length invalid block_size={1} len(data)={2}".format(block_id,block_size,len(self.data)))
+                else:
+                    self.block_data.update({"block_id":block_id})
+
+    def __str__(self):
+        return str(self.block_data)
+
+    
+class id_block(mdf_block):
+
+    def __init__(self,fobj,foffset=0,*args,**kwargs):
+        """
+        the id block at the top of each mdf file,
+        located at the first 64 bytes,
+        there is one id block in one mdf file,
+        gives basic file information
+        @param fobj: the file object
+        @param foffset: the offset in the file where the block starts 
+        @return: the block as an object
+        """        
+        self.block_data = {"block_id":"ID"}
+        self.data = fobj.read(64)
+        instr = getattr(fobj,"instrumentation",None)
+        if instr is not None:
+            instr.count_block("ID")
+        self.block_data.update(_interpret_id_block(self.data))
+        self.text = self.block_data.pop("file_identifier")
+
+    def get_version(self):
+        return self.block_data['version_number']
+
+    def get_byte_order(self):
+        return self.block_data['default_byte_order']
+
+    def __str__(self):
+        return self.text
+
+
+class hd_block(mdf_block):
+
+    def __init__(self,fobj,vers,bord,ignore_channels=[],foffset=64,*args,**kwargs):
+        """
+        header block for the mdf file
+        @param fobj: the file object
+        @param foffset: the offset in the file where the block starts, 64 bytes for hd block 
+        @param vers: mdf file version 
+        @param bord: byte order of contents
+        @param ignore_channels: a list of strings which channels are to be ignored, i.e. program specific stuff         
+        @return: the block as an object
+        """
+        super(hd_block,self).__init__(fobj=fobj,foffset=foffset,bord=bord,*args,**kwargs)
+        assert(self.block_data["block_id"] == "HD")
+        self.block_data.update(_interpret_hd_block(data=self.data,vers=vers,bord=bord))
+
+
+        self.author = self.block_data.pop("author")
+        self.organisation = self.block_data.pop("organisation")
+        self.project = self.block_data.pop("project")
+        self.subject = self.block_data.pop("subject")
+        self.timestamp = self.block_data.pop("timestamp")
+
+        self.ignore_channels = ignore_channels
+        self.can_index = None
+        
+        self.data_groups = []
+        dg_ptr = self.block_data.pop("data_group_pointer")
+        while dg_ptr > 0:
+            dgb = dg_block(fobj=fobj,vers=vers,bord=bord,foffset=dg_ptr,timestamp=self.timestamp,ignore_channels=self.ignore_channels)
+            self.data_groups.append(dgb)
+            dg_ptr = dgb.block_data.pop("next_data_group_pointer")       
+
+        self.text = ""
+        ct_ptr = self.block_data.pop("comment_text_pointer")
+        if ct_ptr:
+            self.text = str(tx_block(fobj=fobj,vers=vers,bord=bord,foffset=ct_ptr))
+
+        pb_ptr = self.block_data.pop("program_block_pointer")
+        self.program_data = None
+        if pb_ptr:
+            self.program_data = pr_block(fobj=fobj,vers=vers,bord=bord,foffset=ct_ptr)["data"]
+
+
+        self.number_of_data_groups = self.block_data.pop("number_of_data_groups")
+        assert (self.number_of_data_groups == len(self.data_groups))
+        self.resolve_dependencies()
+
+    def resolve_dependencies(self):
+        """
+        resolves the cd blocks of all channels to their data group, channel group and channel
+        """
+        channels = {}
+        composed = []
+        for dg in self.get_data_groups():
+            for cg in dg.get_channel_groups():
+                for ch in cg.get_channels():
+                    channels[ch.foffset] = (dg,cg,ch)
+                    if ch.dependencies is not None:
+                        composed.append(ch)
+        for ch in composed:
+            ch.dependencies.resolve(channels)
+        return
+
+    def get_can_index(self):
+        """
+        @return: a dictionary of (can channel, message id, message name, sender): list of (data group, channel)
+        @note: built from the Vector CAN extentions of the channels on first use
+        """
+        if self.can_index is None:
+            index = {}
+            for dg in self.get_data_groups():
+                for cg in dg.get_channel_groups():
+                    for ch in cg.get_channels():
+                        if ch.extentions is None or ch.get_channel_type() != "data" or not ch.get_short_name():
+                            continue
+                        key = ch.extentions.get_can_message()
+                        if key is not None:
+                            index.setdefault(key,[]).append((dg,ch))
+            self.can_index = index
+        return self.can_index
+
+    def find_can_signals(self,can_channel=None,message_id=None,message_name=None,sender=None):
+        """
+        @param can_channel: the index of the can channel, None for any
+        @param message_id: the identifier of the can message, None for any
+        @param message_name: the name of the message, None for any
+        @param sender: the name of the sending ecu, None for any
+        @return: a list of tuples (message, data group, channel) of the signals of the matching messages,
+                 message is the key of get_can_index
+        """
+        ret = []
+        for key,signals in sorted(self.get_can_index().items()):
+            if all([val is None or val == other for val,other in zip((can_channel,message_id,message_name,sender),key)]):
+                ret.extend([(key,dg,ch) for dg,ch in signals])
+        return ret
+
+    def get_composed_channel_short_names(self):
+        """
+        @return: the short names of the channels with dependencies, e.g. calibration maps and curves
+        """
+        return [ch.get_short_name() for dg in self.get_data_groups() for cg in dg.get_channel_groups()
+                for ch in cg.get_channels() if ch.dependencies is not None and ch.get_short_name()]
+  
+    def __str__(self):
+        return self.text
+
+    def get_data_groups(self):
+        return self.data_groups
+
+    def print_data_group_statistics(self):
+        data_groups = self.get_data_groups()
+        for idx,dg in enumerate(data_groups):
+            strt,stp = dg.calc_data_block_range()
+            basestr = "Block {0} of {1}".format(idx+1,len(data_groups))
+            if strt:
+                print("{0}, Raw Data Block from {1:08X} to {2:08X}(included)".format(basestr,strt,stp))
+            else:
+                print("{0}, No Raw Data Block".format(basestr))
+        return
+                
+    def check_data_block_consistency(self):
+        data_groups = self.get_data_groups()
+        blocks = []
+        for idx,dg in enumerate(data_groups):
+            strt,stp = dg.calc_data_block_range()
+            if strt:
+                blocks.append((strt,stp))
+        for idx in range(len(blocks)-1):
+            if blocks[idx][1]+1 != blocks[idx+1][0]:
+                raise NotImplementedError("Inconsistent Data Blocks [from,to] {0} (X) {1} (X+1)".format(blocks[idx],blocks[idx+1]))
         return True
             
     def print_hierachy(self,pad=0):
@@ -633,16 +2199,56 @@ class hd_block(mdf_block):
                 return ch
         return None
 
-    def get_records_with_timestamp(self,fname,short_names,useabsolutetime=False):
+    def get_records_with_timestamp(self,fname,short_names,useabsolutetime=False,raw=False):
         for dg in self.get_data_groups():
             if useabsolutetime:
-                recs = dg.get_records_with_timestamp(fname=fname,short_names=short_names,starttime=self.timestamp)
+                recs = dg.get_records_with_timestamp(fname=fname,short_names=short_names,starttime=self.timestamp,raw=raw)
             else:
-                recs = dg.get_records_with_timestamp(fname=fname,short_names=short_names)
+                recs = dg.get_records_with_timestamp(fname=fname,short_names=short_names,raw=raw)
             if recs:
                 return recs
         return None
 
+    def get_number_of_available_records(self,fname,dg,finished=True):
+        """
+        number of complete records of a data group
+        @param fname: path to file
+        @param dg: the data group
+        @param finished: False for files that are still written, e.g. file identifier UnFinMF
+        @return: the number of records
+        @note: for unfinished files the number is derived from the file size, the data block
+               ends at the next data block or at the end of the file
+        """
+        ret = 0
+        for cg in dg.get_channel_groups():
+            ret = cg.get_number_of_records()
+            if not finished and dg.data_block_ptr and cg.get_record_size():
+                end = os.path.getsize(fname)
+                for other in self.get_data_groups():
+                    if dg.data_block_ptr < other.data_block_ptr < end:
+                        end = other.data_block_ptr
+                ret = max(ret,(end-dg.data_block_ptr)//cg.get_record_size())
+        return ret
+
+    def get_data_groups_for_channels(self,short_names):
+        """
+        groups short names by the data group they are stored in
+        @param short_names: a list of strings
+        @return: a list of tuples (data group, list of short names) in order of first appearance
+        """
+        ret = []
+        for short_name in short_names:
+            dg = self.get_data_group_for_channel(short_name=short_name)
+            if dg is None:
+                raise KeyError("Channel {0} not found".format(short_name))
+            for entry in ret:
+                if entry[0] is dg:
+                    entry[1].append(short_name)
+                    break
+            else:
+                ret.append((dg,[short_name,]))
+        return ret
+
 
 class tx_block(mdf_block):
 
@@ -655,7 +2261,7 @@ class tx_block(mdf_block):
         @param bord: byte order of contents         
         @return: the string contained in the text block
         """
-        super(tx_block,self).__init__(fobj=fobj,foffset=foffset,*args,**kwargs)
+        super(tx_block,self).__init__(fobj=fobj,foffset=foffset,bord=bord,*args,**kwargs)
         assert(self.block_data["block_id"] == "TX")
         self.block_data.update(_interpret_tx_block(data=self.data,vers=vers,bord=bord))
 
@@ -674,7 +2280,7 @@ class pr_block(mdf_block):
         @param bord: byte order of contents         
         @return: the block as an object
         """  
-        super(pr_block,self).__init__(fobj=fobj,foffset=foffset,*args,**kwargs)
+        super(pr_block,self).__init__(fobj=fobj,foffset=foffset,bord=bord,*args,**kwargs)
         assert(self.block_data["block_id"] == "PR")
         self.block_data.update(_interpret_pr_block(data=self.data,vers=vers,bord=bord))
 
@@ -694,7 +2300,7 @@ class dg_block(mdf_block):
         @param ignore_channels: a list of strings which channels are to be ignored, i.e. program specific stuff
         @return: the block as an object        
         """           
-        super(dg_block,self).__init__(fobj=fobj,foffset=foffset,*args,**kwargs)
+        super(dg_block,self).__init__(fobj=fobj,foffset=foffset,bord=bord,*args,**kwargs)
         assert(self.block_data["block_id"] == "DG")
         self.block_data.update(_interpret_dg_block(data=self.data,vers=vers,bord=bord))
 
@@ -817,13 +2423,57 @@ class dg_block(mdf_block):
                 return ch
         return None
 
-    def get_records_with_timestamp(self,fname,short_names,starttime=None):
+    def get_records_with_timestamp(self,fname,short_names,starttime=None,raw=False):
         for cg in self.get_channel_groups():
             #print(cg)
-            recs = cg.get_records_with_timestamp(fname=fname,foffset=self.data_block_ptr,short_names=short_names,starttime=starttime)
+            recs = cg.get_records_with_timestamp(fname=fname,foffset=self.data_block_ptr,short_names=short_names,starttime=starttime,raw=raw)
             if recs:
                 return recs
         return None
+
+    def iter_columns(self,fname,short_names=None,chunk_size=DEFAULT_CHUNK_SIZE,start=0,stop=None,num_recs=None,raw=False,compact=None):
+        #a sorted mdf file contains only one channel group per data group
+        for cg in self.get_channel_groups():
+            return cg.iter_columns(fname=fname,foffset=self.data_block_ptr,short_names=short_names,chunk_size=chunk_size,start=start,stop=stop,
+                                   num_recs=num_recs,raw=raw,compact=compact)
+        return iter([])
+
+    def get_time_range(self,fname):
+        for cg in self.get_channel_groups():
+            return cg.get_time_range(fname=fname,foffset=self.data_block_ptr)
+        return None
+
+    def find_record_index(self,fname,timestamp,side="left"):
+        for cg in self.get_channel_groups():
+            return cg.find_record_index(fname=fname,foffset=self.data_block_ptr,timestamp=timestamp,side=side)
+        return 0
+
+    def get_composed(self,fname,ch,start=0,stop=None,raw=False,chunk_size=DEFAULT_CHUNK_SIZE):
+        for cg in self.get_channel_groups():
+            return cg.get_composed(fname=fname,foffset=self.data_block_ptr,ch=ch,start=start,stop=stop,raw=raw,chunk_size=chunk_size)
+        return None
+
+    def find_record_range(self,fname,start=None,stop=None):
+        """
+        @param fname: path to file
+        @param start: start of the time range in seconds, None for the first record
+        @param stop: end of the time range in seconds (included), None for the last record
+        @return: a tuple of the index of the first record and the index after the last record
+        """
+        first = 0
+        last = 0
+        for cg in self.get_channel_groups():
+            last = cg.get_number_of_records()
+        if start is not None:
+            first = self.find_record_index(fname=fname,timestamp=start)
+        if stop is not None:
+            last = self.find_record_index(fname=fname,timestamp=stop,side="right")
+        return (first,max(first,last))
+
+    def get_trigger_events(self):
+        if self.trigger_block:
+            return self.trigger_block.trigger_events
+        return []
     
             
 class cg_block(mdf_block):
@@ -838,14 +2488,17 @@ class cg_block(mdf_block):
         @param ignore_channels: a list of strings which channels are to be ignored, i.e. program specific stuff
         @return: the block as an object         
         """ 
-        super(cg_block,self).__init__(fobj=fobj,foffset=foffset,*args,**kwargs)
+        super(cg_block,self).__init__(fobj=fobj,foffset=foffset,bord=bord,*args,**kwargs)
         assert(self.block_data["block_id"] == "CG")
+        #the records are read with the instrumentation of the mdf object that read the tree
+        self.instrumentation = getattr(fobj,"instrumentation",None)
         self.block_data.update(_interpret_cg_block(data=self.data,vers=vers,bord=bord))
 
         self.ignore_channels = ignore_channels#needed to filter out INCA related program SPAM
         self.bord = bord
         self.records = []
         self.channels = []
+        self.derived_channels = []
         self.time_channel_idx = None
         chb_ptr = self.block_data.pop("first_channel_pointer")
         while chb_ptr > 0:
@@ -869,6 +2522,14 @@ class cg_block(mdf_block):
         self.record_size = self.block_data.pop("record_size")
         self.number_of_records = self.block_data.pop("number_of_records")
 
+        self.sample_reductions = []
+        srb_ptr = self.block_data.pop("first_sample_reduction_block_pointer",0)
+        while srb_ptr > 0:
+            srb = sr_block(fobj=fobj,vers=vers,bord=bord,foffset=srb_ptr)
+            self.sample_reductions.append(srb)
+            srb_ptr = srb.block_data.pop("next_sample_reduction_block_pointer")
+        self.sample_reductions.sort(key = lambda x: x.length_of_time_interval)
+
     def __str__(self):
         return self.text
         
@@ -899,11 +2560,18 @@ class cg_block(mdf_block):
         return
 
     def get_channel_by_short_name(self,short_name):
-        for ch in self.get_channels():
+        for ch in self.get_channels()+self.derived_channels:
             if ch.get_short_name().startswith(short_name):
                 return ch
         return None
 
+    def add_derived_channel(self,ch):
+        self.derived_channels.append(ch)
+        return
+
+    def get_derived_channels(self):
+        return self.derived_channels
+
     def get_channel_index(self,short_name):
         for idx,ch in enumerate(self.get_channels()):
             if ch.get_short_name().startswith(short_name):
@@ -918,7 +2586,7 @@ class cg_block(mdf_block):
         return None
     
     #this function needs to implement the binary data transformation    
-    def get_records_with_timestamp(self,fname,foffset,short_names=None,starttime=None):
+    def get_records_with_timestamp(self,fname,foffset,short_names=None,starttime=None,raw=False):
         rec_size = self.get_record_size()
         chs = self.get_channels()
         rec_num = self.get_number_of_records()
@@ -941,40 +2609,372 @@ class cg_block(mdf_block):
             channel_names = self.get_channel_short_names()
         
 
-        for chn in channel_names:
-            channel_idxs.append(self.get_channel_index(short_name=chn))
-        #prepared list of names and list of indexes
-                
-        time_channel_index = self.get_time_channel_index()
-        
-        if foffset:
-            with open(fname,'rb') as f:
-                f.seek(foffset)
-                for rec_idx in range(rec_num):
-                    rec = bytearray(f.read(rec_size))
-                    vals = _interpret_record(rec=rec,chs=chs,bord=self.bord)
-                    timestamp = vals.pop(time_channel_index)
-                    
-                    if starttime:
-                        ret = {timestamp+starttime:vals}
-                    else:
-                        ret = {timestamp:vals}
-                    yield ret 
-        else:
+        for chn in channel_names:
+            channel_idxs.append(self.get_channel_index(short_name=chn))
+        #prepared list of names and list of indexes
+                
+        time_channel_index = self.get_time_channel_index()
+        derived_rows = None
+        if foffset and self.derived_channels:
+            #derived values are evaluated column wise and appended to each record
+            derived_rows = self._iter_derived_rows(fname=fname,foffset=foffset)
+        
+        if foffset:
+            state = "physical"
+            if raw:
+                state = "raw"
+            cached = self.get_cached_columns(fname=fname,foffset=foffset,chs=chs,state=state)
+            if raw:
+                #timestamps are always physical
+                cached[time_channel_index] = self.get_cached_columns(fname=fname,foffset=foffset,chs=[chs[time_channel_index],])[0]
+            if all(col is not None and len(col) >= rec_num for col in cached):
+                #serve the records from the column cache
+                for rec_idx in range(0,rec_num,DEFAULT_CHUNK_SIZE):
+                    stop = min(rec_idx+DEFAULT_CHUNK_SIZE,rec_num)
+                    rows = zip(*[col[rec_idx:stop].tolist() for col in cached])
+                    for vals in rows:
+                        vals = list(vals)
+                        if derived_rows is not None:
+                            vals.extend(next(derived_rows))
+                        timestamp = datetime.timedelta(seconds=vals.pop(time_channel_index))
+                        if starttime:
+                            yield {timestamp+starttime:vals}
+                        else:
+                            yield {timestamp:vals}
+                return
+            with self._open_records(fname=fname,foffset=foffset) as f:
+                instr = getattr(f,"instrumentation",None)
+                if instr is not None:
+                    num_conversions = len([ch for ch in chs if ch.get_conversion_formula() != None and not raw])
+                    decode_time = 0
+                f.seek(0)
+                for rec_idx in range(rec_num):
+                    rec = bytearray(f.read(rec_size))
+                    if instr is None:
+                        vals = _interpret_record(rec=rec,chs=chs,bord=self.bord,raw=raw)
+                    else:
+                        strt = time.perf_counter()
+                        vals = _interpret_record(rec=rec,chs=chs,bord=self.bord,raw=raw)
+                        decode_time += time.perf_counter()-strt
+                        if not (rec_idx+1)%PROGRESS_INTERVAL or rec_idx+1 == rec_num:
+                            #report in batches, timing each record would flood the callbacks
+                            num = (rec_idx%PROGRESS_INTERVAL)+1
+                            instr.add_time("decode",decode_time)
+                            instr.count_records(num)
+                            instr.count_values(num*num_conversions)
+                            instr.progress("decode",rec_idx+1,rec_num)
+                            decode_time = 0
+                    if derived_rows is not None:
+                        vals.extend(next(derived_rows))
+                    timestamp = vals.pop(time_channel_index)
+                    
+                    if starttime:
+                        ret = {timestamp+starttime:vals}
+                    else:
+                        ret = {timestamp:vals}
+                    yield ret 
+        else:
+            return None
+        
+        
+#         for i in range(self.get_number_of_records()):
+#             this_record_dict = {}
+#             for chname,chidx in zip(channel_names,channel_idxs):
+#                 this_record_dict.update({chname:self.records[i][chidx]})
+#                 
+#             if starttime:
+#                 rec = {self.records[i][time_channel_index]+starttime:this_record_dict}
+#             else:
+#                 rec = {self.records[i][time_channel_index]:this_record_dict}
+#             yield rec
+
+    def _iter_derived_rows(self,fname,foffset):
+        """
+        generator of the values of all derived channels record by record
+        """
+        for t,cols in self.iter_columns(fname=fname,foffset=foffset,short_names=[ch.get_short_name() for ch in self.derived_channels]):
+            for row in zip(*[col.tolist() for col in cols]):
+                yield row
+        return
+
+    def get_channels_by_query(self,short_names=None):
+        """
+        resolves short names the same way get_channel_by_short_name does
+        @param short_names: a string, a list of strings or None for all data channels,
+                            channel objects in the list are taken as they are
+        @return: a list of channel objects
+        """
+        if short_names is None:
+            return [ch for ch in self.get_channels()+self.derived_channels if ch.get_channel_type() == "data" and ch.get_short_name()]
+        if isinstance(short_names,str):
+            short_names = [short_names,]
+        ret = []
+        for short_name in short_names:
+            if isinstance(short_name,(cn_block,derived_channel)):
+                ret.append(short_name)
+                continue
+            ch = self.get_channel_by_short_name(short_name=short_name)
+            if ch:
+                ret.append(ch)
+        return ret
+
+    def iter_columns(self,fname,foffset,short_names=None,chunk_size=DEFAULT_CHUNK_SIZE,start=0,stop=None,num_recs=None,raw=False,compact=None):
+        """
+        generator for column wise decoding of the data block
+        @param fname: path to file
+        @param foffset: the offset of the data block in the file
+        @param short_names: a string, a list of strings or None for all data channels
+        @param chunk_size: the number of records decoded at once
+        @param start: index of the first record
+        @param stop: index after the last record, None for all records
+        @param num_recs: the number of records in the data block, None to use the number of the channel group
+        @param raw: True for the stored values of the data channels, see cn_block.convert
+        @param compact: a list with one bool per channel, True to yield a change_column instead of the value array,
+                        None for value arrays only, see _get_compact_flags
+        @return: yields tuples of (timestamps, list of value arrays), timestamps are seconds
+        @note: compact reads are not put into the column cache, that would keep the expanded values
+        """
+        rec_size = self.get_record_size()
+        chs = self.get_channels_by_query(short_names)
+        time_channel = self.get_time_channel()
+        if num_recs is None:
+            num_recs = self.get_number_of_records()
+        if stop is None or stop > num_recs:
+            stop = num_recs
+        if not foffset:
+            return
+        state = "physical"
+        if raw:
+            state = "raw"
+        cached = self.get_cached_columns(fname=fname,foffset=foffset,chs=[time_channel,],state="physical")
+        cached += self.get_cached_columns(fname=fname,foffset=foffset,chs=chs,state=state)
+        if all(col is not None and len(col) >= stop for col in cached):
+            for rec_idx in range(start,stop,chunk_size):
+                yield _compact_chunk((cached[0][rec_idx:min(rec_idx+chunk_size,stop)],[col[rec_idx:min(rec_idx+chunk_size,stop)] for col in cached[1:]]),
+                                     flags=compact)
+            return
+        #only complete columns are cached
+        collect = (start == 0 and stop == self.get_number_of_records()
+                   and stop*rec_size <= _column_cache.byte_budget and not compact)
+        parts = []
+        streams = {}#column streams of inputs of derived channels in other data groups
+        with self._open_records(fname=fname,foffset=foffset) as f:
+            instr = getattr(f,"instrumentation",None)
+            f.seek(start*rec_size)
+            rec_idx = start
+            while rec_idx < stop:
+                num_recs = min(chunk_size,stop-rec_idx)
+                buf = f.read(num_recs*rec_size)
+                num_recs = len(buf)//rec_size
+                if not num_recs:
+                    break
+                recs = np.frombuffer(buf,dtype=np.uint8,count=num_recs*rec_size).reshape(num_recs,rec_size)
+                timestamps = _interpret_column(recs=recs,ch=time_channel,bord=self.bord,instr=instr)
+                if self.derived_channels:
+                    chunk = (timestamps,self._decode_chunk(fname=fname,recs=recs,timestamps=timestamps,chs=chs,raw=raw,
+                                                           instr=instr,streams=streams,chunk_size=chunk_size))
+                else:
+                    chunk = (timestamps,[_interpret_column(recs=recs,ch=ch,bord=self.bord,instr=instr,raw=raw) for ch in chs])
+                if instr is not None:
+                    instr.count_records(num_recs)
+                    instr.progress("decode",rec_idx+num_recs-start,stop-start)
+                if collect:
+                    parts.append(chunk)
+                yield _compact_chunk(chunk,flags=compact)
+                rec_idx += num_recs
+                if len(buf)%rec_size:
+                    #the read ended in a partly written record, the file position is no longer at a record
+                    break
+        if collect and rec_idx == stop:
+            t,vals = _concatenate_chunks(parts,count=len(chs))
+            self.put_cached_columns(fname=fname,foffset=foffset,chs=[time_channel,],cols=[t,])
+            self.put_cached_columns(fname=fname,foffset=foffset,chs=chs,cols=vals,state=state)
+        return
+
+    def _decode_chunk(self,fname,recs,timestamps,chs,raw,instr,streams,chunk_size):
+        """
+        decodes channels of a chunk of records, derived channels are evaluated from their inputs
+        @param streams: a dictionary of column streams of inputs in other data groups, kept across the chunks of one read
+        @return: a list of value arrays in order of chs
+        @note: every input is decoded or aligned once per chunk, no matter how many derived channels use it
+        """
+        decoded = {}
+
+        def decode(ch,raw=False):
+            key = (id(ch),raw)
+            if key not in decoded:
+                if isinstance(ch,derived_channel):
+                    decoded[key] = ch.evaluate(decode=decode,align=align,num=len(timestamps))
+                else:
+                    decoded[key] = _interpret_column(recs=recs,ch=ch,bord=self.bord,instr=instr,raw=raw)
+            return decoded[key]
+
+        def align(dg,short_name,method):
+            key = (id(dg),short_name,method)
+            if key not in decoded:
+                if key not in streams:
+                    #start at the last sample before the chunk
+                    first = max(dg.find_record_index(fname=fname,timestamp=timestamps[0],side="right")-1,0)
+                    chunks = dg.iter_columns(fname=fname,short_names=[short_name,],chunk_size=chunk_size,start=first)
+                    streams[key] = _column_stream(chunks=chunks,count=1)
+                decoded[key] = streams[key].align(tt=timestamps,method=method)[0]
+            return decoded[key]
+
+        return [decode(ch,raw=raw) for ch in chs]
+
+    def read_records(self,fname,foffset,indexes):
+        """
+        reads records by index
+        @param fname: path to file
+        @param foffset: the offset of the data block in the file
+        @param indexes: a sorted array of unique record indexes
+        @return: a 2d uint8 numpy array with one record per row in order of indexes
+        @note: records closer than RECORD_GAP_BYTES are read in one go, the others are read with one seek each
+        """
+        rec_size = self.get_record_size()
+        if not (foffset and len(indexes)):
+            return np.empty((0,rec_size),dtype=np.uint8)
+        splits = np.flatnonzero(np.diff(indexes) > 1+(RECORD_GAP_BYTES//rec_size))+1
+        parts = []
+        with self._open_records(fname=fname,foffset=foffset,sequential=False) as f:
+            for run in np.split(indexes,splits):
+                first = int(run[0])
+                f.seek(first*rec_size)
+                buf = f.read((int(run[-1])+1-first)*rec_size)
+                recs = np.frombuffer(buf,dtype=np.uint8,count=(len(buf)//rec_size)*rec_size).reshape(-1,rec_size)
+                parts.append(recs[run-first])
+        return np.concatenate(parts)
+
+    def get_composed(self,fname,foffset,ch,start=0,stop=None,raw=False,chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        reads a channel with dependencies, e.g. a calibration map, as one array
+        @param fname: path to file
+        @param foffset: the offset of the data block in the file
+        @param ch: the channel with the cd block
+        @param start: index of the first record
+        @param stop: index after the last record, None for all records
+        @param raw: True for the stored values of the elements
+        @param chunk_size: the number of records read at once
+        @return: a tuple (timestamps, array of shape (number of records,)+shape of the dependencies)
+        @note: the records are read chunk by chunk into the result, so only one chunk of records is held besides it,
+               raw values and elements without conversion are copied out of a strided view of the records,
+               converted elements are decoded column wise and stacked
+        """
+        chs = ch.dependencies.get_channels()
+        if any([target[1] is not self for target in ch.dependencies.targets]):
+            raise NotImplementedError("Dependencies of {0} in other channel groups".format(ch.get_short_name()))
+        shape = ch.dependencies.get_shape()
+        rec_size = self.get_record_size()
+        num_recs = self.get_number_of_records()
+        if stop is None or stop > num_recs:
+            stop = num_recs
+        unconverted = raw or all([element.get_column_conversion_formula() is None for element in chs])
+        timestamps = []
+        ret = None
+        position = 0
+        if foffset and stop > start:
+            with self._open_records(fname=fname,foffset=foffset) as f:
+                f.seek(start*rec_size)
+                for rec_idx in range(start,stop,chunk_size):
+                    buf = f.read(min(chunk_size,stop-rec_idx)*rec_size)
+                    num_recs = len(buf)//rec_size
+                    if not num_recs:
+                        break
+                    recs = np.frombuffer(buf,dtype=np.uint8,count=num_recs*rec_size).reshape(num_recs,rec_size)
+                    timestamps.append(_interpret_column(recs=recs,ch=self.get_time_channel(),bord=self.bord))
+                    vals = None
+                    if unconverted:
+                        vals = _composed_view(buf=buf,num_recs=num_recs,rec_size=rec_size,chs=chs,shape=shape,bord=self.bord)
+                    if vals is None:
+                        cols = [_interpret_column(recs=recs,ch=element,bord=self.bord,raw=raw) for element in chs]
+                        vals = np.stack(cols,axis=1).reshape((num_recs,)+shape)
+                    if ret is None:
+                        #native byte order like the columnar readers, the copy out of the view swaps the bytes
+                        ret = np.empty((stop-start,)+shape,dtype=vals.dtype.newbyteorder("="))
+                    ret[position:position+num_recs] = vals
+                    position += num_recs
+        if ret is None:
+            return (np.empty(0),np.empty((0,)+shape))
+        return (np.concatenate(timestamps),ret[:position])
+
+    def _open_records(self,fname,foffset,sequential=True):
+        """
+        opens the records of the channel group
+        @param fname: path to file
+        @param foffset: the offset of the data block in the file
+        @param sequential: False for random access, e.g. a binary search
+        @return: a file object whose offset 0 is the start of the first record
+        """
+        return _record_file(f=_open_file(fname,instr=self.instrumentation),foffset=foffset)
+
+    def get_cached_columns(self,fname,foffset,chs,state="physical"):
+        """
+        looks up complete columns in the process wide column cache
+        @param fname: path to file
+        @param foffset: the offset of the data block in the file
+        @param chs: the channels
+        @param state: the conversion state of the values
+        @return: a list with an array or None for each channel
+        """
+        file_key = _column_cache.get_file_key(fname)
+        return [_column_cache.get(self._get_cache_key(file_key,foffset,ch,state)) for ch in chs]
+
+    def put_cached_columns(self,fname,foffset,chs,cols,state="physical"):
+        file_key = _column_cache.get_file_key(fname)
+        for ch,col in zip(chs,cols):
+            _column_cache.put(self._get_cache_key(file_key,foffset,ch,state),col)
+        return
+
+    def _get_cache_key(self,file_key,foffset,ch,state):
+        if isinstance(ch,derived_channel):
+            #derived channels are always physical
+            return (file_key,foffset,ch.get_cache_key(),"physical")
+        return (file_key,foffset,self.channels.index(ch),state)
+
+    def get_sample_reductions(self):
+        return self.sample_reductions
+
+    def find_record_index(self,fname,foffset,timestamp,side="left"):
+        """
+        binary search on the time channel of the data block
+        @param fname: path to file
+        @param foffset: the offset of the data block in the file
+        @param timestamp: the time to search for in seconds
+        @param side: "left" for the first record at or after timestamp, "right" for the first record after timestamp
+        @return: the record index
+        @note: only the records visited by the search are read
+        """
+        rec_size = self.get_record_size()
+        time_channel = self.get_time_channel()
+        lo = 0
+        hi = self.get_number_of_records()
+        if not foffset:
+            return lo
+        with self._open_records(fname=fname,foffset=foffset,sequential=False) as f:
+            while lo < hi:
+                mid = (lo+hi)//2
+                f.seek(mid*rec_size)
+                rec = np.frombuffer(f.read(rec_size),dtype=np.uint8).reshape(1,rec_size)
+                t = _interpret_column(recs=rec,ch=time_channel,bord=self.bord)[0]
+                if t < timestamp or (side == "right" and t == timestamp):
+                    lo = mid+1
+                else:
+                    hi = mid
+        return lo
+
+    def get_time_range(self,fname,foffset):
+        """
+        reads the timestamps of the first and the last record
+        @param fname: path to file
+        @param foffset: the offset of the data block in the file
+        @return: a tuple (first,last) in seconds or None if there are no records
+        """
+        num_recs = self.get_number_of_records()
+        if not (foffset and num_recs):
             return None
-        
-        
-#         for i in range(self.get_number_of_records()):
-#             this_record_dict = {}
-#             for chname,chidx in zip(channel_names,channel_idxs):
-#                 this_record_dict.update({chname:self.records[i][chidx]})
-#                 
-#             if starttime:
-#                 rec = {self.records[i][time_channel_index]+starttime:this_record_dict}
-#             else:
-#                 rec = {self.records[i][time_channel_index]:this_record_dict}
-#             yield rec
-
+        first = next(self.iter_columns(fname=fname,foffset=foffset,short_names=[],chunk_size=1))[0][0]
+        last = next(self.iter_columns(fname=fname,foffset=foffset,short_names=[],chunk_size=1,start=num_recs-1))[0][0]
+        return (first,last)
 
     def channel_in_group(self,short_name):
         if self.get_channel_by_short_name(short_name=short_name):
@@ -987,7 +2987,7 @@ class cg_block(mdf_block):
 
     def get_channel_short_names(self):
         ret = []
-        for ch in self.get_channels():
+        for ch in self.get_channels()+self.derived_channels:
             if ch.get_channel_type() == "data":
                 sn = ch.get_short_name()
                 if sn:
@@ -1019,7 +3019,7 @@ class tr_block(mdf_block):
         @param bord: byte order of contents    
         @return: the block as an object           
         """
-        super(tr_block,self).__init__(fobj=fobj,foffset=foffset,*args,**kwargs)
+        super(tr_block,self).__init__(fobj=fobj,foffset=foffset,bord=bord,*args,**kwargs)
         assert(self.block_data["block_id"] == "TR")
         self.block_data.update(_interpret_tr_block(data=self.data,vers=vers,bord=bord))
 
@@ -1046,7 +3046,7 @@ class sr_block(mdf_block):
         @param bord: byte order of contents    
         @return: the block as an object                
         """  
-        super(sr_block,self).__init__(fobj=fobj,foffset=foffset,*args,**kwargs)
+        super(sr_block,self).__init__(fobj=fobj,foffset=foffset,bord=bord,*args,**kwargs)
         assert(self.block_data["block_id"] == "SR")
         self.block_data.update(_interpret_sr_block(data=self.data,vers=vers,bord=bord))
 
@@ -1054,6 +3054,30 @@ class sr_block(mdf_block):
         self.number_of_reduced_samples = self.block_data.pop("number_of_reduced_samples")
         self.length_of_time_interval = self.block_data.pop("length_of_time_interval")
 
+    def get_envelopes(self,fname,cg,short_names):
+        """
+        reads the reduced samples of the channel group
+        @param fname: path to file
+        @param cg: the channel group this block belongs to
+        @param short_names: a list of channel short names
+        @return: a tuple (timestamps, list of (mean,min,max) tuples), one tuple per short name
+        @note: each reduced sample consists of three records with the record layout of the channel group,
+               the first with the mean values, the second with the minimum and the third with the maximum values
+        """
+        rec_size = cg.get_record_size()
+        num_recs = self.number_of_reduced_samples
+        chs = cg.get_channels_by_query(short_names)
+        with _open_file(fname,instr=cg.instrumentation) as f:
+            f.seek(self.data_block_pointer)
+            buf = f.read(3*num_recs*rec_size)
+        num_recs = len(buf)//(3*rec_size)
+        recs = np.frombuffer(buf,dtype=np.uint8,count=3*num_recs*rec_size).reshape(num_recs,3,rec_size)
+        timestamps = _interpret_column(recs=recs[:,0,:],ch=cg.get_time_channel(),bord=cg.bord)
+        envelopes = []
+        for ch in chs:
+            envelopes.append(tuple(_interpret_column(recs=recs[:,idx,:],ch=ch,bord=cg.bord) for idx in range(3)))
+        return (timestamps,envelopes)
+
 
 class cn_block(mdf_block):   
     
@@ -1066,14 +3090,19 @@ class cn_block(mdf_block):
         @param bord: byte order of contents    
         @return: the block as an object           
         """   
-        super(cn_block,self).__init__(fobj=fobj,foffset=foffset,*args,**kwargs)
+        super(cn_block,self).__init__(fobj=fobj,foffset=foffset,bord=bord,*args,**kwargs)
         assert(self.block_data["block_id"] == "CN")
+        self.foffset = foffset
         self.block_data.update(_interpret_cn_block(data=self.data,vers=vers,bord=bord))
 
+        self.conversion_block = None
         self.conversion_formula = None
+        self.column_conversion_formula = None
         cf_ptr = self.block_data.pop("conversion_formula_pointer")
         if cf_ptr:
-            self.conversion_formula = cc_block(fobj=fobj,vers=vers,bord=bord,foffset=cf_ptr).get_conversion_function()
+            self.conversion_block = cc_block(fobj=fobj,vers=vers,bord=bord,foffset=cf_ptr)
+            self.conversion_formula = self.conversion_block.get_conversion_function()
+            self.column_conversion_formula = self.conversion_block.get_column_conversion_function()
             
         self.extentions = None
         sde_ptr = self.block_data.pop("extentions_pointer")
@@ -1124,6 +3153,20 @@ class cn_block(mdf_block):
     def get_conversion_formula(self):
         return self.conversion_formula
 
+    def convert(self,raw_values):
+        """
+        applies the conversion of the channel, e.g. to values read with raw=True
+        @param raw_values: a numpy array or a list of stored values
+        @return: a numpy array with the physical values, the values unchanged if the channel has no conversion
+        """
+        raw_values = np.asarray(raw_values)
+        if self.column_conversion_formula is None:
+            return raw_values
+        return self.column_conversion_formula(raw_values)
+
+    def get_column_conversion_formula(self):
+        return self.column_conversion_formula
+
     def get_channel_type(self):
         return self.channel_type
 
@@ -1137,6 +3180,90 @@ class cn_block(mdf_block):
 
 
 
+class derived_channel():
+
+    def __init__(self,name,expr,inputs,data_group,method="previous",unit="",engine="auto"):
+        """
+        virtual channel computed from other channels with an expression
+        @param name: the short name of the channel
+        @param expr: the expression, e.g. "trq*nEng*2*3.1416/60"
+        @param inputs: a dictionary of variable name: (data group, channel) of the inputs
+        @param data_group: the data group the channel belongs to, its timestamps are used
+        @param method: how inputs of other data groups are aligned, "previous", "linear" or "nearest"
+        @param unit: the physical unit
+        @param engine: "numexpr", "numpy" or "auto" for numexpr if it is installed and can evaluate the expression
+        @return: the channel object
+        @note: the expression is evaluated element wise chunk by chunk, the functions of EXPRESSION_FUNCTIONS and np are available
+        """
+        self.short_signal_name = name
+        self.expr = expr
+        self.inputs = inputs
+        self.data_group = data_group
+        self.method = method
+        self.unit = unit
+        self.signal_description = expr
+        self.conversion_block = None
+        self.range_valid = False
+        self.signal_min = 0.0
+        self.signal_max = 0.0
+        self.sampling_rate = 0.0
+        self.code = compile(expr,"<{0}>".format(name),"eval")
+        if engine == "auto":
+            engine = "numpy"
+            if importlib.util.find_spec("numexpr") is not None:
+                engine = "numexpr"
+        self.engine = engine
+
+    def __str__(self):
+        return "{0} = {1}".format(self.short_signal_name,self.expr)
+
+    def get_short_name(self):
+        return self.short_signal_name
+
+    def get_channel_type(self):
+        return "data"
+
+    def get_conversion_formula(self):
+        return None
+
+    def get_column_conversion_formula(self):
+        return None
+
+    def convert(self,raw_values):
+        return np.asarray(raw_values)
+
+    def get_cache_key(self):
+        return ("derived",self.short_signal_name,self.expr,self.method,
+                tuple(sorted((var,ch.get_short_name()) for var,(dg,ch) in self.inputs.items())))
+
+    def evaluate(self,decode,align,num):
+        """
+        evaluates the expression for one chunk
+        @param decode: a function f(channel) that returns the values of a channel of the own data group
+        @param align: a function f(data group,short name,method) that returns the values of a channel of another
+                      data group aligned to the timestamps of the chunk
+        @param num: the number of records of the chunk
+        @return: a numpy array with the values
+        """
+        variables = {}
+        for var,(dg,ch) in self.inputs.items():
+            if dg is self.data_group:
+                variables[var] = decode(ch)
+            else:
+                variables[var] = align(dg,ch.get_short_name(),self.method)
+        if self.engine == "numexpr":
+            import numexpr
+            try:
+                val = np.asarray(numexpr.evaluate(self.expr,local_dict=variables,global_dict={}))
+                if val.ndim == 0:
+                    val = np.full(num,val)
+                return val
+            except (KeyError,TypeError,ValueError,NotImplementedError,SyntaxError):
+                #e.g. string inputs or numpy functions, stay with numpy from now on
+                self.engine = "numpy"
+        return _evaluate_expression(code=self.code,variables=variables,num=num)
+
+
 class cc_block(mdf_block):
 
     def __init__(self,fobj,foffset,vers,bord,*args,**kwargs):
@@ -1148,7 +3275,7 @@ class cc_block(mdf_block):
         @param bord: byte order of contents    
         @return: the block as an object          
         """
-        super(cc_block,self).__init__(fobj=fobj,foffset=foffset,*args,**kwargs)
+        super(cc_block,self).__init__(fobj=fobj,foffset=foffset,bord=bord,*args,**kwargs)
         assert(self.block_data["block_id"] == "CC")
         self.block_data.update(_interpret_cc_block(data=self.data,vers=vers,bord=bord))
 
@@ -1169,13 +3296,42 @@ class cc_block(mdf_block):
             return None
         
         elif self.conversion_type == "ASAM-MCD2 Text Table(COMPU_VTAB)":
-            return lambda x: self.parameters[x]
+            #values without text stay numbers like in _lookup_text_table
+            return lambda x: self.parameters.get(x,x)
         
         elif self.conversion_type == "1:1 conversion (Int=Phys)":
             return None
             
         else:
             raise NotImplementedError("Conversion Type {0} not handled".format(self.conversion_type))
+
+    def get_column_conversion_function(self):
+        """
+        vectorized counterpart of get_conversion_function
+        @return: a function that converts a numpy array of raw values or None
+        """
+        if self.conversion_type == "parametric,linear":
+            assert(isinstance(self.parameters,tuple))
+            #float64 like the python floats of get_conversion_function, float32 raw values would stay float32
+            return lambda x: ((np.asarray(x,dtype=np.float64)*self.parameters[1]) + self.parameters[0])
+
+        elif self.conversion_type == "unknown":
+            return None
+
+        elif self.conversion_type == "ASAM-MCD2 Text Table(COMPU_VTAB)":
+            return self._lookup_text_table
+
+        elif self.conversion_type == "1:1 conversion (Int=Phys)":
+            return None
+
+        else:
+            raise NotImplementedError("Conversion Type {0} not handled".format(self.conversion_type))
+
+    def _lookup_text_table(self,x):
+        #look up each distinct raw value only once
+        uniques,inverse = np.unique(x,return_inverse=True)
+        texts = np.array([self.parameters.get(val,val) for val in uniques.tolist()],dtype=object)
+        return texts[inverse.ravel()]
         
 
 class cd_block(mdf_block):
@@ -1189,14 +3345,74 @@ class cd_block(mdf_block):
         @param bord: byte order of contents    
         @return: the block as an object          
         """
-        super(cd_block,self).__init__(fobj=fobj,foffset=foffset,*args,**kwargs)
+        super(cd_block,self).__init__(fobj=fobj,foffset=foffset,bord=bord,*args,**kwargs)
         assert(self.block_data["block_id"] == "CD")
         self.block_data.update(_interpret_cd_block(data=self.data,vers=vers,bord=bord))
 
         self.dependency_type = self.block_data.pop("dependency_type")
         self.number_of_dependencies = self.block_data.pop("number_of_dependencies")
         self.dependencies = self.block_data.pop("dependencies")
+        self.sizes_of_dimensions = self.block_data.pop("sizes_of_dimensions")
         assert(self.number_of_dependencies == len(self.dependencies))
+        self.targets = [None for dep in self.dependencies]
+
+    def resolve(self,channels):
+        """
+        looks up the channels the dependencies point to
+        @param channels: a dictionary of channel block offset: (data group, channel group, channel)
+        @note: dependencies on channels that are not in the file stay None
+        """
+        self.targets = [channels.get(dep["channel_pointer"]) for dep in self.dependencies]
+        return
+
+    def get_shape(self):
+        """
+        @return: the shape of the composed channel, the dependencies fill it in C order
+        @note: a matrix has one line per channel group, a matrix in one channel group takes its shape from the
+               indexes at the end of the element names, e.g. MAP[1][2], and is one line of all elements without them,
+               shapes that do not match the number of dependencies fall back to a vector
+        """
+        num = self.number_of_dependencies
+        shape = (num,)
+        if self.dependency_type == 2:
+            rows = len(set([dep["channel_group_pointer"] for dep in self.dependencies]))
+            if rows == 1:
+                shape = self._get_indexed_shape() or (1,num)
+            elif rows and not num%rows:
+                shape = (rows,num//rows)
+        elif self.dependency_type >= 256 and self.sizes_of_dimensions:
+            if int(np.prod(self.sizes_of_dimensions)) == num:
+                shape = tuple(self.sizes_of_dimensions)
+        return shape
+
+    def _get_indexed_shape(self):
+        """
+        @return: the shape given by the indexes at the end of the element names, None if the names have no indexes
+                 or the elements are not in C order
+        """
+        if any([target is None for target in self.targets]):
+            return None
+        indexes = []
+        for target in self.targets:
+            match = re.search(r"((?:\[\d+\])+)$",target[2].get_short_name())
+            if match is None:
+                return None
+            indexes.append(tuple(int(idx) for idx in re.findall(r"\d+",match.group(1))))
+        if len(set([len(idx) for idx in indexes])) != 1:
+            return None
+        shape = tuple(int(size)+1 for size in np.max(indexes,axis=0))
+        if indexes != list(np.ndindex(*shape)):
+            return None
+        return shape
+
+    def get_channels(self):
+        """
+        @return: the element channels in order of the dependencies
+        @note: raises KeyError if a dependency could not be resolved
+        """
+        if any([target is None for target in self.targets]):
+            raise KeyError("Dependencies {0} are not resolved".format([dep["channel_pointer"] for dep,target in zip(self.dependencies,self.targets) if target is None]))
+        return [target[2] for target in self.targets]
 
 
 class ce_block(mdf_block):
@@ -1210,37 +3426,260 @@ class ce_block(mdf_block):
         @param bord: byte order of contents    
         @return: the block as an object          
         """
-        super(ce_block,self).__init__(fobj=fobj,foffset=foffset,*args,**kwargs)
+        super(ce_block,self).__init__(fobj=fobj,foffset=foffset,bord=bord,*args,**kwargs)
         assert(self.block_data["block_id"] == "CE")
         self.block_data.update(_interpret_ce_block(data=self.data,vers=vers,bord=bord))
 
+        self.extention_type = self.block_data.pop("extention_type")
+
+    def get_can_message(self):
+        """
+        @return: a tuple (index of can channel, identifier of can message, name of message, name of sender)
+                 for Vector CAN extentions, None otherwise
+        """
+        if self.extention_type != "Vector CAN":
+            return None
+        return (self.block_data["index_of_can_channel"],self.block_data["identifier_of_can_message"],
+                self.block_data["name_of_message"],self.block_data["name_of_sender"])
+
+
+
+class _block_writer():
+
+    def __init__(self,src,dst,bord):
+        """
+        helper to assemble a new mdf file out of the blocks of an existing one
+        @param src: the file object of the source file
+        @param dst: the file object of the new file
+        @param bord: byte order of contents
+        @return: the writer object
+        """
+        self.src = src
+        self.dst = dst
+        self.bord = bord
+        if bord == 'little':
+            self.fmtprefix = '<'
+        else:
+            self.fmtprefix = '>'
+        self.copied = {}
+
+    def write(self,data):
+        offset = self.dst.seek(0,2)
+        self.dst.write(data)
+        return offset
+
+    def patch(self,offset,data):
+        self.dst.seek(offset)
+        self.dst.write(data)
+        return
+
+    def copy_block(self,ptr):
+        """
+        copies a block without links to other blocks, e.g. TX, CC or CE
+        @param ptr: the offset of the block in the source file
+        @return: the offset of the block in the new file
+        """
+        if not ptr:
+            return 0
+        if ptr not in self.copied:
+            self.copied.update({ptr:self.write(mdf_block(fobj=self.src,foffset=ptr,bord=self.bord).data)})
+        return self.copied[ptr]
+
+    def copy_channel(self,ch,ncb_ptr,bit_offset=None):
+        """
+        copies a cn block with its conversion, extension and text blocks
+        @param ch: the channel object
+        @param ncb_ptr: pointer to the next channel in the new file
+        @param bit_offset: the new bit offset or None to keep it
+        @return: the offset of the block in the new file
+        @note: dependencies refer to other channels of the source file and are dropped
+        """
+        data = bytearray(ch.data.ljust(228,b'\x00'))
+        data[2:4] = struct.pack("{0}H".format(self.fmtprefix),228)
+        cf_ptr,sde_ptr,db_ptr,ct_ptr = struct.unpack("{0}IIII".format(self.fmtprefix),data[8:24])
+        data[4:24] = struct.pack("{0}IIIII".format(self.fmtprefix),ncb_ptr,self.copy_block(cf_ptr),self.copy_block(sde_ptr),0,self.copy_block(ct_ptr))
+        lsnt_ptr,dsn_ptr = struct.unpack("{0}II".format(self.fmtprefix),data[218:226])
+        data[218:226] = struct.pack("{0}II".format(self.fmtprefix),self.copy_block(lsnt_ptr),self.copy_block(dsn_ptr))
+        if bit_offset is not None:
+            data[186:188] = struct.pack("{0}H".format(self.fmtprefix),bit_offset)
+        return self.write(data)
+
+    def copy_records(self,foffset,rec_size,start,stop,columns=None,chunk_size=DEFAULT_CHUNK_SIZE,src=None,transform=None):
+        """
+        copies a range of records of a data block without decoding them
+        @param foffset: the offset of the data block in the source file
+        @param rec_size: the record size in the source file
+        @param start: index of the first record
+        @param stop: index after the last record
+        @param columns: None to copy whole records or an array of the byte indexes to keep of each record
+        @param chunk_size: the number of records copied at once
+        @param src: the file object to copy from, None for the source file of the writer
+        @param transform: None or a function that modifies a writable 2d uint8 array of records in place
+        @return: the offset of the data block in the new file
+        """
+        if src is None:
+            src = self.src
+        offset = self.dst.seek(0,2)
+        src.seek(foffset+(start*rec_size))
+        for rec_idx in range(start,stop,chunk_size):
+            num_recs = min(chunk_size,stop-rec_idx)
+            buf = src.read(num_recs*rec_size)
+            if columns is not None or transform is not None:
+                num_recs = len(buf)//rec_size
+                recs = np.frombuffer(buf,dtype=np.uint8,count=num_recs*rec_size).reshape(num_recs,rec_size)
+                if columns is not None:
+                    recs = recs[:,columns]
+                else:
+                    recs = recs.copy()
+                if transform is not None:
+                    transform(recs)
+                buf = recs.tobytes()
+            self.dst.write(buf)
+        return offset
+
+    def write_header(self,hd_ptr,dg_ptrs,fc_ptr,hdblock):
+        """
+        links the data groups and writes the hd block
+        @param hd_ptr: the offset reserved for the hd block
+        @param dg_ptrs: the offsets of the dg blocks in order
+        @param fc_ptr: pointer to the file comment
+        @param hdblock: the hd block to take timestamp, author, organisation, project and subject from
+        """
+        for dg_ptr,ndg_ptr in zip(dg_ptrs[:-1],dg_ptrs[1:]):
+            self.patch(dg_ptr+4,struct.pack("{0}I".format(self.fmtprefix),ndg_ptr))
+        self.patch(hd_ptr,_build_hd_block(dg_ptrs[0] if dg_ptrs else 0,fc_ptr,0,len(dg_ptrs),hdblock.timestamp,
+                                          author=hdblock.author,organisation=hdblock.organisation,
+                                          project=hdblock.project,subject=hdblock.subject,bord=self.bord))
+        return
+
+
+def _project_record_layout(chs):
+    """
+    calculates the record layout that keeps only the bytes of some channels
+    @param chs: the channels to keep
+    @return: a tuple (array of byte indexes to keep, list of new bit offsets, new record size)
+    @note: channels that share bytes, i.e. bit fields, keep sharing them
+    """
+    spans = []
+    for ch in chs:
+        first = ch.get_bit_offset()//8
+        last = (ch.get_bit_offset()+ch.get_bit_size()+7)//8
+        spans.append((first,last))
+    segments = []
+    for first,last in sorted(spans):
+        if segments and first <= segments[-1][1]:
+            segments[-1][1] = max(segments[-1][1],last)
+        else:
+            segments.append([first,last])
+    columns = []
+    new_starts = {}
+    for first,last in segments:
+        new_starts.update({first:len(columns)})
+        columns.extend(range(first,last))
+    bit_offsets = []
+    for ch in chs:
+        byte_idx = ch.get_bit_offset()//8
+        for first,last in segments:
+            if first <= byte_idx < last:
+                bit_offsets.append(ch.get_bit_offset()+((new_starts[first]-first)*8))
+                break
+    return (np.array(columns,dtype=np.intp),bit_offsets,len(columns))
+
+
+def read_file_info(fname):
+    """
+    reads the id and hd blocks and the data and channel group blocks of a file, the channels are not read
+    @param fname: path to file
+    @return: a dictionary with the file information, the header and one entry per channel group
+    @note: much faster than mdf() on files with many channels, e.g. for listing recordings
+    """
+    with _open_file(fname) as f:
+        idblock = id_block(f)
+        vers = idblock.get_version()
+        bord = idblock.get_byte_order()
+        if vers >= 4:
+            from .mdf4 import read_file_info4
+            return read_file_info4(fobj=f,idblock=idblock)
+        hd = _interpret_hd_block(data=mdf_block(fobj=f,foffset=64,bord=bord).data,vers=vers,bord=bord)
+        groups = []
+        dg_ptr = hd["data_group_pointer"]
+        dg_idx = 0
+        while dg_ptr:
+            dg = _interpret_dg_block(data=mdf_block(fobj=f,foffset=dg_ptr,bord=bord).data,vers=vers,bord=bord)
+            cg_ptr = dg["first_channel_group_pointer"]
+            while cg_ptr:
+                cg = _interpret_cg_block(data=mdf_block(fobj=f,foffset=cg_ptr,bord=bord).data,vers=vers,bord=bord)
+                groups.append({"data_group":dg_idx,
+                               "record_id":cg["record_id"],
+                               "number_of_channels":cg["number_of_channels"],
+                               "record_size":cg["record_size"],
+                               "number_of_records":cg["number_of_records"],
+                               })
+                cg_ptr = cg["next_channel_group_pointer"]
+            dg_ptr = dg["next_data_group_pointer"]
+            dg_idx += 1
+    return {"file_identifier":idblock.text,
+            "version":vers,
+            "program":idblock.block_data["program_identifier"],
+            "byte_order":bord,
+            "timestamp":hd["timestamp"],
+            "author":hd["author"],
+            "organisation":hd["organisation"],
+            "project":hd["project"],
+            "subject":hd["subject"],
+            "number_of_data_groups":hd["number_of_data_groups"],
+            "channel_groups":groups,
+            }
 
 
 class mdf():
     
-    def __init__(self,fname=None,ignore_channels=["VG","CalibrationRecordingSingleShotGroup","$"]):
+    def __init__(self,fname=None,ignore_channels=["VG","CalibrationRecordingSingleShotGroup","$"],instrument=False,
+                 progress_callback=None,timing_callback=None):
         """
         measure data file class
         @param fname: path to file
         @param ignore_channels: a list of strings which channels are to be ignored, i.e. program specific stuff
+        @param instrument: True to count blocks, reads, records and conversions and to time the phases, see stats()
+        @param progress_callback: a function f(phase,done,total), implies instrument
+        @param timing_callback: a function f(phase,seconds), implies instrument
         @return: the mdf object   
+        @note: the counts of stats() are those of this object only, other mdf objects of the same file do not add to them,
+               without instrumentation the readers only check once per file open and chunk,
+               all readers of the object share one file descriptor with positional reads,
+               so threads can iterate different data groups or time ranges of the same object at once
         """
         self.idblock = None
         self.hdblock = None
         self.fname = fname
+        self.overviews = {}
+        self.instrumentation = None
+        self.descriptor = None
+        if instrument or progress_callback or timing_callback:
+            self.instrumentation = instrumentation(progress_callback=progress_callback,timing_callback=timing_callback)
         if self.fname:
-            self.read_mdf_file(fname=self.fname,ignore_channels=ignore_channels)
+            #keeps the shared descriptor open for the readers of the generators
+            self.descriptor = get_shared_descriptor(self.fname)
+            if self.instrumentation is not None:
+                with self.instrumentation.phase("open"):
+                    self.read_mdf_file(fname=self.fname,ignore_channels=ignore_channels)
+            else:
+                self.read_mdf_file(fname=self.fname,ignore_channels=ignore_channels)
 
 
     def read_mdf_file(self,fname,ignore_channels):
-        with open(fname,'rb') as f:
+        with _open_file(fname,instr=self.instrumentation) as f:
             try:
                 self.idblock = id_block(f)
                 #extract version and byte order for further block interpretation
                 self.version = self.idblock.get_version()
                 self.byte_order = self.idblock.get_byte_order()
                 
-                self.hdblock = hd_block(fobj=f,vers=self.version,bord=self.byte_order,ignore_channels=ignore_channels)
+                if self.version >= 4:
+                    from .mdf4 import hd4_block
+                    self.hdblock = hd4_block(fobj=f,vers=self.version,bord=self.byte_order,ignore_channels=ignore_channels)
+                else:
+                    self.hdblock = hd_block(fobj=f,vers=self.version,bord=self.byte_order,ignore_channels=ignore_channels)
                 
             except EOFError:
                 print("EOF")
@@ -1250,17 +3689,801 @@ class mdf():
     def get_channel_short_names(self):
         return self.hdblock.get_channel_short_names()
 
+    def stats(self):
+        """
+        @return: a dictionary with the counters and phase times of this file, see instrumentation.get_statistics(),
+                 None if the object was created without instrumentation
+        """
+        if self.instrumentation is None:
+            return None
+        return self.instrumentation.get_statistics()
+
+    def is_finished(self):
+        """
+        @return: False if the file identifier is UnFinMF, e.g. the file is still written
+        """
+        with _open_file(self.fname,instr=self.instrumentation) as f:
+            file_identifier = f.read(8).rstrip(b'\x00\x20').decode()
+        return file_identifier != "UnFinMF"
+
+    def follow(self,short_names,poll_interval=1.0,timeout=None,chunk_size=DEFAULT_CHUNK_SIZE,raw=False):
+        """
+        generator that yields the records appended to a file that is still written
+        @param short_names: a list of channel short names of the same data group
+        @param poll_interval: seconds to wait before checking the file size again
+        @param timeout: stop after this many seconds without new records, None to follow until the file is finished
+        @param chunk_size: the number of records decoded at once
+        @param raw: True for the stored values, see cn_block.convert
+        @return: yields tuples of (timestamps, list of value arrays in order of short_names) of new complete records only
+        @note: the number of records is derived from the file size, not from the channel group,
+               each poll only reads the records added since the last poll, records that are
+               announced but not yet on disk are read on a later poll
+        """
+        if isinstance(short_names,str):
+            short_names = [short_names,]
+        groups = self.hdblock.get_data_groups_for_channels(short_names)
+        if len(groups) != 1:
+            raise ValueError("Channels {0} do not belong to one data group".format(short_names))
+        dg,names = groups[0]
+        position = 0
+        last_data = time.time()
+        while True:
+            finished = self.is_finished()
+            available = self.hdblock.get_number_of_available_records(fname=self.fname,dg=dg,finished=finished)
+            rows = 0
+            if available > position:
+                for chunk in dg.iter_columns(fname=self.fname,short_names=names,chunk_size=chunk_size,start=position,stop=available,num_recs=available,raw=raw):
+                    #a short read stops early, the rest is read on the next poll
+                    rows += len(chunk[0])
+                    position += len(chunk[0])
+                    yield chunk
+            if rows:
+                last_data = time.time()
+            elif finished:
+                break
+            elif timeout is not None and time.time()-last_data >= timeout:
+                break
+            else:
+                time.sleep(poll_interval)
+        return
+
     def get_channel_by_short_name(self,short_name):
         return self.hdblock.get_channel_by_short_name(short_name=short_name)
 
-    def get_records_with_timestamp(self,short_names=None,useabsolutetime=False):
-        return self.hdblock.get_records_with_timestamp(fname=self.fname,short_names=short_names,useabsolutetime=useabsolutetime)
+    def derive(self,name,expr,inputs=None,method="previous",unit="",engine="auto"):
+        """
+        adds a virtual channel that is computed from other channels
+        @param name: the short name of the new channel
+        @param expr: the expression, e.g. "trq*nEng*2*3.1416/60", numpy functions like sqrt or where are available
+        @param inputs: a list of short names that are used as variables, a dictionary of variable name: short name
+                       for short names that are no python identifiers or None to take the names used in expr
+        @param method: how inputs of other data groups are aligned, "previous", "linear" or "nearest"
+        @param unit: the physical unit
+        @param engine: "numexpr", "numpy" or "auto"
+        @return: the derived channel
+        @note: the channel belongs to the data group of the first input and has its timestamps,
+               it can be used like a stored channel by the columnar readers, resample, statistics and overviews,
+               record wise readers append its values to each record, raw reads return it physical,
+               the expression is evaluated element wise so it cannot filter across chunks
+        """
+        if self.hdblock.get_data_group_for_channel(short_name=name) is not None:
+            raise ValueError("Channel {0} already exists".format(name))
+        if inputs is None:
+            inputs = {var:var for var in _get_expression_names(expr)}
+        elif not isinstance(inputs,dict):
+            inputs = {var:var for var in inputs}
+        if not inputs:
+            raise ValueError("Expression {0} has no inputs".format(expr))
+        resolved = {}
+        for var,short_name in inputs.items():
+            dg = self.hdblock.get_data_group_for_channel(short_name=short_name)
+            if dg is None:
+                raise KeyError("Channel {0} not found".format(short_name))
+            resolved[var] = (dg,dg.get_channel_by_short_name(short_name=short_name))
+        data_group = list(resolved.values())[0][0]
+        ch = derived_channel(name=name,expr=expr,inputs=resolved,data_group=data_group,method=method,unit=unit,engine=engine)
+        data_group.get_channel_groups()[0].add_derived_channel(ch)
+        return ch
+
+    def get_records_with_timestamp(self,short_names=None,useabsolutetime=False,raw=False):
+        return self.hdblock.get_records_with_timestamp(fname=self.fname,short_names=short_names,useabsolutetime=useabsolutetime,raw=raw)
+
+    def iter_resample(self,short_names,raster=None,reference_channel=None,method="previous",useabsolutetime=False,chunk_size=DEFAULT_CHUNK_SIZE,raw=False,
+                      compact=False):
+        """
+        generator that aligns channels of different data groups onto a common time base
+        @param short_names: a list of channel short names
+        @param raster: the time step of the common time base in seconds
+        @param reference_channel: alternatively use the timestamps of the group of this channel
+        @param method: "previous" (hold last value), "linear" (interpolate) or "nearest"
+        @param useabsolutetime: return numpy datetimes instead of seconds
+        @param chunk_size: the number of samples per chunk of the common time base
+        @param raw: True to resample the stored values, see cn_block.convert
+        @param compact: True or a list of short names that are read as change columns and aligned from their runs
+        @return: yields tuples of (timestamps, 2d array with one column per short name)
+        """
+        if isinstance(short_names,str):
+            short_names = [short_names,]
+        if (raster is None) == (reference_channel is None):
+            raise ValueError("Specify either raster or reference_channel")
+        groups = self.hdblock.get_data_groups_for_channels(short_names)
+        streams = []
+        for dg,names in groups:
+            chunks = dg.iter_columns(fname=self.fname,short_names=names,chunk_size=chunk_size,raw=raw,compact=_get_compact_flags(compact,names))
+            streams.append((_column_stream(chunks=chunks,count=len(names)),names))
+
+        if raster is None:
+            ref_dg = self.hdblock.get_data_group_for_channel(short_name=reference_channel)
+            if ref_dg is None:
+                raise KeyError("Channel {0} not found".format(reference_channel))
+            time_bases = (t for t,vals in ref_dg.iter_columns(fname=self.fname,short_names=[],chunk_size=chunk_size))
+        else:
+            time_ranges = [dg.get_time_range(fname=self.fname) for dg,names in groups]
+            time_ranges = [tr for tr in time_ranges if tr]
+            if not time_ranges:
+                return
+            strt = min(tr[0] for tr in time_ranges)
+            stp = max(tr[1] for tr in time_ranges)
+            num_samples = int(np.floor((stp-strt)/raster))+1
+            time_bases = (strt+(np.arange(idx,min(idx+chunk_size,num_samples))*raster) for idx in range(0,num_samples,chunk_size))
+
+        for tt in time_bases:
+            if not len(tt):
+                continue
+            columns = {}
+            for stream,names in streams:
+                columns.update(zip(names,stream.align(tt=tt,method=method)))
+            cols = [columns[short_name] for short_name in short_names]
+            if all(col.dtype.kind in "biuf" for col in cols):
+                table = np.column_stack(cols)
+            else:
+                table = np.empty((len(tt),len(cols)),dtype=object)
+                for idx,col in enumerate(cols):
+                    table[:,idx] = col
+            if useabsolutetime:
+                tt = _to_absolute_time(tt,self.hdblock.timestamp)
+            yield (tt,table)
+        return
+
+    def resample(self,short_names,raster=None,reference_channel=None,method="previous",useabsolutetime=False,chunk_size=DEFAULT_CHUNK_SIZE,raw=False,
+                 compact=False):
+        """
+        aligns channels of different data groups onto a common time base
+        @param short_names: a list of channel short names
+        @param raster: the time step of the common time base in seconds
+        @param reference_channel: alternatively use the timestamps of the group of this channel
+        @param method: "previous" (hold last value), "linear" (interpolate) or "nearest"
+        @param useabsolutetime: return numpy datetimes instead of seconds
+        @param chunk_size: the number of samples decoded at once
+        @param raw: True to resample the stored values, see cn_block.convert
+        @param compact: True or a list of short names that are read as change columns and aligned from their runs
+        @return: a tuple of (timestamps, 2d array with one column per short name)
+        @note: use iter_resample to keep the memory footprint bounded
+        """
+        timestamps = []
+        tables = []
+        for tt,table in self.iter_resample(short_names=short_names,raster=raster,reference_channel=reference_channel,method=method,useabsolutetime=useabsolutetime,chunk_size=chunk_size,raw=raw,compact=compact):
+            timestamps.append(tt)
+            tables.append(table)
+        if not tables:
+            return (np.empty(0),np.empty((0,len(short_names))))
+        return (np.concatenate(timestamps),np.concatenate(tables))
+
+    def get_trigger_events(self):
+        """
+        collects the trigger events of all data groups
+        @return: a list of dictionaries with trigger_time, pre_trigger_time and post_trigger_time, sorted by trigger_time
+        """
+        ret = []
+        for dg in self.hdblock.get_data_groups():
+            for tev in dg.get_trigger_events():
+                if tev not in ret:
+                    ret.append(tev)
+        ret.sort(key = lambda x: x["trigger_time"])
+        return ret
+
+    def iter_columns(self,short_names,start=None,stop=None,chunk_size=DEFAULT_CHUNK_SIZE,raw=False,compact=False):
+        """
+        generator for column wise decoding of channels of one data group
+        @param short_names: a list of channel short names of the same data group
+        @param start: start of the time range in seconds, None for the start of the measurement
+        @param stop: end of the time range in seconds (included), None for the end of the measurement
+        @param chunk_size: the number of records decoded at once
+        @param raw: True for the stored values, see cn_block.convert
+        @param compact: True or a list of short names to return change_column objects instead of value arrays
+        @return: yields tuples of (timestamps, list of value arrays in order of short_names)
+        """
+        if isinstance(short_names,str):
+            short_names = [short_names,]
+        groups = self.hdblock.get_data_groups_for_channels(short_names)
+        if len(groups) != 1:
+            raise ValueError("Channels {0} do not belong to one data group".format(short_names))
+        dg,names = groups[0]
+        first,last = dg.find_record_range(fname=self.fname,start=start,stop=stop)
+        return dg.iter_columns(fname=self.fname,short_names=names,chunk_size=chunk_size,start=first,stop=last,raw=raw,
+                               compact=_get_compact_flags(compact,names))
+
+    def get_columns(self,short_names,start=None,stop=None,useabsolutetime=False,raw=False,compact=False):
+        """
+        decodes channels of a time range column wise
+        @param short_names: a list of channel short names
+        @param start: start of the time range in seconds, None for the start of the measurement
+        @param stop: end of the time range in seconds (included), None for the end of the measurement
+        @param useabsolutetime: return numpy datetimes instead of seconds
+        @param raw: True for the stored values, see cn_block.convert
+        @param compact: True or a list of short names to return change_column objects instead of value arrays
+        @return: a dictionary of short name: (timestamps, values)
+        @note: the records of the time range are found with a binary search on the time channel,
+               records outside the time range are not read,
+               compact columns are built chunk by chunk so the expanded values are never held at once
+        """
+        if isinstance(short_names,str):
+            short_names = [short_names,]
+        ret = {}
+        for dg,names in self.hdblock.get_data_groups_for_channels(short_names):
+            first,last = dg.find_record_range(fname=self.fname,start=start,stop=stop)
+            chunks = dg.iter_columns(fname=self.fname,short_names=names,start=first,stop=last,raw=raw,compact=_get_compact_flags(compact,names))
+            t,vals = _concatenate_chunks(chunks,count=len(names))
+            if useabsolutetime:
+                t = _to_absolute_time(t,self.hdblock.timestamp)
+            ret.update({short_name:(t,val) for short_name,val in zip(names,vals)})
+        return ret
+
+    def get_composed(self,short_name,start=None,stop=None,useabsolutetime=False,raw=False,chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        reads a channel with dependencies, e.g. a calibration map or curve, as one array
+        @param short_name: the short name of the channel with the cd block, see get_composed_channel_short_names()
+        @param start: start of the time range in seconds, None for the start of the measurement
+        @param stop: end of the time range in seconds (included), None for the end of the measurement
+        @param useabsolutetime: return numpy datetimes instead of seconds
+        @param raw: True for the stored values of the elements
+        @param chunk_size: the number of records read at once
+        @return: a tuple (timestamps, array of shape (number of records,)+shape of the dependencies)
+        @note: byte aligned elements of one type at evenly spaced offsets are copied out of the records without decoding each element,
+               see cd_block.get_shape for the shape
+        """
+        dg = self.hdblock.get_data_group_for_channel(short_name=short_name)
+        if dg is None:
+            raise KeyError("Channel {0} not found".format(short_name))
+        ch = dg.get_channel_by_short_name(short_name=short_name)
+        if getattr(ch,"dependencies",None) is None:
+            raise ValueError("Channel {0} has no dependencies".format(short_name))
+        first,last = dg.find_record_range(fname=self.fname,start=start,stop=stop)
+        t,vals = dg.get_composed(fname=self.fname,ch=ch,start=first,stop=last,raw=raw,chunk_size=chunk_size)
+        if useabsolutetime:
+            t = _to_absolute_time(t,self.hdblock.timestamp)
+        return (t,vals)
+
+    def get_composed_channel_short_names(self):
+        return self.hdblock.get_composed_channel_short_names()
+
+    def channel(self,short_name,raw=False):
+        """
+        @param short_name: the channel short name
+        @param raw: True for the stored values, see cn_block.convert
+        @return: a channel_array that reads and decodes only the records it is indexed with
+        """
+        dg = self.hdblock.get_data_group_for_channel(short_name=short_name)
+        if dg is None:
+            raise KeyError("Channel {0} not found".format(short_name))
+        return channel_array(mdf_obj=self,dg=dg,ch=dg.get_channel_by_short_name(short_name=short_name),raw=raw)
+
+    def get_can_messages(self):
+        """
+        @return: a list of dictionaries with can_channel, message_id, message_name, sender and short_names,
+                 one per message of the Vector CAN extentions
+        """
+        ret = []
+        for key,signals in sorted(self.hdblock.get_can_index().items()):
+            ret.append(dict(zip(["can_channel","message_id","message_name","sender"],key)))
+            ret[-1].update({"short_names":[ch.get_short_name() for dg,ch in signals]})
+        return ret
+
+    def get_can_columns(self,can_channel=None,message_id=None,message_name=None,sender=None,
+                        start=None,stop=None,useabsolutetime=False,raw=False):
+        """
+        decodes every signal of a can message or of all messages of a sender in one call
+        @param can_channel: the index of the can channel, None for any
+        @param message_id: the identifier of the can message, None for any
+        @param message_name: the name of the message, None for any
+        @param sender: the name of the sending ecu, None for any
+        @param start: start of the time range in seconds, None for the start of the measurement
+        @param stop: end of the time range in seconds (included), None for the end of the measurement
+        @param useabsolutetime: return numpy datetimes instead of seconds
+        @param raw: True for the stored values, see cn_block.convert
+        @return: a dictionary of (can channel, message id, message name, sender): dictionary of short name: (timestamps, values),
+                 one entry per matching message, see get_can_messages and get_columns
+        @note: only the data groups of the matching messages are read, the channels found by get_can_index are
+               decoded directly so signals of equal short names in several messages are all returned
+        """
+        groups = []
+        for key,dg,ch in self.hdblock.find_can_signals(can_channel=can_channel,message_id=message_id,
+                                                       message_name=message_name,sender=sender):
+            for entry in groups:
+                if entry[0] is dg:
+                    entry[1].append((key,ch))
+                    break
+            else:
+                groups.append((dg,[(key,ch),]))
+        if not groups:
+            raise KeyError("No can signals of channel {0} message {1} {2} sender {3}".format(can_channel,message_id,message_name,sender))
+        ret = {}
+        for dg,signals in groups:
+            first,last = dg.find_record_range(fname=self.fname,start=start,stop=stop)
+            chs = [ch for key,ch in signals]
+            t,vals = _concatenate_chunks(dg.iter_columns(fname=self.fname,short_names=chs,start=first,stop=last,raw=raw),count=len(chs))
+            if useabsolutetime:
+                t = _to_absolute_time(t,self.hdblock.timestamp)
+            for (key,ch),val in zip(signals,vals):
+                ret.setdefault(key,{})[ch.get_short_name()] = (t,val)
+        return ret
+
+    def extract_trigger_windows(self,short_names,useabsolutetime=False,raw=False):
+        """
+        decodes the time window around each trigger event
+        @param short_names: a list of channel short names
+        @param useabsolutetime: return numpy datetimes instead of seconds
+        @param raw: True for the stored values, see cn_block.convert
+        @return: a list of dictionaries with the trigger event values and
+                 "channels", a dictionary of short name: (timestamps, values) of the window
+        @note: the window is [trigger_time - pre_trigger_time, trigger_time + post_trigger_time]
+        """
+        ret = []
+        for tev in self.get_trigger_events():
+            window = dict(tev)
+            window.update({"channels":self.get_columns(short_names=short_names,
+                                                       start=tev["trigger_time"]-tev["pre_trigger_time"],
+                                                       stop=tev["trigger_time"]+tev["post_trigger_time"],
+                                                       useabsolutetime=useabsolutetime,raw=raw)})
+            ret.append(window)
+        return ret
+
+    def find_intervals(self,short_name=None,condition=None,min_duration=0.0,hysteresis=0.0,start=None,stop=None,
+                       useabsolutetime=False,chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        finds the time intervals where a condition holds, e.g. nEng > 3000 for at least 2 seconds
+        @param short_name: the channel short name of a threshold condition, None for an expression
+        @param condition: a threshold like "> 3000" or "== 2" for short_name or an expression of channels
+                          of one data group like "(nEng > 3000) & (trq < 0)"
+        @param min_duration: only intervals that last at least min_duration seconds
+        @param hysteresis: for thresholds with < <= > >=, an interval only ends when the value is
+                           more than hysteresis beyond the threshold
+        @param start: start of the time range in seconds, None for the start of the measurement
+        @param stop: end of the time range in seconds (included), None for the end of the measurement
+        @param useabsolutetime: return numpy datetimes instead of seconds
+        @param chunk_size: the number of records decoded at once
+        @return: a tuple of numpy arrays (start times, stop times)
+        @note: an interval starts with the first sample that fulfills the condition and stops with the
+               first sample that does not, an interval that is still open stops with the last sample of the range,
+               the columns are streamed chunk by chunk, intervals may span chunks
+        """
+        if condition is None:
+            raise ValueError("No condition")
+        if hysteresis < 0:
+            raise ValueError("hysteresis must not be negative")
+        if short_name is not None:
+            match = re.match(r"^\s*(<=|>=|==|!=|<|>)\s*(.+?)\s*$",condition)
+            if match is None:
+                raise ValueError("Condition {0} is no threshold like > 3000".format(condition))
+            op,threshold = match.groups()
+            threshold = float(threshold)
+            if hysteresis and op in ["==","!="]:
+                raise ValueError("hysteresis needs a threshold with < <= > >=")
+            offset = hysteresis
+            if op in [">",">="]:
+                offset = -hysteresis
+            names = [short_name,]
+        else:
+            if hysteresis:
+                raise ValueError("hysteresis needs short_name and a threshold")
+            code = compile(condition,"<condition>","eval")
+            names = _get_expression_names(condition)
+            if not names:
+                raise ValueError("Condition {0} has no channels".format(condition))
+        groups = self.hdblock.get_data_groups_for_channels(names)
+        if len(groups) != 1:
+            raise ValueError("Condition {0} uses channels of {1} data groups, derive an aligned channel first".format(condition,len(groups)))
+        dg = groups[0][0]
+        first,last = dg.find_record_range(fname=self.fname,start=start,stop=stop)
+
+        starts = []
+        stops = []
+        active = False
+        open_start = None
+        last_t = None
+        for t,vals in dg.iter_columns(fname=self.fname,short_names=names,start=first,stop=last,chunk_size=chunk_size):
+            if not len(t):
+                continue
+            if short_name is not None:
+                enter = THRESHOLD_OPERATORS[op](vals[0],threshold)
+                if hysteresis:
+                    state = _hold_state(enter=enter,stay=THRESHOLD_OPERATORS[op](vals[0],threshold+offset),state=active)
+                else:
+                    state = enter
+            else:
+                state = _evaluate_expression(code=code,variables=dict(zip(names,vals)),num=len(t))
+            state = np.asarray(state,dtype=bool)
+            edges = np.diff(state.astype(np.int8),prepend=np.int8(active))
+            rising = t[edges == 1]
+            falling = t[edges == -1]
+            if active:
+                rising = np.concatenate(([open_start,],rising))
+            if len(rising) > len(falling):
+                open_start = rising[-1]
+                rising = rising[:-1]
+            starts.append(rising)
+            stops.append(falling)
+            active = bool(state[-1])
+            last_t = t[-1]
+        if active:
+            starts.append(np.array([open_start,]))
+            stops.append(np.array([last_t,]))
+        if starts:
+            starts = np.concatenate(starts)
+            stops = np.concatenate(stops)
+        else:
+            starts = np.array([],dtype=np.float64)
+            stops = np.array([],dtype=np.float64)
+        if min_duration:
+            keep = (stops-starts) >= min_duration
+            starts = starts[keep]
+            stops = stops[keep]
+        if useabsolutetime:
+            starts = _to_absolute_time(starts,self.hdblock.timestamp)
+            stops = _to_absolute_time(stops,self.hdblock.timestamp)
+        return (starts,stops)
+
+    def accumulate_statistics(self,short_names=None,histogram_bins=None,start=None,stop=None,chunk_size=DEFAULT_CHUNK_SIZE,compact=False):
+        """
+        computes statistics of channels in one streaming pass per data group
+        @param short_names: a list of channel short names, None for all channels
+        @param histogram_bins: None, the number of bins or an array of bin edges
+        @param start: index of the first record of each data group
+        @param stop: index after the last record of each data group, None for all records
+        @param chunk_size: the number of records decoded at once
+        @param compact: True or a list of short names whose runs of equal values are accumulated weighted with their lengths
+        @return: a dictionary of short name: channel_statistics
+        @note: the accumulators of different record ranges or files can be combined with merge()
+        """
+        if short_names is None:
+            short_names = self.get_channel_short_names()
+        elif isinstance(short_names,str):
+            short_names = [short_names,]
+        ret = {}
+        for dg,names in self.hdblock.get_data_groups_for_channels(short_names):
+            accumulators = []
+            for short_name in names:
+                ch = dg.get_channel_by_short_name(short_name=short_name)
+                signal_range = None
+                if ch.range_valid:
+                    signal_range = (ch.signal_min,ch.signal_max)
+                accumulators.append(channel_statistics(histogram_bins=histogram_bins,signal_range=signal_range))
+            for t,vals in dg.iter_columns(fname=self.fname,short_names=names,chunk_size=chunk_size,start=start or 0,stop=stop,
+                                          compact=_get_compact_flags(compact,names)):
+                for accumulator,val in zip(accumulators,vals):
+                    accumulator.update(vals=val,timestamps=t)
+            ret.update(zip(names,accumulators))
+        return ret
+
+    def describe(self,short_names=None,histogram_bins=None,chunk_size=DEFAULT_CHUNK_SIZE,compact=False):
+        """
+        per channel count, min, max, mean, std and optional histogram
+        @param short_names: a list of channel short names, None for all channels
+        @param histogram_bins: None, the number of bins or an array of bin edges
+        @param chunk_size: the number of records decoded at once
+        @param compact: True or a list of short names, see accumulate_statistics
+        @return: a dictionary of short name: dictionary of statistics
+        @note: channels with a valid signal range additionally report the number of values out of range
+        """
+        accumulators = self.accumulate_statistics(short_names=short_names,histogram_bins=histogram_bins,chunk_size=chunk_size,compact=compact)
+        return {short_name:accumulator.get_results() for short_name,accumulator in accumulators.items()}
+
+    def cut(self,out_fname,start=None,stop=None,short_names=None,chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        writes a time range and optionally a subset of channels to a new sorted version 3.3 mdf file
+        @param out_fname: path to the new file
+        @param start: start of the time range in seconds, None for the start of the measurement
+        @param stop: end of the time range in seconds (included), None for the end of the measurement
+        @param short_names: a list of channel short names, None for all channels of all data groups
+        @param chunk_size: the number of records copied at once
+        @note: records are copied as raw bytes without decoding,
+               removed channels are cut out of the records by byte slicing,
+               the header timestamp is kept so timestamps stay valid,
+               sample reduction blocks and channel dependencies are dropped,
+               version 4 files cannot be cut
+        """
+        if self.version >= 4:
+            raise NotImplementedError("Version {0} files cannot be cut".format(self.version))
+        if short_names is None:
+            groups = [(dg,None) for dg in self.hdblock.get_data_groups()]
+        else:
+            if isinstance(short_names,str):
+                short_names = [short_names,]
+            for short_name in short_names:
+                if isinstance(self.get_channel_by_short_name(short_name),derived_channel):
+                    raise ValueError("Derived channel {0} cannot be cut".format(short_name))
+            groups = self.hdblock.get_data_groups_for_channels(short_names)
+        bord = self.byte_order
+        with _open_file(self.fname,instr=self.instrumentation) as src, open(out_fname,'wb') as dst:
+            writer = _block_writer(src=src,dst=dst,bord=bord)
+            writer.write(_build_id_block(bord=bord))
+            hd_ptr = writer.write(bytes(208))
+            fc_ptr = 0
+            if self.hdblock.text:
+                fc_ptr = writer.write(_build_tx_block(self.hdblock.text,bord=bord))
+            dg_ptrs = []
+            for dg,names in groups:
+                cg_ptr = 0
+                db_ptr = 0
+                for cg in dg.get_channel_groups():
+                    first,last = dg.find_record_range(fname=self.fname,start=start,stop=stop)
+                    columns = None
+                    rec_size = cg.get_record_size()
+                    chs = cg.get_channels()
+                    bit_offsets = [None for ch in chs]
+                    if names is not None:
+                        chs = [cg.get_time_channel(),]+[ch for ch in cg.get_channels_by_query(names) if ch is not cg.get_time_channel()]
+                        columns,bit_offsets,rec_size = _project_record_layout(chs)
+                    cn_ptr = 0
+                    for ch,bit_offset in reversed(list(zip(chs,bit_offsets))):
+                        cn_ptr = writer.copy_channel(ch=ch,ncb_ptr=cn_ptr,bit_offset=bit_offset)
+                    ct_ptr = writer.copy_block(struct.unpack("{0}I".format(writer.fmtprefix),cg.data[12:16])[0])
+                    cg_ptr = writer.write(_build_cg_block(0,cn_ptr,ct_ptr,cg.record_id,len(chs),rec_size,last-first,bord=bord))
+                    if last > first:
+                        db_ptr = writer.copy_records(foffset=dg.data_block_ptr,rec_size=cg.get_record_size(),start=first,stop=last,columns=columns,chunk_size=chunk_size)
+                tr_ptr = 0
+                if dg.trigger_block:
+                    trigger_events = [tev for tev in dg.get_trigger_events()
+                                      if (start is None or tev["trigger_time"] >= start) and (stop is None or tev["trigger_time"] <= stop)]
+                    if trigger_events:
+                        tc_ptr = 0
+                        if dg.trigger_block.text:
+                            tc_ptr = writer.write(_build_tx_block(dg.trigger_block.text,bord=bord))
+                        tr_ptr = writer.write(_build_tr_block(tc_ptr,trigger_events,bord=bord))
+                dg_ptrs.append(writer.write(_build_dg_block(0,cg_ptr,tr_ptr,db_ptr,bord=bord)))
+            writer.write_header(hd_ptr=hd_ptr,dg_ptrs=dg_ptrs,fc_ptr=fc_ptr,hdblock=self.hdblock)
+        return
+
+    def build_overview(self,short_names=None,chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        builds the min/max overview pyramids of channels in one pass per data group
+        @param short_names: a list of channel short names, None for all channels
+        @param chunk_size: the number of records decoded at once, rounded to whole buckets
+        @note: the pyramids are cached and used by get_overview,
+               channels with text table conversions are reduced from their stored values,
+               channels of strings or byte arrays have no overview and raise a ValueError
+        """
+        if short_names is None:
+            short_names = self.get_channel_short_names()
+        elif isinstance(short_names,str):
+            short_names = [short_names,]
+        chunk_size = max(chunk_size//OVERVIEW_BUCKET_SIZE,1)*OVERVIEW_BUCKET_SIZE
+        for dg,names in self.hdblock.get_data_groups_for_channels([sn for sn in short_names if sn not in self.overviews]):
+            #the first record tells which channels have no numeric physical values
+            first = next(iter(dg.iter_columns(fname=self.fname,short_names=names,stop=1)),(None,[]))[1]
+            raw_names = [short_name for short_name,val in zip(names,first) if val.dtype.kind not in "biuf"]
+            if raw_names:
+                first = next(iter(dg.iter_columns(fname=self.fname,short_names=raw_names,stop=1,raw=True)))[1]
+                for short_name,val in zip(raw_names,first):
+                    if val.dtype.kind not in "biuf":
+                        raise ValueError("Channel {0} of {1} values has no overview".format(short_name,val.dtype))
+            for raw,group_names in [(False,[short_name for short_name in names if short_name not in raw_names]),(True,raw_names)]:
+                if not group_names:
+                    continue
+                pyramid = _minmax_pyramid(chunks=dg.iter_columns(fname=self.fname,short_names=group_names,chunk_size=chunk_size,raw=raw),
+                                          count=len(group_names))
+                for idx,short_name in enumerate(group_names):
+                    self.overviews.update({short_name:(pyramid.get_levels(idx),raw)})
+        return
+
+    def get_overview(self,short_name,start=None,stop=None,width=1000):
+        """
+        min/max/mean envelope of a channel for plotting
+        @param short_name: the channel short name
+        @param start: start of the time range in seconds, None for the start of the measurement
+        @param stop: end of the time range in seconds, None for the end of the measurement
+        @param width: the number of bins, e.g. the pixel width of the plot
+        @return: a tuple of arrays (bin start times, min, max, mean), empty bins are nan
+        @note: sample reduction blocks of the file are used if they are fine enough,
+               otherwise a cached overview pyramid is built on first use,
+               only if even the finest level is too coarse the raw records of the time range are decoded,
+               text table channels are reduced from their stored values, see build_overview
+        """
+        dg = self.hdblock.get_data_group_for_channel(short_name=short_name)
+        if dg is None:
+            raise KeyError("Channel {0} not found".format(short_name))
+        time_range = dg.get_time_range(fname=self.fname)
+        if time_range is None:
+            return (np.empty(0),np.empty(0),np.empty(0),np.empty(0))
+        if start is None:
+            start = time_range[0]
+        if stop is None:
+            stop = time_range[1]
+        for cg in dg.get_channel_groups():
+            if isinstance(cg.get_channel_by_short_name(short_name),derived_channel):
+                #the envelope of a derived channel is not the derived envelope of its inputs
+                break
+            for srb in reversed(cg.get_sample_reductions()):
+                if srb.length_of_time_interval > 0 and (stop-start)/srb.length_of_time_interval >= width:
+                    t,envelopes = srb.get_envelopes(fname=self.fname,cg=cg,short_names=[short_name,])
+                    means,mins,maxs = envelopes[0]
+                    if means.dtype.kind not in "biuf":
+                        break
+                    level = {"time":t,"min":mins,"max":maxs,"sum":means,"count":np.ones(len(t))}
+                    return _rebin_envelope(level=level,start=start,stop=stop,width=width)
+
+        if short_name not in self.overviews:
+            self.build_overview(short_names=[short_name,])
+        levels,raw = self.overviews[short_name]
+        for level in reversed(levels):
+            t = level["time"]
+            if np.searchsorted(t,stop,side="right")-np.searchsorted(t,start) >= width:
+                return _rebin_envelope(level=level,start=start,stop=stop,width=width)
+
+        #zoomed in further than the finest level, decode the raw records of the time range
+        t = levels[0]["time"]
+        first = max(np.searchsorted(t,start,side="right")-1,0)*OVERVIEW_BUCKET_SIZE
+        last = np.searchsorted(t,stop,side="right")*OVERVIEW_BUCKET_SIZE
+        t,vals = _concatenate_chunks(dg.iter_columns(fname=self.fname,short_names=[short_name,],start=first,stop=last,raw=raw),count=1)
+        vals = vals[0].astype(np.float64)
+        level = {"time":t,"min":vals,"max":vals,"sum":vals,"count":np.ones(len(t))}
+        return _rebin_envelope(level=level,start=start,stop=stop,width=width)
+
+
+
+class multi_mdf():
+
+    def __init__(self,fnames,ignore_channels=["VG","CalibrationRecordingSingleShotGroup","$"]):
+        """
+        one logical measurement out of several files, e.g. Recorder1-001.mdf, Recorder1-002.mdf, ...
+        @param fnames: a list of paths to files with the same channel layout
+        @param ignore_channels: a list of strings which channels are to be ignored, i.e. program specific stuff
+        @return: the multi_mdf object
+        @note: the files are ordered by their header timestamp which also defines the time offset of each file
+        """
+        self.mdfs = [mdf(fname=fname,ignore_channels=ignore_channels) for fname in fnames]
+        if not self.mdfs:
+            raise ValueError("No files given")
+        self.mdfs.sort(key = lambda x: x.hdblock.timestamp)
+        layout = _get_record_layout(self.mdfs[0])
+        for mdf_obj in self.mdfs[1:]:
+            if _get_record_layout(mdf_obj) != layout:
+                raise ValueError("Channel layout of {0} differs from {1}".format(mdf_obj.fname,self.mdfs[0].fname))
+        self.timestamp = self.mdfs[0].hdblock.timestamp
+        self.offsets = [(mdf_obj.hdblock.timestamp-self.timestamp).total_seconds() for mdf_obj in self.mdfs]
+
+    def get_channel_short_names(self):
+        return self.mdfs[0].get_channel_short_names()
+
+    def get_channel_by_short_name(self,short_name):
+        return self.mdfs[0].get_channel_by_short_name(short_name=short_name)
+
+    def get_time_offsets(self):
+        return self.offsets
+
+    def get_records_with_timestamp(self,short_names=None,useabsolutetime=False,raw=False):
+        """
+        generator over the records of all files, see mdf.get_records_with_timestamp
+        @note: relative timestamps refer to the header timestamp of the first file
+        """
+        for mdf_obj,offset in zip(self.mdfs,self.offsets):
+            recs = mdf_obj.get_records_with_timestamp(short_names=short_names,useabsolutetime=useabsolutetime,raw=raw)
+            if recs is None:
+                continue
+            if useabsolutetime or not offset:
+                for rec in recs:
+                    yield rec
+            else:
+                delta = datetime.timedelta(seconds=offset)
+                for rec in recs:
+                    yield {timestamp+delta:vals for timestamp,vals in rec.items()}
+        return
+
+    def iter_columns(self,short_names,start=None,stop=None,chunk_size=DEFAULT_CHUNK_SIZE,raw=False):
+        """
+        generator for column wise decoding of channels of one data group across all files
+        @param short_names: a list of channel short names of the same data group
+        @param start: start of the time range in seconds, None for the start of the measurement
+        @param stop: end of the time range in seconds (included), None for the end of the measurement
+        @param chunk_size: the number of records decoded at once
+        @param raw: True for the stored values, see cn_block.convert
+        @return: yields tuples of (timestamps, list of value arrays in order of short_names)
+        @note: files outside the time range are not read
+        """
+        next_offsets = self.offsets[1:]+[None,]
+        for mdf_obj,offset,next_offset in zip(self.mdfs,self.offsets,next_offsets):
+            if stop is not None and stop < offset:
+                break
+            if start is not None and next_offset is not None and start >= next_offset:
+                continue
+            file_start = None
+            file_stop = None
+            if start is not None:
+                file_start = start-offset
+            if stop is not None:
+                file_stop = stop-offset
+            for t,vals in mdf_obj.iter_columns(short_names=short_names,start=file_start,stop=file_stop,chunk_size=chunk_size,raw=raw):
+                yield (t+offset,vals)
+        return
+
+    def get_columns(self,short_names,start=None,stop=None,useabsolutetime=False,raw=False):
+        """
+        decodes channels of a time range column wise across all files, see mdf.get_columns
+        @return: a dictionary of short name: (timestamps, values)
+        """
+        if isinstance(short_names,str):
+            short_names = [short_names,]
+        ret = {}
+        for dg,names in self.mdfs[0].hdblock.get_data_groups_for_channels(short_names):
+            t,vals = _concatenate_chunks(self.iter_columns(short_names=names,start=start,stop=stop,raw=raw),count=len(names))
+            if useabsolutetime:
+                t = _to_absolute_time(t,self.timestamp)
+            ret.update({short_name:(t,val) for short_name,val in zip(names,vals)})
+        return ret
 
+    def concat(self,out_fname,chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        writes all files into one sorted version 3.3 mdf file
+        @param out_fname: path to the new file
+        @param chunk_size: the number of records copied at once
+        @note: records are copied as raw bytes, only the time channel is shifted by the offset of each file,
+               version 4 files cannot be concatenated
+        """
+        first = self.mdfs[0]
+        for mdf_obj in self.mdfs:
+            if mdf_obj.version >= 4:
+                raise NotImplementedError("Version {0} files cannot be concatenated".format(mdf_obj.version))
+        bord = first.byte_order
+        srcs = [_open_file(mdf_obj.fname,instr=mdf_obj.instrumentation) for mdf_obj in self.mdfs]
+        try:
+            with open(out_fname,'wb') as dst:
+                writer = _block_writer(src=srcs[0],dst=dst,bord=bord)
+                writer.write(_build_id_block(bord=bord))
+                hd_ptr = writer.write(bytes(208))
+                fc_ptr = 0
+                if first.hdblock.text:
+                    fc_ptr = writer.write(_build_tx_block(first.hdblock.text,bord=bord))
+                dg_ptrs = []
+                for dg_idx,dg in enumerate(first.hdblock.get_data_groups()):
+                    cg_ptr = 0
+                    db_ptr = 0
+                    parts = [mdf_obj.hdblock.get_data_groups()[dg_idx] for mdf_obj in self.mdfs]
+                    for cg in dg.get_channel_groups():
+                        cn_ptr = 0
+                        for ch in reversed(cg.get_channels()):
+                            cn_ptr = writer.copy_channel(ch=ch,ncb_ptr=cn_ptr)
+                        ct_ptr = writer.copy_block(struct.unpack("{0}I".format(writer.fmtprefix),cg.data[12:16])[0])
+                        num_recs = sum([part.calc_data_block_size() for part in parts])//cg.get_record_size()
+                        cg_ptr = writer.write(_build_cg_block(0,cn_ptr,ct_ptr,cg.record_id,len(cg.get_channels()),cg.get_record_size(),num_recs,bord=bord))
+                        time_channel = cg.get_time_channel()
+                        for src,part,offset in zip(srcs,parts,self.offsets):
+                            part_recs = part.calc_data_block_size()//cg.get_record_size()
+                            if not (part.data_block_ptr and part_recs):
+                                continue
+                            ptr = writer.copy_records(foffset=part.data_block_ptr,rec_size=cg.get_record_size(),start=0,stop=part_recs,chunk_size=chunk_size,
+                                                      src=src,transform=lambda recs,offset=offset: _shift_time_column(recs,time_channel,bord,offset))
+                            if not db_ptr:
+                                db_ptr = ptr
+                    trigger_events = []
+                    for part,offset in zip(parts,self.offsets):
+                        for tev in part.get_trigger_events():
+                            tev = dict(tev)
+                            tev.update({"trigger_time":tev["trigger_time"]+offset})
+                            trigger_events.append(tev)
+                    tr_ptr = 0
+                    if trigger_events:
+                        tr_ptr = writer.write(_build_tr_block(0,trigger_events,bord=bord))
+                    dg_ptrs.append(writer.write(_build_dg_block(0,cg_ptr,tr_ptr,db_ptr,bord=bord)))
+                writer.write_header(hd_ptr=hd_ptr,dg_ptrs=dg_ptrs,fc_ptr=fc_ptr,hdblock=first.hdblock)
+        finally:
+            for src in srcs:
+                src.close()
+        return
 
     
 
 def selftest(testmode="read_mdf",fname="test.mdf"):
-    from mdftools import to_csv_file,to_xlsx_file
+    from .mdftools import to_csv_file,to_xlsx_file
     if testmode == "mdf2csv":
         a = mdf(fname=fname)
         c = fname[:-3] + "csv" 
@@ -1274,12 +4497,7 @@ def selftest(testmode="read_mdf",fname="test.mdf"):
     return
 
 if __name__ == "__main__":
-    from optparse import OptionParser
-    parser = OptionParser()
-    parser.add_option("-c", "--command", dest="command", default="mdf2xlsx",
-                      help="COMMAND to execute", metavar="COMMAND")
-    parser.add_option("-f", "--file", dest="fname", default="recorder1-001.mdf",
-                      help="FILE to use", metavar="FILE")    
-    (options, args) = parser.parse_args()
- 
-    selftest(testmode = options.command,fname=options.fname)
+    #python -m mdfminer.mdf, same as the mdfminer command
+    import sys
+    from .cli import main
+    sys.exit(main())
@@ -0,0 +1,719 @@
+# mdf4.py
+# (C) 2017 Patrick Menschel
+
+
+import os
+import struct
+import zlib
+import time
+import datetime
+import threading
+import concurrent.futures
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from .mdf import (mdf_block,
+                  hd_block,
+                  dg_block,
+                  cg_block,
+                  cn_block,
+                  cc_block,
+                  _open_file,
+                  )
+
+
+DECOMPRESSION_WORKERS = os.cpu_count() or 1#threads of the shared pool that inflates DZ blocks
+PREFETCH_BLOCKS = 2#DZ blocks per worker inflated ahead of a sequential read
+
+MDF4_CONVERSION_TYPES = {0:"1:1 conversion (Int=Phys)",
+                         1:"parametric,linear",
+                         2:"rational conversion formula",
+                         3:"algebraic conversion",
+                         4:"value to value tabular with interpolation",
+                         5:"value to value tabular",
+                         6:"value range to value tabular",
+                         7:"ASAM-MCD2 Text Table(COMPU_VTAB)",
+                         8:"value range to text",
+                         9:"text to value",
+                         10:"text to text",
+                         11:"bitfield text table",
+                         }
+
+
+def _get_signal_type(data_type,bit_count):
+    """
+    maps a version 4 data type to the version 3 signal data type the decoders understand
+    @param data_type: the version 4 data type
+    @param bit_count: the number of bits
+    @return: the version 3 signal data type, a description string for data types without equivalent
+    """
+    if data_type == 0:
+        return 0#unsigned integer, the default byte order of version 4 files is little endian
+    if data_type == 1:
+        return 9#unsigned integer big endian
+    if data_type == 2:
+        return 1
+    if data_type == 3:
+        return 10
+    if data_type == 4:
+        if bit_count == 32:
+            return 2
+        return 3
+    if data_type == 5:
+        if bit_count == 32:
+            return 11
+        return 12
+    if data_type in [6,7]:
+        return 7#latin1 and utf8 strings
+    if data_type == 10:
+        return 8
+    return "mdf4 data type {0}".format(data_type)
+
+
+def _read_block_header(fobj,foffset):
+    """
+    reads the header and the links of a version 4 block
+    @param fobj: the file object
+    @param foffset: the offset in the file where the block starts
+    @return: a tuple (block id, block length, list of links), the file is positioned at the data section
+    """
+    fobj.seek(foffset)
+    header = fobj.read(24)
+    if len(header) != 24 or header[:2] != b"##":
+        raise ValueError("No block at offset {0}".format(foffset))
+    block_id = header[2:4].decode()
+    instr = getattr(fobj,"instrumentation",None)
+    if instr is not None:
+        instr.count_block(block_id)
+    length,link_count = struct.unpack("<QQ",header[8:24])
+    links = []
+    if link_count:
+        links = list(struct.unpack("<{0}Q".format(link_count),fobj.read(8*link_count)))
+    return (block_id,length,links)
+
+
+def _xml_elements(root,name):
+    """
+    @return: the elements with the tag name below root, the namespace is ignored
+    """
+    return [el for el in root.iter() if el.tag.rsplit("}",1)[-1] == name]
+
+
+def _read_text(fobj,ptr):
+    """
+    @param fobj: the file object
+    @param ptr: a link to a TX or MD block
+    @return: the text or the xml string of the block, "" for a null link
+    """
+    if not ptr:
+        return ""
+    return mdf4_block(fobj=fobj,foffset=ptr).data.split(b'\x00',1)[0].decode("utf-8",errors="replace")
+
+
+def _read_comment(fobj,ptr):
+    """
+    @param fobj: the file object
+    @param ptr: a link to a TX or MD block
+    @return: the text of a TX block or the TX element of an MD block
+    """
+    text = _read_text(fobj=fobj,ptr=ptr)
+    if text.startswith("<"):
+        try:
+            root = ET.fromstring(text)
+        except ET.ParseError:
+            return text
+        for el in _xml_elements(root,"TX"):
+            return (el.text or "").strip()
+        return ""
+    return text
+
+
+def _interpret_hd4_comment(text):
+    """
+    @param text: the xml string of the MD block of the header
+    @return: a dictionary with text, author, organisation, subject and project
+    """
+    ret = {"text":text,"author":"","organisation":"","subject":"","project":""}
+    if not text.startswith("<"):
+        return ret
+    try:
+        root = ET.fromstring(text)
+    except ET.ParseError:
+        return ret
+    ret.update({"text":""})
+    for el in _xml_elements(root,"TX"):
+        ret.update({"text":(el.text or "").strip()})
+        break
+    names = {"author":"author","department":"organisation","subject":"subject","project":"project"}
+    for el in _xml_elements(root,"e"):
+        name = names.get(el.get("name"))
+        if name:
+            ret.update({name:(el.text or "").strip()})
+    return ret
+
+
+def _interpret_hd4_block(data):
+    """
+    interprets the data section of a version 4 hd block
+    @param data: the bytes after the links
+    @return: a dictionary with the contents
+    @note: the timestamp is local time if the file has time zone information, else utc
+    """
+    start_time_ns,tz_offset,dst_offset,time_flags = struct.unpack("<QhhB",data[:13])
+    timestamp = datetime.datetime(1970,1,1)+datetime.timedelta(microseconds=start_time_ns//1000)
+    if time_flags & 2 and not time_flags & 1:
+        timestamp += datetime.timedelta(minutes=tz_offset+dst_offset)
+    return {"timestamp":timestamp,
+            "start_time_ns":start_time_ns,
+            "time_zone_offset":tz_offset,
+            "daylight_saving_offset":dst_offset,
+            "time_flags":time_flags,
+            }
+
+
+def _interpret_cg4_block(data):
+    record_id,cycle_count,flags,path_separator,data_bytes,invalidation_bytes = struct.unpack("<QQHH4xII",data[:32])
+    return {"record_id":record_id,
+            "number_of_records":cycle_count,
+            "flags":flags,
+            "data_bytes":data_bytes,
+            "invalidation_bytes":invalidation_bytes,
+            }
+
+
+def _interpret_cn4_block(data):
+    (cn_type,sync_type,data_type,bit_offset,byte_offset,bit_count,flags,invalidation_bit,precision,
+     attachments,val_min,val_max,limit_min,limit_max,limit_ext_min,limit_ext_max) = struct.unpack("<BBBBIIIIBxH6d",data[:72])
+    return {"cn_type":cn_type,
+            "sync_type":sync_type,
+            "data_type":data_type,
+            "bit_offset":bit_offset,
+            "byte_offset":byte_offset,
+            "number_of_bits":bit_count,
+            "flags":flags,
+            "range_valid":bool(flags & 0x08),
+            "signal_min":val_min,
+            "signal_max":val_max,
+            }
+
+
+def _interpret_cc4_block(data):
+    cc_type,precision,flags,ref_count,val_count,phy_min,phy_max = struct.unpack("<BBHHHdd",data[:24])
+    return {"cc_type":cc_type,
+            "range_valid":bool(flags & 0x02),
+            "signal_min":phy_min,
+            "signal_max":phy_max,
+            "values":struct.unpack("<{0}d".format(val_count),data[24:24+8*val_count]),
+            }
+
+
+def _read_data_fragments(fobj,ptr):
+    """
+    follows the data blocks of a data group, only the block headers are read
+    @param fobj: the file object
+    @param ptr: the data link of the data group to a DT, DZ, DL or HL block
+    @return: a list of tuples (block id, offset of the data in the file, stored length, original length, zip type, zip parameter)
+    """
+    ret = []
+    while ptr:
+        block_id,length,links = _read_block_header(fobj=fobj,foffset=ptr)
+        ptr = 0
+        if block_id == "DT":
+            ret.append(("DT",fobj.tell(),length-24,length-24,0,0))
+        elif block_id == "DZ":
+            org_block_id,zip_type,zip_parameter,org_length,stored_length = struct.unpack("<2sBxIQQ",fobj.read(24))
+            if org_block_id != b"DT":
+                raise NotImplementedError("DZ block of {0} blocks not supported".format(org_block_id.decode()))
+            if zip_type not in [0,1]:
+                raise NotImplementedError("Zip type {0} not supported".format(zip_type))
+            ret.append(("DZ",fobj.tell(),stored_length,org_length,zip_type,zip_parameter))
+        elif block_id == "DL":
+            for data_ptr in links[1:]:
+                ret.extend(_read_data_fragments(fobj=fobj,ptr=data_ptr))
+            ptr = links[0]
+        elif block_id == "HL":
+            ptr = links[0]
+        else:
+            raise NotImplementedError("Data block {0} not supported".format(block_id))
+    return ret
+
+
+def _inflate_block(data,length,zip_type,zip_parameter,instr=None):
+    """
+    decompresses the data of a DZ block, runs in the threads of the decompression pool
+    @param data: the compressed bytes
+    @param length: the original length
+    @param zip_type: 0 for deflate, 1 for transposed and deflated
+    @param zip_parameter: the number of columns of the transposition, e.g. the record size
+    @param instr: an instrumentation object that receives the time or None
+    @return: the original bytes
+    """
+    strt = time.perf_counter()
+    ret = zlib.decompress(data,bufsize=max(length,1))
+    if len(ret) != length:
+        raise ValueError("DZ block inflated to {0} bytes instead of {1}".format(len(ret),length))
+    if zip_type == 1 and zip_parameter > 1:
+        rows = length//zip_parameter
+        columns = np.frombuffer(ret,dtype=np.uint8,count=rows*zip_parameter).reshape(zip_parameter,rows)
+        ret = columns.T.tobytes()+ret[rows*zip_parameter:]
+    if instr is not None:
+        instr.add_time("inflate",time.perf_counter()-strt)
+    return ret
+
+
+_decompression_pool = None
+_decompression_pool_lock = threading.Lock()
+
+
+def _get_decompression_pool():
+    """
+    @return: the process wide thread pool that inflates DZ blocks, zlib releases the gil while it inflates
+    """
+    global _decompression_pool
+    with _decompression_pool_lock:
+        if _decompression_pool is None:
+            _decompression_pool = concurrent.futures.ThreadPoolExecutor(max_workers=DECOMPRESSION_WORKERS,
+                                                                        thread_name_prefix="mdfminer-inflate")
+    return _decompression_pool
+
+
+class _data_list_file():
+
+    def __init__(self,f,fragments,sequential=True):
+        """
+        file object over the data blocks of a data group
+        @param f: the file object
+        @param fragments: the data blocks, see _read_data_fragments
+        @param sequential: True to inflate the following DZ blocks in the thread pool ahead of the reads
+        @return: the file object, offset 0 is the start of the first record
+        @note: only the current and the prefetched DZ blocks are kept in memory
+        """
+        self.f = f
+        self.fragments = fragments
+        self.starts = np.cumsum([0,]+[fragment[3] for fragment in fragments])
+        self.size = int(self.starts[-1])
+        self.position = 0
+        self.sequential = sequential
+        self.inflated = {}#fragment index: future or bytes of a DZ block
+
+    def read(self,size=-1):
+        end = self.size
+        if size is not None and size >= 0:
+            end = min(self.position+size,self.size)
+        parts = []
+        idx = int(np.searchsorted(self.starts,self.position,side="right"))-1
+        while self.position < end:
+            first = int(self.starts[idx])
+            last = int(self.starts[idx+1])
+            if last > self.position:
+                num = min(end,last)-self.position
+                parts.append(self._read_fragment(idx=idx,offset=self.position-first,size=num))
+                self.position += num
+            idx += 1
+        if len(parts) == 1:
+            return parts[0]
+        return b"".join(parts)
+
+    def _read_fragment(self,idx,offset,size):
+        block_id,foffset,stored_length,length,zip_type,zip_parameter = self.fragments[idx]
+        if block_id == "DT":
+            self.f.seek(foffset+offset)
+            return self.f.read(size)
+        return memoryview(self._inflate(idx))[offset:offset+size]
+
+    def _inflate(self,idx):
+        """
+        @return: the inflated bytes of the DZ block idx, following DZ blocks are submitted to the pool if sequential
+        """
+        instr = getattr(self.f,"instrumentation",None)
+        if not self.sequential:
+            if idx not in self.inflated:
+                block_id,foffset,stored_length,length,zip_type,zip_parameter = self.fragments[idx]
+                self.f.seek(foffset)
+                self.inflated = {idx:_inflate_block(data=self.f.read(stored_length),length=length,zip_type=zip_type,
+                                                    zip_parameter=zip_parameter,instr=instr)}
+            return self.inflated[idx]
+        for key in [key for key in self.inflated if key < idx]:
+            del self.inflated[key]
+        pool = _get_decompression_pool()
+        for nidx in range(idx,min(idx+1+(PREFETCH_BLOCKS*DECOMPRESSION_WORKERS),len(self.fragments))):
+            block_id,foffset,stored_length,length,zip_type,zip_parameter = self.fragments[nidx]
+            if block_id != "DZ" or nidx in self.inflated:
+                continue
+            self.f.seek(foffset)
+            self.inflated[nidx] = pool.submit(_inflate_block,data=self.f.read(stored_length),length=length,zip_type=zip_type,
+                                              zip_parameter=zip_parameter,instr=instr)
+        ret = self.inflated[idx]
+        if isinstance(ret,concurrent.futures.Future):
+            ret = ret.result()
+            self.inflated[idx] = ret
+        return ret
+
+    def seek(self,offset,whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        self.position = max(offset,0)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def close(self):
+        for ret in self.inflated.values():
+            if isinstance(ret,concurrent.futures.Future):
+                ret.cancel()
+        self.inflated = {}
+        self.f.close()
+        return
+
+    def __getattr__(self,name):
+        return getattr(self.f,name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
+        return False
+
+
+class mdf4_block(mdf_block):
+
+    def __init__(self,fobj,foffset,*args,**kwargs):
+        """
+        parent class for all block structures in version 4 mdf files
+        @param fobj: the file object
+        @param foffset: the offset in the file where the block starts
+        @return: the block as an object
+        @note: links holds the 64 bit links, data holds the data section after the links
+        """
+        block_id,length,self.links = _read_block_header(fobj=fobj,foffset=foffset)
+        size = length-24-(8*len(self.links))
+        self.data = fobj.read(size)
+        if len(self.data) != size:
+            raise ValueError("Block {0} length invalid block_size={1} len(data)={2}".format(block_id,size,len(self.data)))
+        self.block_data = {"block_id":block_id}
+
+
+class hd4_block(mdf4_block,hd_block):
+
+    def __init__(self,fobj,vers,bord,ignore_channels=[],foffset=64,*args,**kwargs):
+        """
+        header block of a version 4 mdf file
+        @param fobj: the file object
+        @param vers: mdf file version
+        @param bord: byte order of contents, always little endian
+        @param ignore_channels: a list of strings which channels are to be ignored, i.e. program specific stuff
+        @param foffset: the offset in the file where the block starts, 64 bytes for hd block
+        @return: the block as an object
+        @note: author, organisation, project and subject are read from the common properties of the comment,
+               organisation is the department
+        """
+        super(hd4_block,self).__init__(fobj=fobj,foffset=foffset)
+        assert(self.block_data["block_id"] == "HD")
+        self.block_data.update(_interpret_hd4_block(self.data))
+        comment = _interpret_hd4_comment(_read_text(fobj=fobj,ptr=self.links[5]))
+
+        self.author = comment["author"]
+        self.organisation = comment["organisation"]
+        self.project = comment["project"]
+        self.subject = comment["subject"]
+        self.timestamp = self.block_data.pop("timestamp")
+        self.text = comment["text"]
+        self.program_data = None
+
+        self.ignore_channels = ignore_channels
+        self.can_index = None
+
+        self.data_groups = []
+        dg_ptr = self.links[0]
+        while dg_ptr > 0:
+            dgb = dg4_block(fobj=fobj,vers=vers,bord=bord,foffset=dg_ptr,timestamp=self.timestamp,ignore_channels=self.ignore_channels)
+            self.data_groups.append(dgb)
+            dg_ptr = dgb.links[0]
+        self.number_of_data_groups = len(self.data_groups)
+
+    def get_number_of_available_records(self,fname,dg,finished=True):
+        #the data blocks of version 4 files are not contiguous, only the records of the channel group are available
+        ret = 0
+        for cg in dg.get_channel_groups():
+            ret = cg.get_number_of_records()
+        return ret
+
+
+class dg4_block(mdf4_block,dg_block):
+
+    def __init__(self,fobj,foffset,vers,bord,timestamp,ignore_channels=[],*args,**kwargs):
+        """
+        data group block of a version 4 mdf file
+        @param fobj: the file object
+        @param foffset: the offset in the file where the block starts
+        @param vers: mdf file version
+        @param bord: byte order of contents
+        @param timestamp: the timestamp of the file to calculate absolute timestamp later
+        @param ignore_channels: a list of strings which channels are to be ignored, i.e. program specific stuff
+        @return: the block as an object
+        @note: channel groups of variable length signal data and channel groups without a time master,
+               e.g. angle, distance or index masters, are skipped
+        """
+        super(dg4_block,self).__init__(fobj=fobj,foffset=foffset)
+        assert(self.block_data["block_id"] == "DG")
+
+        self.ignore_channels = ignore_channels
+        self.timestamp = timestamp
+        self.number_of_record_ids = self.data[0]
+
+        self.channel_groups = []
+        number_of_channel_groups = 0
+        chgb_ptr = self.links[1]
+        while chgb_ptr > 0:
+            chgb = cg4_block(fobj=fobj,vers=vers,bord=bord,foffset=chgb_ptr,record_id_size=self.number_of_record_ids,
+                             ignore_channels=self.ignore_channels)
+            number_of_channel_groups += 1
+            if not chgb.flags & 0x01 and chgb.time_channel_idx is not None:
+                self.channel_groups.append(chgb)
+            chgb_ptr = chgb.links[0]
+        if number_of_channel_groups > 1:
+            raise NotImplementedError("This MDF File is unsorted, e.g. contains more than one channel groups in a single data block, ({0} found)".format(number_of_channel_groups))
+
+        self.trigger_block = None
+        self.number_of_channel_groups = len(self.channel_groups)
+        self.data_block_ptr = self.links[2]
+
+
+class cg4_block(mdf4_block,cg_block):
+
+    def __init__(self,fobj,foffset,vers,bord,record_id_size=0,ignore_channels=[],*args,**kwargs):
+        """
+        channel group block of a version 4 mdf file
+        @param fobj: the file object
+        @param foffset: the offset in the file where the block starts
+        @param vers: mdf file version
+        @param bord: byte order of contents
+        @param record_id_size: the number of bytes of the record id in front of each record
+        @param ignore_channels: a list of strings which channels are to be ignored, i.e. program specific stuff
+        @return: the block as an object
+        @note: variable length and virtual channels are skipped, the master channel of synchronization type time
+               is the time channel, invalidation bits are not evaluated,
+               virtual time masters raise NotImplementedError, their timestamps are not stored in the records
+        """
+        super(cg4_block,self).__init__(fobj=fobj,foffset=foffset)
+        assert(self.block_data["block_id"] == "CG")
+        self.instrumentation = getattr(fobj,"instrumentation",None)
+        self.block_data.update(_interpret_cg4_block(self.data))
+
+        self.ignore_channels = ignore_channels
+        self.bord = bord
+        self.records = []
+        self.channels = []
+        self.derived_channels = []
+        self.time_channel_idx = None
+        self.data_fragments = None
+        self.flags = self.block_data.pop("flags")
+        chb_ptr = self.links[1]
+        while chb_ptr > 0 and not self.flags & 0x01:
+            chb = cn4_block(fobj=fobj,vers=vers,bord=bord,foffset=chb_ptr,record_id_size=record_id_size)
+            if chb.cn_type == 3 and chb.sync_type == 1:
+                raise NotImplementedError("Channel group {0} has the virtual time master {1}".format(_read_text(fobj=fobj,ptr=self.links[2]),
+                                                                                                  chb.get_short_name()))
+            if chb.cn_type not in [1,3,6]:
+                self.channels.append(chb)
+            chb_ptr = chb.links[0]
+        for idx,ch in enumerate(self.channels):
+            if ch.get_channel_type() == "time":
+                self.time_channel_idx = idx
+                break
+        self.text = _read_comment(fobj=fobj,ptr=self.links[2])
+
+        self.record_id = self.block_data.pop("record_id")
+        self.number_of_channels = len(self.channels)
+        self.record_size = record_id_size+self.block_data.pop("data_bytes")+self.block_data.pop("invalidation_bytes")
+        self.number_of_records = self.block_data.pop("number_of_records")
+        self.sample_reductions = []
+
+    def _open_records(self,fname,foffset,sequential=True):
+        f = _open_file(fname,instr=self.instrumentation)
+        if self.data_fragments is None:
+            self.data_fragments = _read_data_fragments(fobj=f,ptr=foffset)
+        return _data_list_file(f=f,fragments=self.data_fragments,sequential=sequential)
+
+
+class cn4_block(mdf4_block,cn_block):
+
+    def __init__(self,fobj,foffset,vers,bord,record_id_size=0,*args,**kwargs):
+        """
+        channel block of a version 4 mdf file
+        @param fobj: the file object
+        @param foffset: the offset in the file where the block starts
+        @param vers: mdf file version
+        @param bord: byte order of contents
+        @param record_id_size: the number of bytes of the record id in front of each record
+        @return: the block as an object
+        @note: the data type is mapped to the version 3 signal data type, the bit offset includes the byte offset
+        """
+        super(cn4_block,self).__init__(fobj=fobj,foffset=foffset)
+        assert(self.block_data["block_id"] == "CN")
+        self.block_data.update(_interpret_cn4_block(self.data))
+
+        self.conversion_block = None
+        self.conversion_formula = None
+        self.column_conversion_formula = None
+        unit = _read_comment(fobj=fobj,ptr=self.links[6])
+        if self.links[4]:
+            self.conversion_block = cc4_block(fobj=fobj,vers=vers,bord=bord,foffset=self.links[4],unit=unit)
+            self.conversion_formula = self.conversion_block.get_conversion_function()
+            self.column_conversion_formula = self.conversion_block.get_column_conversion_function()
+        self.unit = unit
+        self.extentions = None
+        self.dependencies = None
+        self.text = _read_comment(fobj=fobj,ptr=self.links[7])
+
+        self.cn_type = self.block_data.pop("cn_type")
+        self.sync_type = self.block_data.pop("sync_type")
+        self.data_type = self.block_data.pop("data_type")
+        self.channel_type = "data"
+        if self.cn_type == 2 and self.sync_type == 1:
+            self.channel_type = "time"
+        self.short_signal_name = _read_text(fobj=fobj,ptr=self.links[2])
+        self.signal_description = self.text
+        self.bit_offset = ((record_id_size+self.block_data.pop("byte_offset"))*8)+self.block_data.pop("bit_offset")
+        self.number_of_bits = self.block_data.pop("number_of_bits")
+        self.byte_offset = 0
+        self.signal_data_type = _get_signal_type(self.data_type,self.number_of_bits)
+        self.range_valid = self.block_data.pop("range_valid")
+        self.signal_min = self.block_data.pop("signal_min")
+        self.signal_max = self.block_data.pop("signal_max")
+        self.sampling_rate = 0.0
+        self.long_signal_name = None
+        self.display_name = None
+
+
+class cc4_block(mdf4_block,cc_block):
+
+    def __init__(self,fobj,foffset,vers,bord,unit="",*args,**kwargs):
+        """
+        channel conversion block of a version 4 mdf file
+        @param fobj: the file object
+        @param foffset: the offset in the file where the block starts
+        @param vers: mdf file version
+        @param bord: byte order of contents
+        @param unit: the unit of the channel, it has precedence over the unit of the conversion
+        @return: the block as an object
+        @note: linear, rational, value to value and value to text conversions are handled,
+               the other conversions raise NotImplementedError when values are converted
+        """
+        super(cc4_block,self).__init__(fobj=fobj,foffset=foffset)
+        assert(self.block_data["block_id"] == "CC")
+        self.block_data.update(_interpret_cc4_block(self.data))
+
+        self.range_valid = self.block_data.pop("range_valid")
+        self.signal_min = self.block_data.pop("signal_min")
+        self.signal_max = self.block_data.pop("signal_max")
+        self.physical_unit = unit or _read_comment(fobj=fobj,ptr=self.links[1])
+        cc_type = self.block_data.pop("cc_type")
+        self.conversion_type = MDF4_CONVERSION_TYPES.get(cc_type,"unknown {0}".format(cc_type))
+        self.size_information = None
+        values = self.block_data.pop("values")
+        self.parameters = None
+        if cc_type in [1,2]:
+            self.parameters = values
+        elif cc_type in [4,5]:
+            self.parameters = (np.array(values[0::2]),np.array(values[1::2]))
+        elif cc_type == 7:
+            self.parameters = {}
+            for val,ptr in zip(values,self.links[4:]):
+                if ptr and _read_block_header(fobj=fobj,foffset=ptr)[0] == "TX":
+                    self.parameters.update({val:_read_text(fobj=fobj,ptr=ptr)})
+
+    def get_conversion_function(self):
+        if self.conversion_type in ["rational conversion formula",
+                                    "value to value tabular with interpolation",
+                                    "value to value tabular"]:
+            column_conversion = self.get_column_conversion_function()
+            return lambda x: column_conversion(np.array([x,]))[0].item()
+        elif self.conversion_type in ["parametric,linear",
+                                      "ASAM-MCD2 Text Table(COMPU_VTAB)",
+                                      "1:1 conversion (Int=Phys)"]:
+            return super(cc4_block,self).get_conversion_function()
+        return self._not_implemented
+
+    def get_column_conversion_function(self):
+        if self.conversion_type == "rational conversion formula":
+            #float64 like the python floats of the record path, float32 raw values would stay float32
+            return lambda x: self._rational(np.asarray(x,dtype=np.float64))
+        elif self.conversion_type == "value to value tabular with interpolation":
+            keys,vals = self.parameters
+            return lambda x: np.interp(x,keys,vals)
+        elif self.conversion_type == "value to value tabular":
+            return self._lookup_nearest
+        elif self.conversion_type in ["parametric,linear",
+                                      "ASAM-MCD2 Text Table(COMPU_VTAB)",
+                                      "1:1 conversion (Int=Phys)"]:
+            return super(cc4_block,self).get_column_conversion_function()
+        return self._not_implemented
+
+    def _rational(self,x):
+        p1,p2,p3,p4,p5,p6 = self.parameters
+        return ((p1*x*x)+(p2*x)+p3)/((p4*x*x)+(p5*x)+p6)
+
+    def _lookup_nearest(self,x):
+        #the value of the nearest key, the lower key on a tie
+        keys,vals = self.parameters
+        x = np.asarray(x,dtype=np.float64)
+        idx = np.clip(np.searchsorted(keys,x),1,max(len(keys)-1,1))
+        lower = np.where(x-keys[idx-1] <= keys[idx]-x,idx-1,idx)
+        return vals[np.clip(lower,0,len(keys)-1)]
+
+    def _not_implemented(self,x):
+        raise NotImplementedError("Conversion Type {0} not handled".format(self.conversion_type))
+
+
+def read_file_info4(fobj,idblock):
+    """
+    counterpart of read_file_info for version 4 files
+    @param fobj: the file object
+    @param idblock: the id block of the file
+    @return: a dictionary with the file information, the header and one entry per channel group
+    """
+    hd = mdf4_block(fobj=fobj,foffset=64)
+    header = _interpret_hd4_block(hd.data)
+    comment = _interpret_hd4_comment(_read_text(fobj=fobj,ptr=hd.links[5]))
+    groups = []
+    dg_ptr = hd.links[0]
+    dg_idx = 0
+    while dg_ptr:
+        dg = mdf4_block(fobj=fobj,foffset=dg_ptr)
+        cg_ptr = dg.links[1]
+        while cg_ptr:
+            cg = mdf4_block(fobj=fobj,foffset=cg_ptr)
+            cg_data = _interpret_cg4_block(cg.data)
+            if not cg_data["flags"] & 0x01:
+                number_of_channels = 0
+                cn_ptr = cg.links[1]
+                while cn_ptr:
+                    number_of_channels += 1
+                    cn_ptr = _read_block_header(fobj=fobj,foffset=cn_ptr)[2][0]
+                groups.append({"data_group":dg_idx,
+                               "record_id":cg_data["record_id"],
+                               "number_of_channels":number_of_channels,
+                               "record_size":dg.data[0]+cg_data["data_bytes"]+cg_data["invalidation_bytes"],
+                               "number_of_records":cg_data["number_of_records"],
+                               })
+            cg_ptr = cg.links[0]
+        dg_ptr = dg.links[0]
+        dg_idx += 1
+    return {"file_identifier":idblock.text,
+            "version":idblock.get_version(),
+            "program":idblock.block_data["program_identifier"],
+            "byte_order":idblock.get_byte_order(),
+            "timestamp":header["timestamp"],
+            "author":comment["author"],
+            "organisation":comment["organisation"],
+            "project":comment["project"],
+            "subject":comment["subject"],
+            "number_of_data_groups":dg_idx,
+            "channel_groups":groups,
+            }
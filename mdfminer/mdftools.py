@@ -1,29 +1,81 @@
 # mdf.py 
 # (C) 2017 Patrick Menschel
 
-def to_csv_file(mdf_obj,fname,useabsolutetime=False,csv_sep=",",line_sep=";\n"):
+import time
+import json
+import sqlite3
+import itertools
+
+import numpy as np
+
+from .mdf import instrumentation, change_column, _is_changed, _get_compact_flags, PROGRESS_INTERVAL, DEFAULT_CHUNK_SIZE
+
+
+SQLITE_PRAGMAS = ["PRAGMA journal_mode = MEMORY",
+                  "PRAGMA synchronous = OFF",
+                  "PRAGMA temp_store = MEMORY",
+                  "PRAGMA cache_size = -262144",
+                  ]#bulk load settings, a crash during the export leaves an unusable database
+SQLITE_LAYOUTS = ["wide","long"]
+
+
+def _get_export_instrumentation(mdf_obj,progress_callback,timing_callback):
+    """
+    @return: an instrumentation object for one export that reports to the callbacks and to the
+             instrumentation of the mdf object, None if neither is set
+    """
+    parent = getattr(mdf_obj,"instrumentation",None)
+    if parent is None and progress_callback is None and timing_callback is None:
+        return None
+    return instrumentation(progress_callback=progress_callback,timing_callback=timing_callback,parent=parent)
+
+
+def _get_record_short_names(mdf_obj):
+    """
+    @param mdf_obj: the mdf object
+    @return: the short names of the values of the records of mdf.get_records_with_timestamp,
+             the channels of the first channel group without its time channel followed by its derived channels
+    """
+    for dg in mdf_obj.hdblock.get_data_groups():
+        for cg in dg.get_channel_groups():
+            chs = list(cg.get_channels())
+            chs.pop(cg.get_time_channel_index())
+            return [ch.get_short_name() for ch in chs+cg.get_derived_channels()]
+    return []
+
+
+def to_csv_file(mdf_obj,fname,useabsolutetime=False,csv_sep=",",line_sep=";\n",progress_callback=None,timing_callback=None):
+    instr = _get_export_instrumentation(mdf_obj,progress_callback,timing_callback)
+    strt = time.perf_counter()
     with open(fname,'w') as f:
-        chans = mdf_obj.get_channel_short_names()
+        #the records only hold the channels of the first group
+        chans = _get_record_short_names(mdf_obj)
         f.write("time"+csv_sep+csv_sep.join(chans)+line_sep)
         records = mdf_obj.get_records_with_timestamp(useabsolutetime=useabsolutetime)
             
-        for record in records:
+        for rec_idx,record in enumerate(records,1):
             for timestamp in record:
                 thisrecord = record[timestamp]
-                f.write(str(timestamp)+csv_sep+csv_sep.join([str(thisrecord[chan]) for chan in chans])+line_sep)
+                f.write(str(timestamp)+csv_sep+csv_sep.join([str(val) for val in thisrecord])+line_sep)
+            if instr is not None and not rec_idx%PROGRESS_INTERVAL:
+                instr.progress("export",rec_idx)
+    if instr is not None:
+        instr.add_time("export",time.perf_counter()-strt)
     return
                         
-def to_xlsx_file(mdf_obj,fname,useabsolutetime=False):
+def to_xlsx_file(mdf_obj,fname,useabsolutetime=False,progress_callback=None,timing_callback=None):
     from openpyxl import Workbook
     from openpyxl.chart import (
                                 LineChart,
                                 Reference,
                                 )
+    instr = _get_export_instrumentation(mdf_obj,progress_callback,timing_callback)
+    strt = time.perf_counter()
     wb = Workbook()
     ws = wb.active
     ws.title = "data"
     row = ["time",]
-    chans = mdf_obj.get_channel_short_names()
+    chans = _get_record_short_names(mdf_obj)
     col_idx = len(chans)+1
     row.extend(chans)
     ws.append(row)
@@ -39,6 +91,8 @@ def to_xlsx_file(mdf_obj,fname,useabsolutetime=False):
             row.extend(thisrecord)
             ws.append(row)
             row_idx += 1
+        if instr is not None and not (row_idx-1)%PROGRESS_INTERVAL:
+            instr.progress("export",row_idx-1)
         
     c1 = LineChart()
     c1.title = "Line Chart"
@@ -51,4 +105,171 @@ def to_xlsx_file(mdf_obj,fname,useabsolutetime=False):
     ws2 = wb.create_sheet("Chart")
     ws2.add_chart(c1, "A1")
     wb.save(fname)
+    if instr is not None:
+        instr.add_time("export",time.perf_counter()-strt)
     return
+
+
+def _get_sqlite_type(dtype):
+    if dtype.kind in "biu":
+        return "INTEGER"
+    if dtype.kind == "f":
+        return "REAL"
+    if dtype.kind == "V":
+        return "BLOB"
+    return "TEXT"
+
+
+def _quote(name):
+    return '"{0}"'.format(name.replace('"','""'))
+
+
+def _get_column_names(short_names):
+    """
+    @param short_names: the short names of the channels of one wide table
+    @return: a list of column names, a name that sqlite takes for an earlier column gets a suffix _2, _3 ...
+    @note: sqlite compares column names case insensitive and the first column is time
+    """
+    used = set(["time",])
+    ret = []
+    for short_name in short_names:
+        name = short_name
+        num = 1
+        while name.lower() in used:
+            num += 1
+            name = "{0}_{1}".format(short_name,num)
+        used.add(name.lower())
+        ret.append(name)
+    return ret
+
+
+def _describe_conversion(ch):
+    cc = getattr(ch,"conversion_block",None)
+    if cc is None:
+        return None
+    return json.dumps({"type":cc.conversion_type,"parameters":cc.parameters},default=str)
+
+
+def to_sqlite(mdf_obj,db_path,short_names=None,layout="wide",start=None,stop=None,raw=False,chunk_size=DEFAULT_CHUNK_SIZE,
+              compact=False,progress_callback=None,timing_callback=None):
+    """
+    exports channels to typed sqlite tables, one table per data group
+    @param mdf_obj: the mdf object
+    @param db_path: path to the sqlite database, created if it does not exist
+    @param short_names: a list of channel short names, None for all channels
+    @param layout: "wide" for a time column and one column per channel,
+                   "long" for rows of (time, channel_id, value) with an index on (channel_id, time)
+    @param start: start of the time range in seconds, None for the start of the measurement
+    @param stop: end of the time range in seconds (included), None for the end of the measurement
+    @param raw: True for the stored values, see cn_block.convert
+    @param chunk_size: the number of records decoded and inserted at once
+    @param compact: True or a list of short names that are read as change columns, see mdf.get_columns,
+                    the long layout only writes one row per run of equal values of these channels
+    @return: the number of inserted rows
+    @note: the tables are named group_N after the index of the data group and replaced if they exist,
+           the channels table holds the table, column or channel_id, unit, description and conversion of each channel,
+           a channel is exported once, wide columns of names that only differ in case get a suffix, e.g. speed_2,
+           each data group is inserted in one transaction with the pragmas of SQLITE_PRAGMAS
+    """
+    if layout not in SQLITE_LAYOUTS:
+        raise ValueError("Unknown layout {0}".format(layout))
+    if short_names is None:
+        short_names = mdf_obj.get_channel_short_names()
+    elif isinstance(short_names,str):
+        short_names = [short_names,]
+    #repeated names resolve to the same channel
+    short_names = list(dict.fromkeys(short_names))
+    instr = _get_export_instrumentation(mdf_obj,progress_callback,timing_callback)
+    strt = time.perf_counter()
+    dg_indexes = {id(dg):idx for idx,dg in enumerate(mdf_obj.hdblock.get_data_groups())}
+    connection = sqlite3.connect(db_path)
+    num_rows = 0
+    try:
+        for pragma in SQLITE_PRAGMAS:
+            connection.execute(pragma)
+        with connection:
+            connection.execute("""CREATE TABLE IF NOT EXISTS channels (
+                                  id INTEGER PRIMARY KEY,
+                                  table_name TEXT NOT NULL,
+                                  short_name TEXT NOT NULL,
+                                  column_name TEXT,
+                                  description TEXT,
+                                  unit TEXT,
+                                  conversion TEXT,
+                                  data_group INTEGER,
+                                  signal_data_type INTEGER,
+                                  number_of_bits INTEGER,
+                                  sqlite_type TEXT)""")
+        for dg,names in mdf_obj.hdblock.get_data_groups_for_channels(short_names):
+            dg_idx = dg_indexes[id(dg)]
+            table = "group_{0}".format(dg_idx)
+            first,last = dg.find_record_range(fname=mdf_obj.fname,start=start,stop=stop)
+            chunks = dg.iter_columns(fname=mdf_obj.fname,short_names=names,chunk_size=chunk_size,start=first,stop=last,raw=raw,
+                                     compact=_get_compact_flags(compact,names))
+            #the column types are only known after decoding the first chunk
+            chunks = iter(chunks)
+            chunk = next(chunks,None)
+            if chunk is None:
+                types = ["REAL" for short_name in names]
+            else:
+                types = [_get_sqlite_type(val.dtype) for val in chunk[1]]
+                chunks = itertools.chain([chunk,],chunks)
+            with connection:
+                connection.execute("DROP TABLE IF EXISTS {0}".format(table))
+                connection.execute("DELETE FROM channels WHERE table_name = ?",(table,))
+                channel_ids = []
+                column_names = _get_column_names(names) if layout == "wide" else [None,]*len(names)
+                for short_name,column_name,sqlite_type in zip(names,column_names,types):
+                    ch = dg.get_channel_by_short_name(short_name=short_name)
+                    unit = getattr(ch,"unit","")
+                    if getattr(ch,"conversion_block",None) is not None:
+                        unit = ch.conversion_block.physical_unit
+                    signal_data_type = None
+                    number_of_bits = None
+                    if hasattr(ch,"get_signal_type"):
+                        signal_data_type = ch.get_signal_type()
+                        number_of_bits = ch.get_bit_size()
+                    cur = connection.execute("""INSERT INTO channels (table_name,short_name,column_name,description,unit,conversion,
+                                                data_group,signal_data_type,number_of_bits,sqlite_type) VALUES (?,?,?,?,?,?,?,?,?,?)""",
+                                             (table,short_name,column_name,ch.signal_description,unit,_describe_conversion(ch),
+                                              dg_idx,signal_data_type,number_of_bits,sqlite_type))
+                    channel_ids.append(cur.lastrowid)
+                if layout == "wide":
+                    columns = ",".join(["time REAL",]+["{0} {1}".format(_quote(column_name),sqlite_type)
+                                                       for column_name,sqlite_type in zip(column_names,types)])
+                    connection.execute("CREATE TABLE {0} ({1})".format(table,columns))
+                    insert = "INSERT INTO {0} VALUES ({1})".format(table,",".join(["?",]*(len(names)+1)))
+                else:
+                    #the values of different channels share one column, so it has no type affinity
+                    connection.execute("CREATE TABLE {0} (time REAL,channel_id INTEGER,value)".format(table))
+                    insert = "INSERT INTO {0} VALUES (?,?,?)".format(table)
+                held = {}#last value of each compact channel, runs continue across chunks
+                for t,vals in chunks:
+                    t = t.tolist()
+                    if layout == "wide":
+                        connection.executemany(insert,zip(t,*[np.asarray(val).tolist() for val in vals]))
+                        num_rows += len(t)
+                    else:
+                        for channel_id,val in zip(channel_ids,vals):
+                            if isinstance(val,change_column):
+                                times = val.times
+                                values = val.values
+                                if channel_id in held and len(values) and not _is_changed(held[channel_id],values[:1])[0]:
+                                    times = times[1:]
+                                    values = values[1:]
+                                if len(val.values):
+                                    held[channel_id] = val.values[-1:]
+                                connection.executemany(insert,zip(times.tolist(),itertools.repeat(channel_id),values.tolist()))
+                                num_rows += len(times)
+                            else:
+                                connection.executemany(insert,zip(t,itertools.repeat(channel_id),val.tolist()))
+                                num_rows += len(t)
+                    if instr is not None:
+                        instr.progress("export",num_rows)
+                if layout == "long":
+                    connection.execute("CREATE INDEX {0} ON {1} (channel_id,time)".format(_quote(table+"_channel_time"),table))
+    finally:
+        connection.close()
+    if instr is not None:
+        instr.add_time("export",time.perf_counter()-strt)
+    return num_rows
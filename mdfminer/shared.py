@@ -0,0 +1,310 @@
+# shared.py
+# (C) 2017 Patrick Menschel
+
+
+import os
+import json
+import time
+import struct
+import tempfile
+import contextlib
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+from .mdf import DEFAULT_CHUNK_SIZE
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+SHARED_ALIGNMENT = 64#byte alignment of the columns in the segment
+_HEADER = struct.Struct("<qqq")#reference count, length of the manifest, state
+STATE_DECODING = 0#the creator still writes the columns
+STATE_READY = 1
+STATE_FAILED = -1#decoding failed, the segment is removed
+
+
+def _align(offset):
+    return -(-offset//SHARED_ALIGNMENT)*SHARED_ALIGNMENT
+
+
+def _get_unit(ch):
+    if getattr(ch,"conversion_block",None) is not None:
+        return ch.conversion_block.physical_unit
+    return getattr(ch,"unit","")
+
+
+def _untrack(shm):
+    #the segment lives until the last reference is closed, not until the process that opened it exits
+    try:
+        resource_tracker.unregister(shm._name,"shared_memory")
+    except Exception:
+        pass
+    return
+
+
+def _unlink(shm):
+    #unlink() unregisters the segment from the resource tracker again
+    resource_tracker.register(shm._name,"shared_memory")
+    shm.unlink()
+    return
+
+
+def _wait_ready(shm,timeout,poll_interval):
+    #consumers that know the name in advance may attach while the creator still decodes
+    started = time.time()
+    while True:
+        state = _HEADER.unpack_from(shm.buf,0)[2]
+        if state == STATE_READY:
+            return
+        elif state == STATE_FAILED:
+            raise FileNotFoundError("Shared columns {0} failed to decode".format(shm.name))
+        elif timeout is not None and time.time()-started >= timeout:
+            raise TimeoutError("Shared columns {0} are not ready after {1} seconds".format(shm.name,timeout))
+        time.sleep(poll_interval)
+
+
+def remove_shared_columns(name):
+    """
+    removes a segment regardless of its reference count
+    @param name: the name of the segment
+    @note: a consumer that crashes without close() keeps its reference, so the segment outlives all processes,
+           call this once the consumers are known to be gone, attached objects keep their mapping
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    _untrack(shm)
+    struct.pack_into("<q",shm.buf,0,0)
+    shm.close()
+    _unlink(shm)
+    if fcntl is not None:
+        try:
+            os.remove(os.path.join(tempfile.gettempdir(),"{0}.lock".format(name)))
+        except OSError:
+            pass
+    return
+
+
+class shared_columns():
+
+    def __init__(self,name,timeout=None,poll_interval=0.05,_shm=None):
+        """
+        channels of an mdf file decoded into a named shared memory segment, see share_columns()
+        @param name: the name of the segment
+        @param timeout: seconds to wait for the creator to finish decoding, None to wait without limit
+        @param poll_interval: seconds to wait before checking the state of the segment again
+        @return: the store object, attached to the segment
+        @note: every object holds one reference, close() releases it and the last one removes the segment,
+               the columns are read only numpy arrays on the segment without a copy,
+               there is no liveness check, a process that exits without close() leaks its reference
+               and the segment stays until remove_shared_columns(name) or a reboot
+        """
+        self.name = name
+        if _shm is None:
+            _shm = shared_memory.SharedMemory(name=name)
+            _untrack(_shm)
+            try:
+                _wait_ready(shm=_shm,timeout=timeout,poll_interval=poll_interval)
+            except Exception:
+                _shm.close()
+                raise
+            if self._update_references(shm=_shm,delta=1) <= 0:
+                #the last reference was closed while attaching
+                _shm.close()
+                raise FileNotFoundError("Shared columns {0} are released".format(name))
+        self.shm = _shm
+        manifest_size = _HEADER.unpack_from(self.shm.buf,0)[1]
+        self.manifest = json.loads(bytes(self.shm.buf[_HEADER.size:_HEADER.size+manifest_size]).decode())
+        self.data_offset = _align(_HEADER.size+manifest_size)
+        self.closed = False
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _lock(name):
+        #the reference count is updated under a file lock where the platform has one
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(tempfile.gettempdir(),"{0}.lock".format(name)),'a') as f:
+            fcntl.flock(f,fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f,fcntl.LOCK_UN)
+
+    def _update_references(self,shm,delta):
+        """
+        @return: the reference count after the update, 0 without update if the segment is already released
+        """
+        with self._lock(shm.name):
+            count = _HEADER.unpack_from(shm.buf,0)[0]
+            if count <= 0:
+                return 0
+            count += delta
+            struct.pack_into("<q",shm.buf,0,count)
+        return count
+
+    def _view(self,entry):
+        arr = np.ndarray(shape=(entry["length"],),dtype=np.dtype(entry["dtype"]),buffer=self.shm.buf,
+                         offset=self.data_offset+entry["offset"])
+        arr.flags.writeable = False
+        return arr
+
+    def get_channel_short_names(self):
+        return [entry["short_name"] for entry in self.manifest["columns"]]
+
+    def get_channel_info(self,short_name):
+        """
+        @return: a dictionary with short_name, dtype, length, unit and description of the channel
+        """
+        for entry in self.manifest["columns"]:
+            if entry["short_name"] == short_name:
+                return {key:entry[key] for key in ["short_name","dtype","length","unit","description"]}
+        raise KeyError("Channel {0} not found".format(short_name))
+
+    def get_column(self,short_name):
+        """
+        @param short_name: the channel short name
+        @return: a tuple (timestamps, values) of read only arrays on the segment
+        """
+        for entry in self.manifest["columns"]:
+            if entry["short_name"] == short_name:
+                return (self._view(self.manifest["time_columns"][entry["time_column"]]),self._view(entry))
+        raise KeyError("Channel {0} not found".format(short_name))
+
+    def get_columns(self,short_names=None):
+        """
+        @param short_names: a list of channel short names, None for all channels
+        @return: a dictionary of short name: (timestamps, values), see mdf.get_columns
+        """
+        if short_names is None:
+            short_names = self.get_channel_short_names()
+        elif isinstance(short_names,str):
+            short_names = [short_names,]
+        return {short_name:self.get_column(short_name) for short_name in short_names}
+
+    def close(self):
+        """
+        releases the reference of this object, the last reference removes the segment
+        @note: arrays returned by get_column keep the memory mapped in this process until they are gone
+        """
+        if self.closed:
+            return
+        self.closed = True
+        remaining = self._update_references(shm=self.shm,delta=-1)
+        try:
+            self.shm.close()
+        except BufferError:
+            #arrays of this process still point into the segment
+            pass
+        if remaining <= 0:
+            try:
+                _unlink(self.shm)
+            except FileNotFoundError:
+                pass
+            if fcntl is not None:
+                try:
+                    os.remove(os.path.join(tempfile.gettempdir(),"{0}.lock".format(self.name)))
+                except OSError:
+                    pass
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
+        return False
+
+
+def share_columns(mdf_obj,short_names=None,name=None,start=None,stop=None,raw=False,chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    decodes channels once into a named shared memory segment that other processes attach to with shared_columns(name)
+    @param mdf_obj: the mdf object
+    @param short_names: a list of channel short names, None for all channels
+    @param name: the name of the segment, None for a generated name
+    @param start: start of the time range in seconds, None for the start of the measurement
+    @param stop: end of the time range in seconds (included), None for the end of the measurement
+    @param raw: True for the stored values, see cn_block.convert
+    @param chunk_size: the number of records decoded at once
+    @return: the shared_columns object of the calling process, its name is in .name
+    @note: the chunks are decoded straight into the segment, a json manifest at its start holds the dtype,
+           offset, length, unit and description of each column, channels with text values cannot be shared,
+           keep the returned object open until the consumers have attached,
+           consumers may attach with an explicit name before this returns, they wait until the columns are written
+    """
+    if short_names is None:
+        short_names = mdf_obj.get_channel_short_names()
+    elif isinstance(short_names,str):
+        short_names = [short_names,]
+    groups = []
+    for dg,names in mdf_obj.hdblock.get_data_groups_for_channels(short_names):
+        first,last = dg.find_record_range(fname=mdf_obj.fname,start=start,stop=stop)
+        #the dtypes of the physical values are only known after decoding
+        sample = next(dg.iter_columns(fname=mdf_obj.fname,short_names=names,chunk_size=1,start=first,stop=first+1,raw=raw),None)
+        dtypes = [np.dtype(np.float64) for short_name in names]
+        if sample is not None:
+            dtypes = [val.dtype for val in sample[1]]
+        for short_name,dtype in zip(names,dtypes):
+            if dtype.hasobject:
+                raise ValueError("Channel {0} has text values and cannot be shared".format(short_name))
+        groups.append((dg,names,first,last,dtypes))
+
+    time_columns = []
+    columns = []
+    offset = 0
+    for group_idx,(dg,names,first,last,dtypes) in enumerate(groups):
+        time_columns.append({"offset":offset,"dtype":np.dtype(np.float64).str,"length":last-first})
+        offset = _align(offset+(8*(last-first)))
+        for short_name,dtype in zip(names,dtypes):
+            ch = dg.get_channel_by_short_name(short_name=short_name)
+            columns.append({"short_name":short_name,
+                            "offset":offset,
+                            "dtype":dtype.str,
+                            "length":last-first,
+                            "unit":_get_unit(ch),
+                            "description":ch.signal_description,
+                            "time_column":group_idx,
+                            })
+            offset = _align(offset+(dtype.itemsize*(last-first)))
+    manifest = {"fname":os.path.abspath(mdf_obj.fname),
+                "timestamp":mdf_obj.hdblock.timestamp.isoformat(),
+                "raw":raw,
+                "time_columns":time_columns,
+                "columns":columns,
+                }
+    #the offsets count from the first aligned byte after the manifest
+    text = json.dumps(manifest).encode()
+    data_offset = _align(_HEADER.size+len(text))
+
+    shm = shared_memory.SharedMemory(name=name,create=True,size=max(data_offset+offset,1))
+    _untrack(shm)
+    try:
+        _HEADER.pack_into(shm.buf,0,1,len(text),STATE_DECODING)
+        shm.buf[_HEADER.size:_HEADER.size+len(text)] = text
+        entries = iter(columns)
+        for (dg,names,first,last,dtypes),time_entry in zip(groups,time_columns):
+            targets = [next(entries) for short_name in names]
+            t_out = np.ndarray(shape=(last-first,),dtype=np.float64,buffer=shm.buf,offset=data_offset+time_entry["offset"])
+            outs = [np.ndarray(shape=(last-first,),dtype=dtype,buffer=shm.buf,offset=data_offset+entry["offset"])
+                    for entry,dtype in zip(targets,dtypes)]
+            pos = 0
+            for t,vals in dg.iter_columns(fname=mdf_obj.fname,short_names=names,chunk_size=chunk_size,start=first,stop=last,raw=raw):
+                t_out[pos:pos+len(t)] = t
+                for out,val in zip(outs,vals):
+                    out[pos:pos+len(t)] = val
+                pos += len(t)
+            del t_out,outs
+    except Exception:
+        struct.pack_into("<q",shm.buf,16,STATE_FAILED)
+        try:
+            shm.close()
+        except BufferError:
+            #the arrays of the failed chunk still point into the segment
+            pass
+        _unlink(shm)
+        raise
+    struct.pack_into("<q",shm.buf,16,STATE_READY)
+    return shared_columns(name=shm.name,_shm=shm)
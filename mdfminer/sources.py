@@ -0,0 +1,739 @@
+# sources.py
+# (C) 2017 Patrick Menschel
+
+
+import os
+import io
+import zlib
+import lzma
+import bz2
+import mmap
+import struct
+import bisect
+import threading
+import collections
+import weakref
+
+
+INPUT_BLOCK_SIZE = 256*1024#compressed bytes fed to a decompressor at once
+CHECKPOINT_INTERVAL = 4*1024*1024#uncompressed bytes between two checkpoints of the seek index
+SEEK_INDEX_CACHE_SIZE = 32#files whose seek index is kept, the least recently opened are dropped
+BLOCK_CACHE_BYTES = 64*1024*1024#decompressed blocks kept per indexed file
+
+
+class _checkpoint():
+
+    def __init__(self,upos,cpos,snapshot=None):
+        """
+        a position in a compressed file where decompression can be resumed
+        @param upos: the offset in the uncompressed data
+        @param cpos: the offset in the compressed file
+        @param snapshot: a copy of the decompressor at this position or None for the start of a stream
+        @return: the checkpoint object
+        """
+        self.upos = upos
+        self.cpos = cpos
+        self.snapshot = snapshot
+
+
+class _seek_index():
+
+    def __init__(self,identity):
+        """
+        list of checkpoints of a compressed file, shared by all readers of the file
+        @param identity: a tuple of file size and modification time
+        @return: the index object
+        """
+        self.identity = identity
+        self.checkpoints = [_checkpoint(upos=0,cpos=0),]
+        self.size = None
+        self.lock = threading.Lock()
+
+    def find(self,upos):
+        #the last checkpoint at or before upos
+        ret = self.checkpoints[0]
+        for cp in self.checkpoints:
+            if cp.upos > upos:
+                break
+            ret = cp
+        return ret
+
+    def add(self,cp):
+        with self.lock:
+            if cp.upos > self.checkpoints[-1].upos:
+                self.checkpoints.append(cp)
+        return
+
+
+_seek_indexes = collections.OrderedDict()#path: index, least recently used first
+_seek_indexes_lock = threading.Lock()
+
+
+def _get_seek_index(fname,build=None):
+    """
+    @param fname: path to file
+    @param build: a function that takes the path and the identity of the file and returns a new index,
+                  None for a _seek_index
+    @return: the cached seek index of the file, a new one if the file has changed
+    @note: at most SEEK_INDEX_CACHE_SIZE indexes are kept
+    """
+    st = os.stat(fname)
+    path = os.path.realpath(fname)
+    identity = (st.st_size,st.st_mtime_ns)
+    with _seek_indexes_lock:
+        index = _seek_indexes.get(path)
+        if index is not None and index.identity == identity:
+            _seek_indexes.move_to_end(path)
+            return index
+    if build is None:
+        index = _seek_index(identity=identity)
+    else:
+        index = build(path,identity)
+    with _seek_indexes_lock:
+        _seek_indexes[path] = index
+        _seek_indexes.move_to_end(path)
+        while len(_seek_indexes) > SEEK_INDEX_CACHE_SIZE:
+            _seek_indexes.popitem(last=False)
+    return index
+
+
+class compressed_file(io.RawIOBase):
+
+    def __init__(self,fname,new_decompressor,copyable=False,index=None):
+        """
+        read only, seekable file object for compressed files
+        @param fname: path to file
+        @param new_decompressor: a function that returns a new decompressor object for one stream,
+                                 it needs decompress(data), eof and unused_data
+        @param copyable: True if the decompressor supports copy(), i.e. zlib
+        @param index: the _seek_index of the file, None for the cached one
+        @return: the file object
+        @note: sequential reads stream through the decompressor, seeking backwards resumes at the
+               nearest checkpoint of a process wide index instead of the start of the file,
+               checkpoints are taken every CHECKPOINT_INTERVAL bytes for copyable decompressors
+               and at the start of each stream, e.g. gzip member, xz stream or zstd frame, otherwise,
+               files with independent blocks are read through block_file instead
+        """
+        super(compressed_file,self).__init__()
+        self.name = fname
+        self.f = open(fname,'rb')
+        self.new_decompressor = new_decompressor
+        self.copyable = copyable
+        if index is None:
+            index = _get_seek_index(fname)
+        self.index = index
+        self.pos = 0
+        self._restore(self.index.checkpoints[0])
+
+    def _restore(self,cp):
+        self.f.seek(cp.cpos)
+        if cp.snapshot is not None:
+            self.decompressor = cp.snapshot.copy()
+        else:
+            self.decompressor = self.new_decompressor()
+        self.pending = b""
+        self.buf = b""
+        self.buf_start = cp.upos
+        self.dec_pos = cp.upos
+        return
+
+    def _decode_more(self):
+        """
+        decompresses the next block of input
+        @return: False at the end of the file
+        """
+        data = self.pending or self.f.read(INPUT_BLOCK_SIZE)
+        self.pending = b""
+        if not data:
+            self.index.size = self.dec_pos
+            return False
+        out = self.decompressor.decompress(data)
+        self.buf = out
+        self.buf_start = self.dec_pos
+        self.dec_pos += len(out)
+        if self.decompressor.eof:
+            unused = self.decompressor.unused_data
+            if unused.strip(b"\x00"):
+                #next stream, e.g. concatenated gzip members or zstd frames
+                self.index.add(_checkpoint(upos=self.dec_pos,cpos=self.f.tell()-len(unused)))
+                self.decompressor = self.new_decompressor()
+                self.pending = unused
+            else:
+                self.f.seek(0,2)
+        elif self.copyable and self.dec_pos-self.index.checkpoints[-1].upos >= CHECKPOINT_INTERVAL:
+            self.index.add(_checkpoint(upos=self.dec_pos,cpos=self.f.tell(),snapshot=self.decompressor.copy()))
+        return True
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self,offset,whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.pos = offset
+        elif whence == io.SEEK_CUR:
+            self.pos += offset
+        elif whence == io.SEEK_END:
+            if self.index.size is None:
+                while self._decode_more():
+                    pass
+            self.pos = self.index.size+offset
+        else:
+            raise ValueError("invalid whence {0}".format(whence))
+        return self.pos
+
+    def read(self,size=-1):
+        pos = self.pos
+        cp = self.index.find(pos)
+        if pos < self.buf_start or cp.upos > self.dec_pos:
+            #behind the decoder or a checkpoint saves decoding
+            self._restore(cp)
+        out = bytearray()
+        while size is None or size < 0 or len(out) < size:
+            buf_end = self.buf_start+len(self.buf)
+            if pos >= buf_end:
+                if not self._decode_more():
+                    break
+                continue
+            strt = pos-self.buf_start
+            if size is None or size < 0:
+                stp = len(self.buf)
+            else:
+                stp = min(len(self.buf),strt+size-len(out))
+            out.extend(self.buf[strt:stp])
+            pos += stp-strt
+        self.pos = pos
+        return bytes(out)
+
+    def readinto(self,b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self.f.close()
+        super(compressed_file,self).close()
+        return
+
+
+class _block_index():
+
+    def __init__(self,identity,blocks,decode,merge_on_error=False):
+        """
+        list of the independently decompressible blocks of a compressed file, shared by all readers of the file
+        @param identity: a tuple of file size and modification time
+        @param blocks: a list of tuples (offset, size, uncompressed size or None) of the blocks in the file
+        @param decode: a function that takes the file object and a block tuple and returns the decompressed bytes
+        @param merge_on_error: True to merge a block that fails to decompress with the next one,
+                               for block boundaries that are found by a pattern search, i.e. bz2
+        @return: the index object
+        @note: unknown uncompressed sizes are learned by decompressing the blocks in order once,
+               the most recently used blocks are kept up to BLOCK_CACHE_BYTES
+        """
+        self.identity = identity
+        self.blocks = list(blocks)
+        self.decode = decode
+        self.merge_on_error = merge_on_error
+        self.starts = [0,]#offsets of the blocks in the uncompressed data, as far as known
+        for block in self.blocks:
+            if block[2] is None:
+                break
+            self.starts.append(self.starts[-1]+block[2])
+        self.cache = collections.OrderedDict()
+        self.cache_size = 0
+        self.lock = threading.Lock()
+
+    def get_block(self,f,idx):
+        """
+        @param f: the file object of the compressed file
+        @param idx: the index of the block
+        @return: the decompressed bytes of the block
+        """
+        with self.lock:
+            data = self.cache.get(idx)
+            if data is not None:
+                self.cache.move_to_end(idx)
+                return data
+        while True:
+            block = self.blocks[idx]
+            try:
+                data = self.decode(f,block)
+                break
+            except (OSError,EOFError,ValueError,lzma.LZMAError):
+                if not self.merge_on_error or idx+1 >= len(self.blocks):
+                    raise
+                with self.lock:
+                    #a false block boundary, the block continues in the next one
+                    if self.blocks[idx] is block:
+                        self.blocks[idx:idx+2] = [(block[0],self.blocks[idx+1][1]+self.blocks[idx+1][0]-block[0],None),]
+                        self.cache.clear()
+                        self.cache_size = 0
+        with self.lock:
+            if idx not in self.cache:
+                self.cache[idx] = data
+                self.cache_size += len(data)
+            while self.cache_size > BLOCK_CACHE_BYTES and len(self.cache) > 1:
+                self.cache_size -= len(self.cache.popitem(last=False)[1])
+        return data
+
+    def locate(self,f,pos):
+        """
+        @param f: the file object of the compressed file
+        @param pos: the offset in the uncompressed data
+        @return: the index of the block that contains pos, None at or after the end of the data
+        """
+        while pos >= self.starts[-1] and len(self.starts) <= len(self.blocks):
+            idx = len(self.starts)-1
+            data = self.get_block(f,idx)
+            with self.lock:
+                if len(self.starts) == idx+1:
+                    self.starts.append(self.starts[-1]+len(data))
+        if pos >= self.starts[-1]:
+            return None
+        return bisect.bisect_right(self.starts,pos)-1
+
+    def get_size(self,f):
+        while len(self.starts) <= len(self.blocks):
+            self.locate(f,self.starts[-1])
+        return self.starts[-1]
+
+
+class block_file(io.RawIOBase):
+
+    def __init__(self,fname,index):
+        """
+        read only, seekable file object for compressed files made of independent blocks,
+        e.g. multi block xz, bz2 or seekable zstd
+        @param fname: path to file
+        @param index: the _block_index of the file
+        @return: the file object
+        @note: a read decompresses only the blocks it touches, seeking costs nothing
+        """
+        super(block_file,self).__init__()
+        self.name = fname
+        self.f = open(fname,'rb')
+        self.index = index
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self,offset,whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.pos = offset
+        elif whence == io.SEEK_CUR:
+            self.pos += offset
+        elif whence == io.SEEK_END:
+            self.pos = self.index.get_size(self.f)+offset
+        else:
+            raise ValueError("invalid whence {0}".format(whence))
+        return self.pos
+
+    def read(self,size=-1):
+        pos = self.pos
+        out = bytearray()
+        while size is None or size < 0 or len(out) < size:
+            idx = self.index.locate(self.f,pos)
+            if idx is None:
+                break
+            data = self.index.get_block(self.f,idx)
+            strt = pos-self.index.starts[idx]
+            if size is None or size < 0:
+                stp = len(data)
+            else:
+                stp = min(len(data),strt+size-len(out))
+            out.extend(data[strt:stp])
+            pos += stp-strt
+        self.pos = pos
+        return bytes(out)
+
+    def readinto(self,b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self.f.close()
+        super(block_file,self).close()
+        return
+
+
+def _read_varint(data,pos):
+    #xz variable length integer, 7 bits per byte, least significant first
+    ret = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        ret |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return ret,pos
+
+
+def _read_xz_blocks(f):
+    """
+    reads the block lists of all streams from the stream indexes at the end of an xz file
+    @param f: the file object
+    @return: a list of tuples (offset, size, uncompressed size, stream header) of the blocks,
+             offset and size include the block header and the padding
+    """
+    f.seek(0,io.SEEK_END)
+    end = f.tell()
+    ret = []
+    while end > 0:
+        f.seek(end-4)
+        if f.read(4) == bytes(4):
+            #stream padding
+            end -= 4
+            continue
+        f.seek(end-12)
+        footer = f.read(12)
+        if footer[10:12] != b"YZ":
+            raise ValueError("Invalid xz stream footer at {0}".format(end-12))
+        index_size = (struct.unpack("<I",footer[4:8])[0]+1)*4
+        index_start = end-12-index_size
+        f.seek(index_start)
+        index = f.read(index_size)
+        if index[:1] != b"\x00":
+            raise ValueError("Invalid xz index at {0}".format(index_start))
+        count,pos = _read_varint(index,1)
+        records = []
+        for idx in range(count):
+            unpadded_size,pos = _read_varint(index,pos)
+            uncompressed_size,pos = _read_varint(index,pos)
+            records.append((-(-unpadded_size//4)*4,uncompressed_size))
+        stream_start = index_start-sum([size for size,uncompressed_size in records])-12
+        f.seek(stream_start)
+        header = f.read(12)
+        if header[:6] != b"\xfd7zXZ\x00":
+            raise ValueError("Invalid xz stream header at {0}".format(stream_start))
+        blocks = []
+        offset = stream_start+12
+        for size,uncompressed_size in records:
+            blocks.append((offset,size,uncompressed_size,header))
+            offset += size
+        ret = blocks+ret
+        end = stream_start
+    return ret
+
+
+def _decode_xz_block(f,block):
+    #a block behind the header of its stream is a valid start of an xz stream
+    offset,size,uncompressed_size,header = block
+    f.seek(offset)
+    data = lzma.LZMADecompressor(format=lzma.FORMAT_XZ).decompress(header+f.read(size))
+    if len(data) != uncompressed_size:
+        raise ValueError("xz block at {0} is truncated".format(offset))
+    return data
+
+
+def _build_xz_index(fname,identity):
+    """
+    @return: a _block_index of the blocks of an xz file, a _seek_index if the file has a single block
+    """
+    try:
+        with open(fname,'rb') as f:
+            blocks = _read_xz_blocks(f)
+    except (ValueError,IndexError,struct.error):
+        blocks = []
+    if len(blocks) < 2:
+        return _seek_index(identity=identity)
+    return _block_index(identity=identity,blocks=blocks,decode=_decode_xz_block)
+
+
+_BZ2_BLOCK_MAGIC = 0x314159265359#pi, starts a block
+_BZ2_END_MAGIC = 0x177245385090#sqrt(pi), ends a stream
+
+
+def _find_bit_pattern(data,pattern,bits=48):
+    """
+    @param data: the bytes to search, e.g. a memory map
+    @param pattern: the pattern as an integer
+    @param bits: the length of the pattern in bits
+    @return: a sorted list of the bit offsets of the pattern at any bit alignment
+    """
+    ret = []
+    for shift in range(8):
+        size = (shift+bits+7)//8
+        full = (pattern << ((size*8)-shift-bits)).to_bytes(size,"big")
+        if shift:
+            #the first and the last byte are shared with the bits around the pattern
+            inner = full[1:-1]
+            first = -1
+        else:
+            inner = full
+            first = 0
+        pos = data.find(inner)
+        while pos >= 0:
+            strt = pos+first
+            if strt >= 0 and strt+size <= len(data):
+                val = int.from_bytes(data[strt:strt+size],"big")
+                if (val >> ((size*8)-shift-bits)) & ((1 << bits)-1) == pattern:
+                    ret.append((strt*8)+shift)
+            pos = data.find(inner,pos+1)
+    return sorted(ret)
+
+
+def _decode_bz2_block(f,block):
+    #one block between the magic numbers becomes a stream of its own, its crc is the stream crc
+    start,size,uncompressed_size = block
+    first = start//8
+    f.seek(first)
+    raw = f.read(((start+size+7)//8)-first)
+    bits = (int.from_bytes(raw,"big") >> ((len(raw)*8)-(start-(first*8))-size)) & ((1 << size)-1)
+    crc = (bits >> (size-80)) & 0xFFFFFFFF
+    stream = (((bits << 48) | _BZ2_END_MAGIC) << 32) | crc
+    stream_bits = size+80
+    padding = -stream_bits%8
+    return bz2.decompress(b"BZh9"+(stream << padding).to_bytes((stream_bits+padding)//8,"big"))
+
+
+def _build_bz2_index(fname,identity):
+    """
+    @return: a _block_index of the blocks of a bz2 file, a _seek_index if the file has a single block
+    @note: the block boundaries are bit aligned, they are found by searching the magic numbers,
+           a false match is merged with the next block when it fails to decompress
+    """
+    blocks = []
+    if identity[0]:
+        with open(fname,'rb') as f, mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ) as mm:
+            starts = _find_bit_pattern(mm,_BZ2_BLOCK_MAGIC)
+            ends = sorted(starts+_find_bit_pattern(mm,_BZ2_END_MAGIC))
+        for start in starts:
+            stop = ends[bisect.bisect_right(ends,start)] if bisect.bisect_right(ends,start) < len(ends) else identity[0]*8
+            blocks.append((start,stop-start,None))
+    if len(blocks) < 2:
+        return _seek_index(identity=identity)
+    return _block_index(identity=identity,blocks=blocks,decode=_decode_bz2_block,merge_on_error=True)
+
+
+_ZSTD_SKIPPABLE_MAGIC = 0x184D2A5E
+_ZSTD_SEEKABLE_MAGIC = 0x8F92EAB1
+
+
+def _read_zstd_seek_table(f):
+    """
+    reads the seek table of the zstd seekable format, a skippable frame at the end of the file
+    @param f: the file object
+    @return: a list of tuples (offset, size, uncompressed size) of the frames, None without a seek table
+    """
+    f.seek(0,io.SEEK_END)
+    end = f.tell()
+    if end < 17:
+        return None
+    f.seek(end-9)
+    number_of_frames,descriptor,magic = struct.unpack("<IBI",f.read(9))
+    if magic != _ZSTD_SEEKABLE_MAGIC:
+        return None
+    entry_size = 12 if descriptor & 0x80 else 8
+    table_start = end-9-(number_of_frames*entry_size)
+    f.seek(table_start-8)
+    skippable_magic,frame_size = struct.unpack("<II",f.read(8))
+    if skippable_magic != _ZSTD_SKIPPABLE_MAGIC or frame_size != end-table_start:
+        return None
+    table = f.read(number_of_frames*entry_size)
+    ret = []
+    offset = 0
+    for idx in range(number_of_frames):
+        size,uncompressed_size = struct.unpack_from("<II",table,idx*entry_size)
+        ret.append((offset,size,uncompressed_size))
+        offset += size
+    return ret
+
+
+def _decode_zstd_frame(f,block):
+    import zstandard
+    offset,size,uncompressed_size = block
+    f.seek(offset)
+    return zstandard.ZstdDecompressor().decompressobj().decompress(f.read(size))
+
+
+def _build_zstd_index(fname,identity):
+    """
+    @return: a _block_index of the frames of a seekable zstd file, a _seek_index without a seek table
+    """
+    with open(fname,'rb') as f:
+        blocks = _read_zstd_seek_table(f)
+    if not blocks or len(blocks) < 2:
+        return _seek_index(identity=identity)
+    return _block_index(identity=identity,blocks=blocks,decode=_decode_zstd_frame)
+
+
+class _shared_descriptor():
+
+    def __init__(self,fname):
+        """
+        one read only file descriptor of a plain file, shared by all positional readers of the file
+        @param fname: path to file
+        @return: the descriptor object
+        @note: the descriptor is closed when the last reader and the last mdf object of the file are gone
+        """
+        self.fd = os.open(fname,os.O_RDONLY)
+        st = os.fstat(self.fd)
+        self.identity = (st.st_dev,st.st_ino)
+
+    def pread(self,size,offset):
+        return os.pread(self.fd,size,offset)
+
+    def get_size(self):
+        return os.fstat(self.fd).st_size
+
+    def __del__(self):
+        os.close(self.fd)
+
+
+_shared_descriptors = weakref.WeakValueDictionary()
+_shared_descriptors_lock = threading.Lock()
+
+
+def get_shared_descriptor(fname):
+    """
+    @param fname: path to file
+    @return: the shared descriptor of the file, a new one if the file was replaced,
+             None if the platform has no positional reads
+    @note: keep a reference to reuse the descriptor between readers, mdf objects do
+    """
+    if not hasattr(os,"pread"):
+        return None
+    path = os.path.realpath(fname)
+    st = os.stat(path)
+    with _shared_descriptors_lock:
+        descriptor = _shared_descriptors.get(path)
+        if descriptor is None or descriptor.identity != (st.st_dev,st.st_ino):
+            descriptor = _shared_descriptor(path)
+            _shared_descriptors[path] = descriptor
+    return descriptor
+
+
+class positional_file(io.RawIOBase):
+
+    def __init__(self,fname,descriptor):
+        """
+        read only, seekable file object with its own position on a shared descriptor
+        @param fname: path to file
+        @param descriptor: the shared descriptor of the file
+        @return: the file object
+        @note: reads are positional, i.e. os.pread, so any number of threads can read the same file
+               through their own file objects without a lock and without reopening it,
+               closing the file object does not close the descriptor
+        """
+        super(positional_file,self).__init__()
+        self.name = fname
+        self.descriptor = descriptor
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self,offset,whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.pos = offset
+        elif whence == io.SEEK_CUR:
+            self.pos += offset
+        elif whence == io.SEEK_END:
+            self.pos = self.descriptor.get_size()+offset
+        else:
+            raise ValueError("Invalid whence {0}".format(whence))
+        return self.pos
+
+    def read(self,size=-1):
+        if size is None or size < 0:
+            size = max(self.descriptor.get_size()-self.pos,0)
+        data = self.descriptor.pread(size,self.pos)
+        self.pos += len(data)
+        return data
+
+    def readinto(self,b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+def _open_gzip(fname):
+    return compressed_file(fname=fname,new_decompressor=lambda: zlib.decompressobj(wbits=31),copyable=True)
+
+
+def _open_indexed(fname,build,new_decompressor):
+    index = _get_seek_index(fname,build=build)
+    if isinstance(index,_block_index):
+        return block_file(fname=fname,index=index)
+    return compressed_file(fname=fname,new_decompressor=new_decompressor,index=index)
+
+
+def _open_xz(fname):
+    return _open_indexed(fname=fname,build=_build_xz_index,new_decompressor=lzma.LZMADecompressor)
+
+
+def _open_bz2(fname):
+    return _open_indexed(fname=fname,build=_build_bz2_index,new_decompressor=bz2.BZ2Decompressor)
+
+
+def _open_zstd(fname):
+    import zstandard
+    return _open_indexed(fname=fname,build=_build_zstd_index,
+                         new_decompressor=lambda: zstandard.ZstdDecompressor().decompressobj())
+
+
+_magic_numbers = [(b"\x1f\x8b",_open_gzip),
+                  (b"\xfd7zXZ\x00",_open_xz),
+                  (b"BZh",_open_bz2),
+                  (b"\x28\xb5\x2f\xfd",_open_zstd),
+                  ]
+
+_sources = {}
+
+
+def register_source(suffix,opener):
+    """
+    registers a file source for a file name suffix
+    @param suffix: the file name suffix, e.g. ".mdf.lz4"
+    @param opener: a function that takes the path and returns a seekable binary file object
+    """
+    _sources.update({suffix.lower():opener})
+    return
+
+
+def open_source(fname):
+    """
+    opens an mdf file for reading
+    @param fname: path to file, plain or compressed
+    @return: a seekable binary file object
+    @note: registered suffixes take precedence, otherwise gzip, xz, bz2 and zstd are detected by their
+           magic numbers, zstd needs the zstandard package,
+           gzip seeks through checkpoints, multi block xz, bz2 and seekable zstd files through an index
+           of their blocks, single block xz and plain zstd files resume at the start of the stream,
+           plain files are read positionally on a shared descriptor where the platform has os.pread
+    """
+    for suffix,opener in _sources.items():
+        if fname.lower().endswith(suffix):
+            return opener(fname)
+    descriptor = get_shared_descriptor(fname)
+    if descriptor is not None:
+        magic = descriptor.pread(6,0)
+    else:
+        with open(fname,'rb') as f:
+            magic = f.read(6)
+    for magic_number,opener in _magic_numbers:
+        if magic.startswith(magic_number):
+            return opener(fname)
+    if descriptor is not None:
+        return positional_file(fname=fname,descriptor=descriptor)
+    return open(fname,'rb')
@@ -0,0 +1,321 @@
+# conftest.py
+# builds small mdf files for the tests
+
+import datetime
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from mdfminer.mdf import (_build_id_block,_build_hd_block,_build_dg_block,_build_cg_block,_build_cn_block,_build_cc_block,_build_ce_block,
+                         _build_cd_block,_build_tr_block)
+
+
+TIMESTAMP = datetime.datetime(2020,1,2,3,4,5)
+SPEED_CONVERSION = (0.0,0.1)#offset, factor
+TEMP_CONVERSION = (1.0,0.5)
+RECORD_SIZE = 14#time f8, Speed u16, Temp f4
+
+
+def build_mdf(n=1000,bord='little',declared=None,temp=None,speed_table=None,trigger_events=None,timestamp=TIMESTAMP):
+    """
+    builds a version 3.3 mdf file with one channel group of time, Speed and Temp
+    @param n: the number of records written
+    @param bord: byte order of contents
+    @param declared: the number of records in the cg block, None for n
+    @param temp: the float32 raw values of Temp, sets n, None for a ramp
+    @param speed_table: a dictionary of value: text for a text table conversion of Speed, None for SPEED_CONVERSION
+    @param trigger_events: a list of dictionaries with trigger_time, pre_trigger_time and post_trigger_time for a tr block
+    @param timestamp: the start of the recording in the hd block
+    @return: a tuple (data, expected) of the bytes of the file and a dictionary of the raw columns
+    """
+    fmtprefix = '<' if bord == 'little' else '>'
+    if temp is not None:
+        n = len(temp)
+    if declared is None:
+        declared = n
+    data = bytearray(_build_id_block(bord=bord))
+
+    def reserve(size):
+        offset = len(data)
+        data.extend(bytes(size))
+        return offset
+
+    hd_ptr = reserve(208)
+    dg_ptr = reserve(28)
+    cg_ptr = reserve(30)
+    cn_size = len(_build_cn_block(0,0,0,"data","x",0,8,0,bord=bord))
+    cn_ptrs = [reserve(cn_size) for idx in range(3)]
+    speed_cc = len(data)
+    if speed_table is None:
+        data.extend(_build_cc_block(0,SPEED_CONVERSION,physical_unit="km/h",bord=bord))
+    else:
+        data.extend(_build_cc_block(11,speed_table,bord=bord))
+    temp_cc = len(data)
+    data.extend(_build_cc_block(0,TEMP_CONVERSION,physical_unit="degC",bord=bord))
+    tr_ptr = 0
+    if trigger_events is not None:
+        tr_ptr = len(data)
+        data.extend(_build_tr_block(0,trigger_events,bord=bord))
+    channels = [("time","time",0,64,3,0),
+                ("Speed","data",64,16,0,speed_cc),
+                ("Temp","data",80,32,2,temp_cc),
+                ]
+    for idx,(short_name,channel_type,bit_offset,number_of_bits,signal_data_type,cc_ptr) in enumerate(channels):
+        ncb_ptr = cn_ptrs[idx+1] if idx+1 < len(cn_ptrs) else 0
+        data[cn_ptrs[idx]:cn_ptrs[idx]+cn_size] = _build_cn_block(ncb_ptr,cc_ptr,0,channel_type,short_name,
+                                                                  bit_offset,number_of_bits,signal_data_type,bord=bord)
+
+    expected = {"time":np.arange(n)*0.01,
+                "Speed":(np.arange(n)%1000).astype(np.uint16),
+                "Temp":np.asarray(np.linspace(-40.0,120.0,n) if temp is None else temp,dtype=np.float32),
+                }
+    records = np.zeros(n,dtype=np.dtype([("time",fmtprefix+"f8"),("Speed",fmtprefix+"u2"),("Temp",fmtprefix+"f4")]))
+    for key,val in expected.items():
+        records[key] = val
+    db_ptr = len(data)
+    data.extend(records.tobytes())
+
+    data[hd_ptr:hd_ptr+208] = _build_hd_block(dg_ptr,0,0,1,timestamp,author="author",organisation="organisation",
+                                              project="project",subject="subject",bord=bord)
+    data[dg_ptr:dg_ptr+28] = _build_dg_block(0,cg_ptr,tr_ptr,db_ptr,bord=bord)
+    data[cg_ptr:cg_ptr+30] = _build_cg_block(0,cn_ptrs[0],0,0,len(channels),RECORD_SIZE,declared,bord=bord)
+    return bytes(data),expected
+
+
+def build_record_mdf(channels,records,bord='little'):
+    """
+    builds a version 3.3 mdf file with one channel group of the given layout and records
+    @param channels: a list of (short name, channel type, bit offset, number of bits, signal data type) without conversion
+    @param records: a 2d uint8 numpy array with one record per row
+    @param bord: byte order of contents
+    @return: the bytes of the file
+    """
+    data = bytearray(_build_id_block(bord=bord))
+
+    def reserve(size):
+        offset = len(data)
+        data.extend(bytes(size))
+        return offset
+
+    hd_ptr = reserve(208)
+    dg_ptr = reserve(28)
+    cg_ptr = reserve(30)
+    cn_size = len(_build_cn_block(0,0,0,"data","x",0,8,0,bord=bord))
+    cn_ptrs = [reserve(cn_size) for idx in range(len(channels))]
+    for idx,(short_name,channel_type,bit_offset,number_of_bits,signal_data_type) in enumerate(channels):
+        ncb_ptr = cn_ptrs[idx+1] if idx+1 < len(cn_ptrs) else 0
+        data[cn_ptrs[idx]:cn_ptrs[idx]+cn_size] = _build_cn_block(ncb_ptr,0,0,channel_type,short_name,bit_offset,number_of_bits,
+                                                                  signal_data_type,bord=bord)
+    db_ptr = len(data)
+    data.extend(np.ascontiguousarray(records,dtype=np.uint8).tobytes())
+    data[hd_ptr:hd_ptr+208] = _build_hd_block(dg_ptr,0,0,1,TIMESTAMP,bord=bord)
+    data[dg_ptr:dg_ptr+28] = _build_dg_block(0,cg_ptr,0,db_ptr,bord=bord)
+    data[cg_ptr:cg_ptr+30] = _build_cg_block(0,cn_ptrs[0],0,0,len(channels),records.shape[1],records.shape[0],bord=bord)
+    return bytes(data)
+
+
+#(can channel, message id, message name, sender), time step, list of (short name, numpy type)
+CAN_MESSAGES = [((1,0x100,"EngineData","EMS"),0.01,[("Speed_FL","u2"),("Speed","u2"),("Counter","u1")]),
+                ((1,0x200,"BrakeData","ESP"),0.02,[("Counter","u1"),("Brake","u2")]),
+                ]
+
+
+def build_can_mdf(n=100,bord='little'):
+    """
+    builds a version 3.3 mdf file with one data group per message of CAN_MESSAGES,
+    the data channels carry Vector CAN extentions
+    @param n: the number of records written per message
+    @param bord: byte order of contents
+    @return: a tuple (data, expected) of the bytes of the file and a dictionary of message: dictionary of the raw columns
+    """
+    fmtprefix = '<' if bord == 'little' else '>'
+    data = bytearray(_build_id_block(bord=bord))
+
+    def reserve(size):
+        offset = len(data)
+        data.extend(bytes(size))
+        return offset
+
+    hd_ptr = reserve(208)
+    dg_ptrs = [reserve(28) for msg in CAN_MESSAGES]
+    cn_size = len(_build_cn_block(0,0,0,"data","x",0,8,0,bord=bord))
+    expected = {}
+    for msg_idx,(key,step,signals) in enumerate(CAN_MESSAGES):
+        cg_ptr = reserve(30)
+        cn_ptrs = [reserve(cn_size) for idx in range(len(signals)+1)]
+        ce_ptr = len(data)
+        data.extend(_build_ce_block(key[1],key[0],key[2],key[3],bord=bord))
+        dtype = np.dtype([("time",fmtprefix+"f8"),]+[(short_name,fmtprefix+typ) for short_name,typ in signals])
+        cols = {"time":np.arange(n)*step+msg_idx*0.005}
+        for sig_idx,(short_name,typ) in enumerate(signals):
+            cols[short_name] = ((np.arange(n)*(sig_idx+1)+msg_idx*7)%200).astype(typ)
+        channels = [("time","time",0,64,3,0),]
+        for short_name,typ in signals:
+            channels.append((short_name,"data",dtype.fields[short_name][1]*8,dtype[short_name].itemsize*8,0,ce_ptr))
+        for idx,(short_name,channel_type,bit_offset,number_of_bits,signal_data_type,sde_ptr) in enumerate(channels):
+            ncb_ptr = cn_ptrs[idx+1] if idx+1 < len(cn_ptrs) else 0
+            data[cn_ptrs[idx]:cn_ptrs[idx]+cn_size] = _build_cn_block(ncb_ptr,0,0,channel_type,short_name,bit_offset,number_of_bits,
+                                                                      signal_data_type,sde_ptr=sde_ptr,bord=bord)
+        records = np.zeros(n,dtype=dtype)
+        for short_name,val in cols.items():
+            records[short_name] = val
+        db_ptr = len(data)
+        data.extend(records.tobytes())
+        ndg_ptr = dg_ptrs[msg_idx+1] if msg_idx+1 < len(dg_ptrs) else 0
+        data[dg_ptrs[msg_idx]:dg_ptrs[msg_idx]+28] = _build_dg_block(ndg_ptr,cg_ptr,0,db_ptr,bord=bord)
+        data[cg_ptr:cg_ptr+30] = _build_cg_block(0,cn_ptrs[0],0,0,len(channels),dtype.itemsize,n,bord=bord)
+        expected[key] = cols
+    data[hd_ptr:hd_ptr+208] = _build_hd_block(dg_ptrs[0],0,0,len(dg_ptrs),TIMESTAMP,bord=bord)
+    return bytes(data),expected
+
+
+def build_cd_mdf(n=100,shape=(2,3),dependency_type=2,indexed=True,element_type="u2",conversion=None,bord='little'):
+    """
+    builds a version 3.3 mdf file with a channel MAP whose cd block depends on the elements MAP[i][j] of one channel group
+    @param n: the number of records written
+    @param shape: the shape of the map, the elements are stored in C order behind the time channel
+    @param dependency_type: the dependency type of the cd block
+    @param indexed: False for element names without indexes, e.g. MAP_4
+    @param element_type: the numpy type of the elements, "u2", "i4", "f2", "f4" or "f8", "f1" for 8 bit floats
+    @param conversion: (offset, factor) of a linear conversion of the elements, None for none
+    @param bord: byte order of contents
+    @return: a tuple (data, expected) of the bytes of the file and a dictionary with time and MAP of shape (n,)+shape
+    """
+    fmtprefix = '<' if bord == 'little' else '>'
+    num = int(np.prod(shape))
+    size = int(element_type[1])
+    data = bytearray(_build_id_block(bord=bord))
+
+    def reserve(size):
+        offset = len(data)
+        data.extend(bytes(size))
+        return offset
+
+    hd_ptr = reserve(208)
+    dg_ptr = reserve(28)
+    cg_ptr = reserve(30)
+    cn_size = len(_build_cn_block(0,0,0,"data","x",0,8,0,bord=bord))
+    cn_ptrs = [reserve(cn_size) for idx in range(num+2)]
+    cc_ptr = 0
+    if conversion is not None:
+        cc_ptr = len(data)
+        data.extend(_build_cc_block(0,conversion,bord=bord))
+    cd_ptr = len(data)
+    data.extend(_build_cd_block(dependency_type,[(dg_ptr,cg_ptr,ptr) for ptr in cn_ptrs[2:]],
+                                sizes_of_dimensions=shape if dependency_type >= 256 else (),bord=bord))
+    signal_data_type = {"u":0,"i":1,"f":2}[element_type[0]]
+    names = ["MAP{0}".format("".join(["[{0}]".format(i) for i in idx])) if indexed else "MAP_{0}".format(flat)
+             for flat,idx in enumerate(np.ndindex(*shape))]
+    channels = [("time",0,64,3,0,0),("MAP",64,8*size,signal_data_type,cc_ptr,cd_ptr)]
+    channels += [(name,64+(8*size*idx),8*size,signal_data_type,cc_ptr,0) for idx,name in enumerate(names)]
+    for idx,(short_name,bit_offset,number_of_bits,sdt,cf_ptr,db_ptr) in enumerate(channels):
+        ncb_ptr = cn_ptrs[idx+1] if idx+1 < len(cn_ptrs) else 0
+        channel_type = "time" if short_name == "time" else "data"
+        data[cn_ptrs[idx]:cn_ptrs[idx]+cn_size] = _build_cn_block(ncb_ptr,cf_ptr,0,channel_type,short_name,bit_offset,number_of_bits,sdt,
+                                                                  db_ptr=db_ptr,bord=bord)
+    rec_size = 8+(num*size)
+    records = np.zeros((n,rec_size),dtype=np.uint8)
+    records[:,:8] = (np.arange(n)*0.01).astype(fmtprefix+"f8").view(np.uint8).reshape(n,8)
+    if element_type == "f1":
+        elements = (np.arange(n*num)%256).astype(np.uint8).reshape((n,)+tuple(shape))
+        records[:,8:] = elements.reshape(n,num)
+    else:
+        elements = (np.arange(n*num)%251).astype(element_type).reshape((n,)+tuple(shape))
+        records[:,8:] = elements.astype(fmtprefix+element_type).view(np.uint8).reshape(n,num*size)
+    db_ptr = len(data)
+    data.extend(records.tobytes())
+    data[hd_ptr:hd_ptr+208] = _build_hd_block(dg_ptr,0,0,1,TIMESTAMP,bord=bord)
+    data[dg_ptr:dg_ptr+28] = _build_dg_block(0,cg_ptr,0,db_ptr,bord=bord)
+    data[cg_ptr:cg_ptr+30] = _build_cg_block(0,cn_ptrs[0],0,0,len(channels),rec_size,n,bord=bord)
+    return bytes(data),{"time":np.arange(n)*0.01,"MAP":elements}
+
+
+def _build_block4(block_id,links=(),data=b""):
+    return b"##"+block_id.encode()+bytes(4)+struct.pack("<QQ",24+8*len(links)+len(data),len(links))+struct.pack("<{0}Q".format(len(links)),*links)+data
+
+
+def build_mdf4(n=1000,layout="DT",master_type=2,master_sync_type=1):
+    """
+    builds a version 4.10 mdf file with one channel group of time, Speed and Temp, see build_mdf
+    @param n: the number of records written
+    @param layout: how the records are stored, "DT" one data block, "DZ" one transposed and deflated block,
+                   "DL" a chain of two data lists of DT, DZ and transposed DZ blocks that split records,
+                   "HL" the data lists below a header list
+    @param master_type: the channel type of the time channel, 2 master, 3 virtual master
+    @param master_sync_type: the synchronization type of the time channel, 1 time, 2 angle
+    @return: a tuple (data, expected) of the bytes of the file and a dictionary of the raw columns
+    """
+    data = bytearray(b"MDF     4.10    mdfminer"+struct.pack("<HHHH",0,0,410,0)+bytes(32))
+    hd_ptr = len(data)
+    data.extend(bytes(104))
+
+    def add(block):
+        offset = len(data)
+        data.extend(block)
+        return offset
+
+    expected = {"time":np.arange(n)*0.01,
+                "Speed":(np.arange(n)%1000).astype(np.uint16),
+                "Temp":np.linspace(-40.0,120.0,n).astype(np.float32),
+                }
+    records = np.zeros(n,dtype=np.dtype([("time","<f8"),("Speed","<u2"),("Temp","<f4")]))
+    for key,val in expected.items():
+        records[key] = val
+    raw = records.tobytes()
+
+    def dz(part,zip_type):
+        if zip_type == 1:
+            rows = len(part)//RECORD_SIZE
+            part = np.frombuffer(part,dtype=np.uint8,count=rows*RECORD_SIZE).reshape(rows,RECORD_SIZE).T.tobytes()+part[rows*RECORD_SIZE:]
+        packed = zlib.compress(part)
+        return add(_build_block4("DZ",data=struct.pack("<2sBxIQQ",b"DT",zip_type,RECORD_SIZE,len(part),len(packed))+packed))
+
+    if layout == "DT":
+        data_ptr = add(_build_block4("DT",data=raw))
+    elif layout == "DZ":
+        data_ptr = dz(raw,1)
+    elif layout in ["DL","HL"]:
+        cuts = [0,len(raw)//5+3,len(raw)//2+1,3*len(raw)//4-5,len(raw)]
+        parts = [raw[first:last] for first,last in zip(cuts[:-1],cuts[1:])]
+        ptrs = [add(_build_block4("DT",data=parts[0])),dz(parts[1],1),dz(parts[2],0),add(_build_block4("DT",data=parts[3]))]
+        second = add(_build_block4("DL",links=[0,]+ptrs[2:],data=struct.pack("<B3xI",0,2)+struct.pack("<2Q",cuts[2],cuts[3])))
+        data_ptr = add(_build_block4("DL",links=[second,]+ptrs[:2],data=struct.pack("<B3xI",0,2)+struct.pack("<2Q",cuts[0],cuts[1])))
+        if layout == "HL":
+            data_ptr = add(_build_block4("HL",links=[data_ptr,],data=struct.pack("<HB5x",0,1)))
+    else:
+        raise ValueError(layout)
+
+    def tx(text):
+        return add(_build_block4("TX",data=text.encode()+b"\x00"))
+
+    speed_cc = add(_build_block4("CC",links=[0,tx("km/h"),0,0],data=struct.pack("<BBHHHdd2d",1,0,0,0,2,0.0,0.0,*SPEED_CONVERSION)))
+    temp_cc = add(_build_block4("CC",links=[0,tx("degC"),0,0],data=struct.pack("<BBHHHdd2d",1,0,0,0,2,0.0,0.0,*TEMP_CONVERSION)))
+    channels = [("time",master_type,master_sync_type,4,0,64,0),
+                ("Speed",0,0,0,8,16,speed_cc),
+                ("Temp",0,0,4,10,32,temp_cc),
+                ]
+    cn_ptr = 0
+    for short_name,cn_type,sync_type,data_type,byte_offset,bit_count,cc_ptr in reversed(channels):
+        cn_ptr = add(_build_block4("CN",links=[cn_ptr,0,tx(short_name),0,cc_ptr,0,0,0],
+                                   data=struct.pack("<BBBBIIIIBxH6d",cn_type,sync_type,data_type,0,byte_offset,bit_count,0,0,0,0,0,0,0,0,0,0)))
+    cg_ptr = add(_build_block4("CG",links=[0,cn_ptr,tx("cg"),0,0,0],data=struct.pack("<QQHH4xII",0,n,0,0,RECORD_SIZE,0)))
+    dg_ptr = add(_build_block4("DG",links=[0,cg_ptr,data_ptr,0],data=bytes(8)))
+    nanoseconds = int((TIMESTAMP-datetime.datetime(1970,1,1)).total_seconds())*1000000000
+    data[hd_ptr:hd_ptr+104] = _build_block4("HD",links=[dg_ptr,0,0,0,0,0],data=struct.pack("<QhhBBBBdd",nanoseconds,0,0,0,0,0,0,0.0,0.0))
+    return bytes(data),expected
+
+
+@pytest.fixture
+def make_mdf(tmp_path):
+    """
+    @return: a function that writes build_mdf() to a file and returns (fname, expected)
+    """
+    def make(name="test.mdf",**kwargs):
+        data,expected = build_mdf(**kwargs)
+        fname = str(tmp_path / name)
+        with open(fname,"wb") as f:
+            f.write(data)
+        return fname,expected
+    return make
@@ -0,0 +1,64 @@
+# test_can.py
+
+import numpy as np
+import pytest
+
+from mdfminer.mdf import mdf
+
+from conftest import build_can_mdf,CAN_MESSAGES
+
+
+@pytest.fixture(params=["little","big"])
+def can_mdf(request,tmp_path):
+    data,expected = build_can_mdf(bord=request.param)
+    fname = str(tmp_path / "can.mdf")
+    with open(fname,"wb") as f:
+        f.write(data)
+    return mdf(fname),expected
+
+
+def test_get_can_messages(can_mdf):
+    m,expected = can_mdf
+    msgs = m.get_can_messages()
+    assert [(msg["can_channel"],msg["message_id"],msg["message_name"],msg["sender"]) for msg in msgs] == [key for key,step,signals in CAN_MESSAGES]
+    assert [msg["short_names"] for msg in msgs] == [[short_name for short_name,typ in signals] for key,step,signals in CAN_MESSAGES]
+
+
+def test_get_can_columns_exact_channels(can_mdf):
+    #Speed_FL comes before Speed in the message, a lookup by prefix would return it for Speed
+    m,expected = can_mdf
+    key = CAN_MESSAGES[0][0]
+    cols = m.get_can_columns(message_name="EngineData")
+    assert list(cols) == [key,]
+    assert sorted(cols[key]) == ["Counter","Speed","Speed_FL"]
+    for short_name,(t,val) in cols[key].items():
+        assert np.allclose(t,expected[key]["time"])
+        assert np.array_equal(val,expected[key][short_name])
+
+
+def test_get_can_columns_equal_short_names(can_mdf):
+    #Counter is sent in both messages and comes back once per message
+    m,expected = can_mdf
+    cols = m.get_can_columns(can_channel=1)
+    assert list(cols) == [key for key,step,signals in CAN_MESSAGES]
+    first,second = [key for key,step,signals in CAN_MESSAGES]
+    assert not np.array_equal(cols[first]["Counter"][1],cols[second]["Counter"][1])
+    for key in (first,second):
+        t,val = cols[key]["Counter"]
+        assert np.allclose(t,expected[key]["time"])
+        assert np.array_equal(val,expected[key]["Counter"])
+
+
+def test_get_can_columns_time_range(can_mdf):
+    m,expected = can_mdf
+    key = CAN_MESSAGES[1][0]
+    t,val = m.get_can_columns(sender="ESP",start=0.5,stop=1.0)[key]["Brake"]
+    mask = (expected[key]["time"] >= 0.5) & (expected[key]["time"] <= 1.0)
+    assert np.allclose(t,expected[key]["time"][mask])
+    assert np.array_equal(val,expected[key]["Brake"][mask])
+
+
+def test_get_can_columns_no_match(can_mdf):
+    m,expected = can_mdf
+    with pytest.raises(KeyError):
+        m.get_can_columns(sender="TCU")
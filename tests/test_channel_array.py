@@ -0,0 +1,58 @@
+# test_channel_array.py
+
+import numpy as np
+import pytest
+
+from mdfminer.mdf import mdf
+
+
+@pytest.fixture
+def speed(make_mdf):
+    fname,expected = make_mdf(n=1000)
+    return mdf(fname).channel("Speed",raw=True),expected
+
+
+def _time_range(expected,start,stop):
+    return np.flatnonzero((expected["time"] >= start) & (expected["time"] <= stop))
+
+
+def test_int_index(speed):
+    arr,expected = speed
+    assert arr[5] == expected["Speed"][5]
+    assert arr[np.int64(7)] == expected["Speed"][7]
+    assert arr[-1] == expected["Speed"][-1]
+    with pytest.raises(IndexError):
+        arr[1000]
+
+
+@pytest.mark.parametrize("key",[slice(10,20),slice(None,5),slice(990,None),slice(-20,-10,3),slice(100,10,-7),slice(None,None,-1)])
+def test_slice(speed,key):
+    arr,expected = speed
+    assert np.array_equal(arr[key],expected["Speed"][key])
+
+
+@pytest.mark.parametrize("start,stop",[(2.5,3.5),(np.float32(2.5),np.float64(3.5)),(None,0.5),(9.0,None),(2.5,4)])
+def test_time_slice(speed,start,stop):
+    arr,expected = speed
+    idx = _time_range(expected,-np.inf if start is None else start,np.inf if stop is None else stop)
+    assert np.array_equal(arr[start:stop],expected["Speed"][idx])
+    assert np.array_equal(arr[start:stop:3],expected["Speed"][idx][::3])
+
+
+def test_time_slice_negative_step(speed):
+    arr,expected = speed
+    idx = _time_range(expected,2.5,3.5)
+    assert np.array_equal(arr[3.5:2.5:-1],expected["Speed"][idx][::-1])
+    assert np.array_equal(arr[np.float32(3.5):2.5:-4],expected["Speed"][idx][::-1][::4])
+
+
+def test_index_array_and_mask(speed):
+    arr,expected = speed
+    idx = [999,3,-2,3]
+    assert np.array_equal(arr[idx],expected["Speed"][idx])
+    mask = expected["Speed"]%7 == 0
+    assert np.array_equal(arr[mask],expected["Speed"][mask])
+    with pytest.raises(IndexError):
+        arr[mask[:-1]]
+    with pytest.raises(IndexError):
+        arr[[0,1000]]
@@ -0,0 +1,62 @@
+# test_column_cache.py
+
+import importlib
+
+import numpy as np
+import pytest
+
+from mdfminer.mdf import mdf
+
+mdf_module = importlib.import_module("mdfminer.mdf")
+
+
+@pytest.fixture
+def column_cache():
+    mdf_module._column_cache.clear()
+    yield mdf_module._column_cache
+    mdf_module._column_cache.clear()
+
+
+def _read_records(m,short_names):
+    #the record path yields all data channels of the record in the order of the file
+    rows = [list(rec.values())[0] for rec in m.get_records_with_timestamp(short_names)]
+    return [np.array([row[["Speed","Temp"].index(short_name)] for row in rows]) for short_name in short_names]
+
+
+def test_cached_equals_uncached(make_mdf,column_cache):
+    short_names = ["Speed","Temp"]
+    fname,expected = make_mdf()
+    m = mdf(fname)
+    uncached = m.get_columns(short_names)
+    assert column_cache.get_statistics()["hits"] == 0
+    cached = m.get_columns(short_names)
+    assert column_cache.get_statistics()["hits"] > 0
+    records = _read_records(m,short_names)
+    for short_name,rec_vals in zip(short_names,records):
+        t,vals = uncached[short_name]
+        assert np.array_equal(t,cached[short_name][0])
+        assert vals.dtype == cached[short_name][1].dtype == rec_vals.dtype
+        assert np.array_equal(vals,cached[short_name][1])
+        assert np.array_equal(vals,rec_vals)
+    #records served from the cache
+    assert all(np.array_equal(a,b) for a,b in zip(records,_read_records(m,short_names)))
+
+
+def test_float32_linear_conversion_is_float64(make_mdf,column_cache):
+    fname,expected = make_mdf(temp=[0.1,1.7,-3.3])
+    m = mdf(fname)
+    t,vals = m.get_columns(["Temp"])["Temp"]
+    assert vals.dtype == np.float64
+    assert np.array_equal(vals,expected["Temp"].astype(np.float64)*0.5+1.0)
+    assert np.array_equal(vals,_read_records(m,["Temp"])[0])
+
+
+def test_cached_columns_are_read_only(make_mdf,column_cache):
+    fname,expected = make_mdf()
+    m = mdf(fname)
+    m.get_columns(["Temp"])
+    t,vals = next(m.hdblock.get_data_groups_for_channels(["Temp"])[0][0].iter_columns(fname=fname,short_names=["Temp"]))
+    assert not vals[0].flags.writeable
+    with pytest.raises(ValueError):
+        vals[0][0] = 0
+    assert np.array_equal(m.get_columns(["Temp"])["Temp"][1],expected["Temp"].astype(np.float64)*0.5+1.0)
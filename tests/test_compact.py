@@ -0,0 +1,87 @@
+# test_compact.py
+
+import importlib
+import sqlite3
+
+import numpy as np
+import pytest
+
+from mdfminer.mdf import mdf, change_column
+from mdfminer.mdftools import to_sqlite
+from mdfminer.cli import main
+
+mdf_module = importlib.import_module("mdfminer.mdf")
+
+TEMP_RUNS = np.repeat(np.array([3.0,5.0,np.nan,5.0,-1.0],dtype=np.float32),[130,270,64,300,236])
+
+
+@pytest.fixture
+def column_cache():
+    mdf_module._column_cache.clear()
+    yield mdf_module._column_cache
+    mdf_module._column_cache.clear()
+
+
+def test_get_columns_compact(make_mdf,column_cache):
+    fname,expected = make_mdf(temp=TEMP_RUNS)
+    m = mdf(fname)
+    t,temp = m.get_columns(["Temp"],compact=True)["Temp"]
+    assert isinstance(temp,change_column)
+    assert len(temp.values) == 5
+    assert np.array_equal(np.asarray(temp),TEMP_RUNS*0.5+1.0,equal_nan=True)
+    #compact reads keep the expanded values out of the column cache
+    assert not len(column_cache.entries)
+
+
+def test_resample_compact(make_mdf,column_cache):
+    fname,expected = make_mdf(temp=TEMP_RUNS)
+    m = mdf(fname)
+    for method in ["previous","linear","nearest"]:
+        t,table = m.resample(["Speed","Temp"],raster=0.013,method=method,chunk_size=64)
+        tc,compact_table = m.resample(["Speed","Temp"],raster=0.013,method=method,chunk_size=64,compact=["Temp"])
+        assert np.array_equal(t,tc)
+        assert np.array_equal(table,compact_table,equal_nan=True),method
+
+
+def test_describe_compact(make_mdf,column_cache):
+    fname,expected = make_mdf(temp=TEMP_RUNS)
+    m = mdf(fname)
+    full = m.describe(["Temp"],histogram_bins=4,chunk_size=100)["Temp"]
+    compact = m.describe(["Temp"],histogram_bins=4,chunk_size=100,compact=True)["Temp"]
+    for key in ["count","min","max"]:
+        assert full[key] == compact[key],key
+    for a,b in zip(full["histogram"],compact["histogram"]):
+        assert np.array_equal(a,b)
+    assert np.isclose(full["mean"],compact["mean"])
+    assert np.isclose(full["std"],compact["std"])
+
+
+@pytest.mark.parametrize("layout",["wide","long"])
+def test_to_sqlite_compact(make_mdf,tmp_path,column_cache,layout):
+    fname,expected = make_mdf(temp=TEMP_RUNS)
+    m = mdf(fname)
+    full_db = str(tmp_path / "full.db")
+    compact_db = str(tmp_path / "compact.db")
+    to_sqlite(m,full_db,short_names=["Speed","Temp"],layout=layout,chunk_size=100)
+    num = to_sqlite(m,compact_db,short_names=["Speed","Temp"],layout=layout,chunk_size=100,compact=["Temp"])
+    with sqlite3.connect(full_db) as full,sqlite3.connect(compact_db) as comp:
+        if layout == "wide":
+            assert full.execute("SELECT * FROM group_0").fetchall() == comp.execute("SELECT * FROM group_0").fetchall()
+            assert num == len(TEMP_RUNS)
+            return
+        temp_id = comp.execute("SELECT id FROM channels WHERE short_name = 'Temp'").fetchone()[0]
+        rows = comp.execute("SELECT time,value FROM group_0 WHERE channel_id = ? ORDER BY time",(temp_id,)).fetchall()
+        #one row per run, runs that span chunks of 100 records are not repeated
+        assert [time for time,value in rows] == pytest.approx([0.0,1.3,4.0,4.64,7.64])
+        assert [value for time,value in rows] == [2.5,3.5,None,3.5,0.5]
+        assert num == len(TEMP_RUNS)+len(rows)
+
+
+def test_cli_export_compact(make_mdf,tmp_path,column_cache):
+    fname,expected = make_mdf(temp=TEMP_RUNS)
+    full_csv = str(tmp_path / "full.csv")
+    compact_csv = str(tmp_path / "compact.csv")
+    assert main(["export",fname,"-o",full_csv,"-c","Speed,Temp","--chunk-size","100"]) == 0
+    assert main(["export",fname,"-o",compact_csv,"-c","Speed,Temp","--chunk-size","100","--compact","Temp"]) == 0
+    with open(full_csv) as full,open(compact_csv) as comp:
+        assert full.read() == comp.read()
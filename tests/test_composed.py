@@ -0,0 +1,57 @@
+# test_composed.py
+
+import numpy as np
+import pytest
+
+from mdfminer.mdf import mdf
+
+from conftest import build_cd_mdf
+
+
+@pytest.fixture
+def make_cd_mdf(tmp_path):
+    def make(**kwargs):
+        data,expected = build_cd_mdf(**kwargs)
+        fname = str(tmp_path / "cd.mdf")
+        with open(fname,"wb") as f:
+            f.write(data)
+        return mdf(fname),expected
+    return make
+
+
+@pytest.mark.parametrize("bord",["little","big"])
+@pytest.mark.parametrize("element_type",["u2","i4","f2","f4","f8"])
+def test_get_composed(make_cd_mdf,bord,element_type):
+    m,expected = make_cd_mdf(element_type=element_type,bord=bord)
+    assert m.get_composed_channel_short_names() == ["MAP",]
+    t,vals = m.get_composed("MAP",chunk_size=7)
+    assert np.array_equal(t,expected["time"])
+    assert vals.shape == (100,2,3)
+    assert vals.dtype == np.dtype(element_type)
+    assert np.array_equal(vals,expected["MAP"])
+
+
+def test_get_composed_time_range_and_conversion(make_cd_mdf):
+    m,expected = make_cd_mdf(conversion=(1.0,0.5))
+    t,vals = m.get_composed("MAP",start=0.2,stop=0.5,chunk_size=3)
+    mask = (expected["time"] >= 0.2) & (expected["time"] <= 0.5)
+    assert np.array_equal(t,expected["time"][mask])
+    assert np.array_equal(vals,expected["MAP"][mask]*0.5+1.0)
+    t,vals = m.get_composed("MAP",start=0.2,stop=0.5,raw=True)
+    assert np.array_equal(vals,expected["MAP"][mask])
+
+
+@pytest.mark.parametrize("dependency_type,indexed,shape",[(2,True,(2,3)),(2,False,(1,6)),(1,True,(6,)),(258,False,(2,3))])
+def test_get_composed_shape(make_cd_mdf,dependency_type,indexed,shape):
+    #a matrix in one channel group takes its shape from the element names, without indexes it is one line
+    m,expected = make_cd_mdf(dependency_type=dependency_type,indexed=indexed)
+    t,vals = m.get_composed("MAP")
+    assert vals.shape == (100,)+shape
+    assert np.array_equal(vals.reshape(100,-1),expected["MAP"].reshape(100,-1))
+
+
+def test_get_composed_8_bit_float(make_cd_mdf):
+    #there is no numpy float of 8 bits, the elements are not viewed and the decoder rejects them
+    m,expected = make_cd_mdf(element_type="f1")
+    with pytest.raises(NotImplementedError):
+        m.get_composed("MAP")
@@ -0,0 +1,72 @@
+# test_concurrency.py
+
+import os
+import importlib
+import concurrent.futures
+
+import numpy as np
+import pytest
+
+from mdfminer.mdf import mdf
+from mdfminer.sources import get_shared_descriptor
+
+from conftest import build_can_mdf,CAN_MESSAGES
+
+mdf_module = importlib.import_module("mdfminer.mdf")
+
+NUM_THREADS = 8
+
+
+@pytest.fixture
+def column_cache():
+    mdf_module._column_cache.clear()
+    yield mdf_module._column_cache
+    mdf_module._column_cache.clear()
+
+
+def test_threads_read_one_object(tmp_path,column_cache):
+    #the threads share one mdf object and its descriptor, each reads other groups and windows
+    data,expected = build_can_mdf(n=20000)
+    fname = str(tmp_path / "can.mdf")
+    with open(fname,"wb") as f:
+        f.write(data)
+    m = mdf(fname)
+    signals = [(CAN_MESSAGES[0][0],"Speed_FL"),(CAN_MESSAGES[1][0],"Brake")]
+
+    def work(seed):
+        rng = np.random.RandomState(seed)
+        for idx in range(20):
+            key,short_name = signals[(seed+idx)%len(signals)]
+            t_all = expected[key]["time"]
+            start,stop = np.sort(rng.uniform(t_all[0],t_all[-1],2))
+            t,vals = m.get_columns([short_name],start=start,stop=stop,raw=True)[short_name]
+            mask = (t_all >= start) & (t_all <= stop)
+            assert np.array_equal(t,t_all[mask])
+            assert np.array_equal(vals,expected[key][short_name][mask])
+            chunks = list(m.iter_columns([short_name],start=start,stop=stop,chunk_size=int(rng.randint(50,3000)),raw=True))
+            assert np.array_equal(np.concatenate([vals[0] for t,vals in chunks]),expected[key][short_name][mask])
+            indexes = rng.randint(0,len(t_all),50)
+            assert np.array_equal(m.channel(short_name,raw=True)[indexes],expected[key][short_name][indexes])
+        return seed
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=NUM_THREADS) as executor:
+        assert sorted(executor.map(work,range(NUM_THREADS))) == list(range(NUM_THREADS))
+
+
+@pytest.mark.skipif(not hasattr(os,"pread"),reason="no positional reads")
+def test_shared_descriptor_reopened_after_replace(tmp_path):
+    fname = str(tmp_path / "file.mdf")
+    with open(fname,"wb") as f:
+        f.write(b"old contents")
+    first = get_shared_descriptor(fname)
+    assert get_shared_descriptor(fname) is first
+    #writers usually replace a file by renaming a new one onto it, the path then names another inode
+    with open(fname+".tmp","wb") as f:
+        f.write(b"new contents, longer")
+    os.replace(fname+".tmp",fname)
+    second = get_shared_descriptor(fname)
+    assert second is not first
+    assert second.pread(100,0) == b"new contents, longer"
+    assert second.get_size() == 20
+    #readers that still hold the old descriptor keep reading the old file
+    assert first.pread(100,0) == b"old contents"
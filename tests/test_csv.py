@@ -0,0 +1,42 @@
+# test_csv.py
+
+import numpy as np
+
+from mdfminer.mdf import mdf
+from mdfminer.mdftools import to_csv_file
+
+from conftest import build_can_mdf,CAN_MESSAGES
+
+
+def _read(fname):
+    with open(fname) as f:
+        lines = f.read().split(";\n")
+    return lines[0].split(","),[line.split(",") for line in lines[1:] if line]
+
+
+def test_to_csv_file_header_of_written_group(tmp_path):
+    #only the records of the first data group are written
+    data,expected = build_can_mdf(n=50)
+    fname = str(tmp_path / "can.mdf")
+    with open(fname,"wb") as f:
+        f.write(data)
+    out = str(tmp_path / "can.csv")
+    to_csv_file(mdf(fname),out)
+    header,rows = _read(out)
+    key,step,signals = CAN_MESSAGES[0]
+    assert header == ["time",]+[short_name for short_name,typ in signals]
+    assert len(rows) == 50
+    assert all(len(row) == len(header) for row in rows)
+    for idx,(short_name,typ) in enumerate(signals,1):
+        assert [int(row[idx]) for row in rows] == expected[key][short_name].tolist()
+
+
+def test_to_csv_file_derived(make_mdf,tmp_path):
+    fname,expected = make_mdf(n=20)
+    m = mdf(fname)
+    m.derive("Double","Speed*2",engine="numpy")
+    out = str(tmp_path / "derived.csv")
+    to_csv_file(m,out)
+    header,rows = _read(out)
+    assert header == ["time","Speed","Temp","Double"]
+    assert np.allclose([float(row[3]) for row in rows],expected["Speed"]*0.2)
@@ -0,0 +1,25 @@
+# test_cut.py
+
+import os
+
+import numpy as np
+
+from mdfminer.mdf import mdf,read_file_info
+
+
+def test_cut_big_endian(make_mdf,tmp_path):
+    fname,expected = make_mdf(bord='big')
+    out_fname = str(tmp_path / "cut.mdf")
+    m = mdf(fname)
+    m.cut(out_fname,start=1.0,stop=2.0)
+    assert os.path.getsize(out_fname) < os.path.getsize(fname)
+    assert read_file_info(out_fname)["byte_order"] == 'big'
+    c = mdf(out_fname)
+    t,speed = c.get_columns(["Speed"])["Speed"]
+    sel = (expected["time"] >= 1.0-1e-9) & (expected["time"] <= 2.0+1e-9)
+    assert np.allclose(t,expected["time"][sel])
+    assert np.allclose(speed,expected["Speed"][sel]*0.1)
+    for short_name,unit in [("Speed","km/h"),("Temp","degC")]:
+        cc = c.get_channel_by_short_name(short_name).conversion_block
+        assert len(cc.data) == len(m.get_channel_by_short_name(short_name).conversion_block.data)
+        assert cc.physical_unit == unit
@@ -0,0 +1,126 @@
+# test_decode.py
+
+import numpy as np
+import pytest
+
+from mdfminer.mdf import mdf,_decode_column,_interpret_record
+
+from conftest import build_record_mdf
+
+
+#short name, bit offset, number of bits, signal data type, numpy type of the raw values
+LAYOUT = [("bits3",64,3,0,"u1"),
+          ("sbits5",67,5,1,"i1"),
+          ("bits12",72,12,0,"u2"),
+          ("bits10",90,10,0,"u2"),
+          ("uint64",104,64,0,"u8"),
+          ("int64",168,64,1,"i8"),
+          ("half",232,16,2,"f2"),
+          ("single",248,32,2,"f4"),
+          ("double",280,64,3,"f8"),
+          ("be_u16",344,16,9,"u2"),
+          ("be_i32",360,32,10,"i4"),
+          ("be_f32",392,32,11,"f4"),
+          ("be_f64",424,64,12,"f8"),
+          ("le_u16",488,16,13,"u2"),
+          ("le_i16",504,16,14,"i2"),
+          ("le_f32",520,32,15,"f4"),
+          ("le_f64",552,64,16,"f8"),
+          ("int24",616,24,1,"i4"),
+          ("bytes3",640,24,8,"V3"),
+          ]
+RECORD_SIZE = 83
+N = 50
+
+
+def _expected_values(rng):
+    expected = {"time":np.arange(N)*0.01}
+    for short_name,bit_offset,number_of_bits,signal_data_type,typ in LAYOUT:
+        kind = typ[0]
+        if kind in "ui":
+            low = -(1 << (number_of_bits-1)) if kind == "i" else 0
+            high = (1 << (number_of_bits-1))-1 if kind == "i" else (1 << number_of_bits)-1
+            vals = [int(val) for val in rng.randint(0,1 << 30,size=N)*rng.randint(0,1 << 30,size=N)]
+            vals = [low+(val%(high-low+1)) for val in vals]
+            vals[:2] = [low,high]#the extremes of the range
+            expected[short_name] = np.array(vals,dtype=typ)
+        elif kind == "f":
+            expected[short_name] = (rng.standard_normal(N)*1000).astype(typ)
+        else:
+            expected[short_name] = np.array([rng.bytes(number_of_bits//8) for idx in range(N)],dtype="S").view(typ)
+    return expected
+
+
+def _encode(expected,bord):
+    """
+    packs the values into records the way the signal data types describe them
+    """
+    records = np.zeros((N,RECORD_SIZE),dtype=np.uint8)
+    fmtprefix = '<' if bord == 'little' else '>'
+    records[:,:8] = expected["time"].astype(fmtprefix+"f8").view(np.uint8).reshape(N,8)
+    for short_name,bit_offset,number_of_bits,signal_data_type,typ in LAYOUT:
+        order = {9:'big',10:'big',11:'big',12:'big',13:'little',14:'little',15:'little',16:'little'}.get(signal_data_type,bord)
+        shift = bit_offset%8
+        first = bit_offset//8
+        size = (shift+number_of_bits+7)//8
+        for row,val in enumerate(expected[short_name]):
+            if typ[0] in "ui":
+                encoded = ((int(val) & ((1 << number_of_bits)-1)) << shift).to_bytes(size,order)
+            elif typ[0] == "f":
+                encoded = np.array(val,dtype={"little":"<","big":">"}[order]+typ).tobytes()
+            else:
+                encoded = val.tobytes()
+            records[row,first:first+size] |= np.frombuffer(encoded,dtype=np.uint8)
+    return records
+
+
+@pytest.fixture(params=["little","big"])
+def layout_mdf(request,tmp_path):
+    expected = _expected_values(np.random.RandomState(43))
+    records = _encode(expected,request.param)
+    channels = [("time","time",0,64,3)]+[(short_name,"data",bit_offset,number_of_bits,signal_data_type)
+                                          for short_name,bit_offset,number_of_bits,signal_data_type,typ in LAYOUT]
+    fname = str(tmp_path / "layout.mdf")
+    with open(fname,"wb") as f:
+        f.write(build_record_mdf(channels,records,bord=request.param))
+    return mdf(fname),records,request.param,expected
+
+
+def test_decode_column(layout_mdf):
+    m,records,bord,expected = layout_mdf
+    for short_name,bit_offset,number_of_bits,signal_data_type,typ in LAYOUT:
+        val = _decode_column(records,m.get_channel_by_short_name(short_name),bord)
+        assert val.dtype == np.dtype(typ),short_name
+        if typ[0] == "V":
+            assert [bytes(v) for v in val] == [bytes(v) for v in expected[short_name]]
+        else:
+            assert np.array_equal(val,expected[short_name]),short_name
+
+
+def test_interpret_record(layout_mdf):
+    m,records,bord,expected = layout_mdf
+    chs = [m.get_channel_by_short_name(short_name) for short_name,bit_offset,number_of_bits,signal_data_type,typ in LAYOUT]
+    for row in range(N):
+        vals = _interpret_record(records[row],chs,bord)
+        for val,(short_name,bit_offset,number_of_bits,signal_data_type,typ) in zip(vals,LAYOUT):
+            if typ[0] == "V":
+                assert val == bytes(expected[short_name][row]),short_name
+            else:
+                assert val == expected[short_name][row].item(),short_name
+
+
+def test_columnar_and_record_reader(layout_mdf):
+    m,records,bord,expected = layout_mdf
+    short_names = [short_name for short_name,bit_offset,number_of_bits,signal_data_type,typ in LAYOUT]
+    cols = m.get_columns(short_names)
+    rows = [list(rec.items())[0] for rec in m.get_records_with_timestamp()]
+    assert np.allclose([t.total_seconds() for t,vals in rows],expected["time"])
+    for idx,(short_name,bit_offset,number_of_bits,signal_data_type,typ) in enumerate(LAYOUT):
+        t,val = cols[short_name]
+        assert np.allclose(t,expected["time"])
+        if typ[0] == "V":
+            assert [bytes(v) for v in val] == [bytes(v) for v in expected[short_name]]
+            assert [vals[idx] for t,vals in rows] == [bytes(v) for v in expected[short_name]]
+        else:
+            assert np.array_equal(val,expected[short_name]),short_name
+            assert [vals[idx] for t,vals in rows] == expected[short_name].tolist(),short_name
@@ -0,0 +1,80 @@
+# test_derive.py
+
+import importlib.util
+
+import numpy as np
+import pytest
+
+from mdfminer.mdf import mdf, _align_column
+from mdfminer.cli import main
+
+from conftest import build_can_mdf,CAN_MESSAGES
+
+
+def test_derive_auto_engine(make_mdf):
+    fname,expected = make_mdf()
+    m = mdf(fname)
+    ch = m.derive("Power","Speed*Temp")
+    assert ch.engine == ("numexpr" if importlib.util.find_spec("numexpr") else "numpy")
+    t,vals = m.get_columns(["Power"])["Power"]
+    assert np.allclose(vals,(expected["Speed"]*0.1)*(expected["Temp"].astype(np.float64)*0.5+1.0))
+
+
+def _can_mdf(tmp_path):
+    data,expected = build_can_mdf(n=500)
+    fname = str(tmp_path / "can.mdf")
+    with open(fname,"wb") as f:
+        f.write(data)
+    return mdf(fname),expected
+
+
+@pytest.mark.parametrize("method",["previous","linear","nearest"])
+def test_derive_aligns_other_data_group(tmp_path,method):
+    #Brake is sampled every 20 ms from 5 ms on and aligned onto the 10 ms raster of Speed_FL, chunk by chunk
+    m,expected = _can_mdf(tmp_path)
+    engine,brake = [expected[key] for key,step,signals in CAN_MESSAGES]
+    m.derive("Sum","Speed_FL+Brake",method=method,engine="numpy")
+    chunks = list(m.iter_columns(["Sum"],chunk_size=37))
+    t = np.concatenate([t for t,vals in chunks])
+    vals = np.concatenate([vals[0] for t,vals in chunks])
+    assert np.array_equal(t,engine["time"])
+    aligned = _align_column(brake["time"],brake["Brake"].astype(np.float64),engine["time"],method)
+    assert np.array_equal(vals,engine["Speed_FL"]+aligned,equal_nan=True)
+    if method == "previous":
+        idx = np.searchsorted(brake["time"],engine["time"],side="right")-1
+        assert np.isnan(vals[idx < 0]).all()
+        assert np.array_equal(vals[idx >= 0],engine["Speed_FL"][idx >= 0]+brake["Brake"][idx[idx >= 0]])
+
+
+def test_derive_in_record_reader(make_mdf):
+    #derived values are appended to the values of each record
+    fname,expected = make_mdf(n=50)
+    m = mdf(fname)
+    m.derive("Power","Speed*Temp",engine="numpy")
+    rows = [list(rec.values())[0] for rec in m.get_records_with_timestamp(["Speed","Temp","Power"])]
+    assert len(rows) == 50
+    speed = expected["Speed"]*0.1
+    temp = expected["Temp"].astype(np.float64)*0.5+1.0
+    assert np.allclose([row[0] for row in rows],speed)
+    assert np.allclose([row[2] for row in rows],speed*temp)
+
+
+def test_cut_rejects_derived(make_mdf,tmp_path):
+    fname,expected = make_mdf()
+    m = mdf(fname)
+    m.derive("Power","Speed*Temp",engine="numpy")
+    with pytest.raises(ValueError):
+        m.cut(str(tmp_path / "cut.mdf"),short_names=["Speed","Power"])
+
+
+def test_cli_derive(make_mdf,tmp_path):
+    fname,expected = make_mdf(n=50)
+    out = str(tmp_path / "out.csv")
+    assert main(["export",fname,"-o",out,"-c","Speed,Double","-d","Double = Speed*2"]) == 0
+    with open(out) as f:
+        lines = f.read().splitlines()
+    assert lines[0] == "time,Speed,Double"
+    rows = np.array([[float(val) for val in line.split(",")] for line in lines[1:]])
+    assert np.allclose(rows[:,2],2*rows[:,1])
+    assert np.allclose(rows[:,1],expected["Speed"]*0.1)
+    assert main(["export",fname,"-o",out,"-d","Double"]) == 1
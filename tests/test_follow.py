@@ -0,0 +1,43 @@
+# test_follow.py
+
+import numpy as np
+
+from mdfminer.mdf import mdf
+
+from conftest import build_mdf,RECORD_SIZE
+
+
+def test_follow_growing_file(tmp_path):
+    #the channel group already announces all records while only a third is on disk,
+    #the polls are driven by next() and the file grows between them, so nothing waits on a clock
+    data,expected = build_mdf(n=300)
+    data = b"UnFinMF "+data[8:]
+    header = len(data)-300*RECORD_SIZE
+    fname = str(tmp_path / "growing.mdf")
+    with open(fname,"wb") as f:
+        f.write(data[:header+100*RECORD_SIZE])
+    chunks = mdf(fname).follow(["Speed"],poll_interval=0.01,timeout=5.0,chunk_size=64)
+    lengths = []
+    received = []
+
+    def take(num):
+        for idx in range(num):
+            t,vals = next(chunks)
+            lengths.append(len(t))
+            received.append((t,vals))
+
+    take(2)
+    assert lengths == [64,36]
+    #a record that is only partly written is read on a later poll
+    with open(fname,"ab") as f:
+        f.write(data[header+100*RECORD_SIZE:header+200*RECORD_SIZE+RECORD_SIZE//2])
+    take(2)
+    assert lengths == [64,36,64,36]
+    with open(fname,"ab") as f:
+        f.write(data[header+200*RECORD_SIZE+RECORD_SIZE//2:])
+    with open(fname,"r+b") as f:
+        f.write(b"MDF     ")
+    received.extend(chunks)
+    assert [len(t) for t,vals in received] == [64,36,64,36,64,36]
+    assert np.allclose(np.concatenate([t for t,vals in received]),expected["time"])
+    assert np.allclose(np.concatenate([vals[0] for t,vals in received]),expected["Speed"]*0.1)
@@ -0,0 +1,38 @@
+# test_hd_block.py
+
+import struct
+import datetime
+
+from mdfminer.mdf import mdf,_build_hd_block,_interpret_hd_block,read_file_info
+
+from conftest import TIMESTAMP
+
+
+def test_hd_block_size():
+    for bord in ['little','big']:
+        data = _build_hd_block(0,0,0,1,TIMESTAMP,bord=bord)
+        assert len(data) == 208
+        fmtprefix = '<' if bord == 'little' else '>'
+        assert struct.unpack("{0}H".format(fmtprefix),data[2:4])[0] == 208
+
+
+def test_hd_block_fields():
+    data = _build_hd_block(0,0,0,1,TIMESTAMP,author="a",organisation="o",project="p",subject="s")
+    hd = _interpret_hd_block(data)
+    assert (hd["author"],hd["organisation"],hd["project"],hd["subject"]) == ("a","o","p","s")
+    assert hd["timestamp"] == TIMESTAMP
+
+
+def test_hd_block_timestamp_round_trip(make_mdf):
+    fname,expected = make_mdf()
+    with open(fname,"rb") as f:
+        data = f.read()[64:64+208]
+    nanoseconds,utc_offset,time_quality = struct.unpack("<QhH",data[164:176])
+    assert datetime.datetime(1970,1,1)+datetime.timedelta(microseconds=nanoseconds//1000) == TIMESTAMP
+    assert data[176:208].rstrip(b'\x00') == b"Local PC Reference Time"
+    m = mdf(fname)
+    assert m.hdblock.timestamp == TIMESTAMP
+    assert m.hdblock.project == "project"
+    assert m.hdblock.subject == "subject"
+    info = read_file_info(fname)
+    assert info["project"] == "project"
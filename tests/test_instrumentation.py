@@ -0,0 +1,18 @@
+# test_instrumentation.py
+
+from mdfminer.mdf import mdf
+
+
+def test_stats_per_object(make_mdf):
+    fname,expected = make_mdf()
+    first = mdf(fname,instrument=True)
+    second = mdf(fname,instrument=True)
+    plain = mdf(fname)
+    before = first.stats()
+    second.get_columns(["Speed"])
+    plain.get_columns(["Speed"])
+    assert first.stats()["records_decoded"] == before["records_decoded"]
+    assert first.stats()["bytes_read"] == before["bytes_read"]
+    assert second.stats()["records_decoded"] == len(expected["time"])
+    first.get_columns(["Temp"])
+    assert first.stats()["records_decoded"] == len(expected["time"])
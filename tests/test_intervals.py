@@ -0,0 +1,100 @@
+# test_intervals.py
+
+import numpy as np
+import pytest
+
+from mdfminer.mdf import mdf,THRESHOLD_OPERATORS
+
+
+def _find_intervals(t,vals,op,threshold,hysteresis=0.0):
+    #sample by sample reference of mdf.find_intervals
+    offset = -hysteresis if op in [">",">="] else hysteresis
+    starts = []
+    stops = []
+    active = False
+    for timestamp,val in zip(t,vals):
+        if active:
+            state = THRESHOLD_OPERATORS[op](val,threshold+offset)
+        else:
+            state = THRESHOLD_OPERATORS[op](val,threshold)
+        if state and not active:
+            starts.append(timestamp)
+        elif active and not state:
+            stops.append(timestamp)
+        active = state
+    if active:
+        stops.append(t[-1])
+    return np.array(starts),np.array(stops)
+
+
+@pytest.fixture
+def noisy(make_mdf):
+    #a slow sine with noise that chatters around each threshold crossing, the measurement ends above 10
+    n = 2000
+    rng = np.random.RandomState(41)
+    t = np.arange(n)*0.01
+    temp = (20*np.sin(2*np.pi*(t+0.3)/2.0)+rng.uniform(-1.5,1.5,n)-1.0)/0.5
+    fname,expected = make_mdf(temp=temp.astype(np.float32))
+    m = mdf(fname)
+    return m,expected["time"],np.asarray(m.channel("Temp"))
+
+
+@pytest.mark.parametrize("chunk_size",[1,7,64,5000])
+@pytest.mark.parametrize("op,threshold,hysteresis",[(">",10.0,0.0),(">",10.0,3.0),(">=",10.0,3.0),("<",-5.0,2.0),("<=",-5.0,0.0)])
+def test_intervals_across_chunks(noisy,chunk_size,op,threshold,hysteresis):
+    m,t,temp = noisy
+    starts,stops = m.find_intervals("Temp","{0} {1}".format(op,threshold),hysteresis=hysteresis,chunk_size=chunk_size)
+    estarts,estops = _find_intervals(t,temp,op,threshold,hysteresis)
+    assert len(estarts) > 3
+    assert np.array_equal(starts,estarts)
+    assert np.array_equal(stops,estops)
+
+
+def test_hysteresis_removes_chatter(noisy):
+    m,t,temp = noisy
+    starts,stops = m.find_intervals("Temp","> 10",chunk_size=100)
+    hstarts,hstops = m.find_intervals("Temp","> 10",hysteresis=3.0,chunk_size=100)
+    #one interval per period of 2 seconds and one from the start, the last one is open at the end of the measurement
+    assert len(hstarts) == 11
+    assert hstarts[0] == t[0]
+    assert len(starts) > len(hstarts)
+    assert hstops[-1] == t[-1]
+    #every interval with hysteresis covers the intervals without it that start inside it
+    for strt,stp in zip(starts,stops):
+        idx = np.searchsorted(hstarts,strt,side="right")-1
+        if idx >= 0 and strt <= hstops[idx]:
+            assert stp <= hstops[idx]
+
+
+def test_min_duration_and_range(noisy):
+    m,t,temp = noisy
+    starts,stops = m.find_intervals("Temp","> 10",hysteresis=3.0,min_duration=0.5,start=3.0,stop=12.0,chunk_size=33)
+    sel = (t >= 3.0-1e-9) & (t <= 12.0+1e-9)
+    estarts,estops = _find_intervals(t[sel],temp[sel],">",10.0,3.0)
+    keep = (estops-estarts) >= 0.5
+    assert np.array_equal(starts,estarts[keep])
+    assert np.array_equal(stops,estops[keep])
+    assert 0 < keep.sum() < len(keep)
+
+
+def test_expression_intervals(noisy):
+    m,t,temp = noisy
+    speed = np.asarray(m.channel("Speed"))
+    starts,stops = m.find_intervals(condition="(Temp > 10) & (Speed < 80)",chunk_size=50)
+    state = (temp > 10) & (speed < 80)
+    edges = np.diff(state.astype(np.int8),prepend=np.int8(0),append=np.int8(0))
+    assert np.array_equal(starts,t[np.nonzero(edges[:-1] == 1)[0]])
+    estops = [t[idx] if idx < len(t) else t[-1] for idx in np.nonzero(edges == -1)[0]]
+    assert np.array_equal(stops,estops)
+
+
+def test_invalid_conditions(noisy):
+    m,t,temp = noisy
+    with pytest.raises(ValueError):
+        m.find_intervals("Temp","== 10",hysteresis=1.0)
+    with pytest.raises(ValueError):
+        m.find_intervals("Temp","> 10",hysteresis=-1.0)
+    with pytest.raises(ValueError):
+        m.find_intervals(condition="Temp > 10",hysteresis=1.0)
+    with pytest.raises(ValueError):
+        m.find_intervals("Temp","about 10")
@@ -0,0 +1,60 @@
+# test_mdf4.py
+
+import numpy as np
+import pytest
+
+from mdfminer.mdf import mdf
+
+from conftest import build_mdf4,TIMESTAMP
+
+
+@pytest.fixture
+def make_mdf4(tmp_path):
+    def make(**kwargs):
+        data,expected = build_mdf4(**kwargs)
+        fname = str(tmp_path / "test.mf4")
+        with open(fname,"wb") as f:
+            f.write(data)
+        return fname,expected
+    return make
+
+
+@pytest.mark.parametrize("layout",["DT","DZ","DL","HL"])
+def test_read_columns(make_mdf4,layout):
+    fname,expected = make_mdf4(layout=layout)
+    m = mdf(fname)
+    assert m.version >= 4
+    assert m.hdblock.timestamp == TIMESTAMP
+    cols = m.get_columns(["Speed","Temp"])
+    t,speed = cols["Speed"]
+    assert np.array_equal(t,expected["time"])
+    assert np.allclose(speed,expected["Speed"]*0.1)
+    assert np.array_equal(cols["Temp"][1],expected["Temp"].astype(np.float64)*0.5+1.0)
+
+
+@pytest.mark.parametrize("layout",["DT","DZ","DL","HL"])
+def test_read_ranges(make_mdf4,layout):
+    #time ranges and chunks start inside data blocks and records span the borders of the blocks
+    fname,expected = make_mdf4(layout=layout)
+    m = mdf(fname)
+    t,temp = m.get_columns(["Temp"],start=2.5,stop=7.5)["Temp"]
+    mask = (expected["time"] >= 2.5) & (expected["time"] <= 7.5)
+    assert np.array_equal(t,expected["time"][mask])
+    assert np.array_equal(temp,expected["Temp"][mask].astype(np.float64)*0.5+1.0)
+    chunks = list(m.iter_columns(["Speed"],chunk_size=77,raw=True))
+    assert np.array_equal(np.concatenate([vals[0] for t,vals in chunks]),expected["Speed"])
+    idx = [999,3,512,200]
+    assert np.array_equal(m.channel("Speed",raw=True)[idx],expected["Speed"][idx])
+
+
+def test_virtual_time_master_raises(make_mdf4):
+    fname,expected = make_mdf4(master_type=3)
+    with pytest.raises(NotImplementedError):
+        mdf(fname)
+
+
+def test_angle_master_is_no_time_channel(make_mdf4):
+    fname,expected = make_mdf4(master_sync_type=2)
+    m = mdf(fname)
+    assert [dg.get_channel_groups() for dg in m.hdblock.get_data_groups()] == [[],]
+    assert m.get_channel_short_names() == []
@@ -0,0 +1,105 @@
+# test_multi_mdf.py
+
+import datetime
+
+import numpy as np
+import pytest
+
+from mdfminer.mdf import mdf,multi_mdf
+
+from conftest import build_can_mdf,TIMESTAMP
+
+
+OFFSETS = [0.0,10.0,25.0]#seconds from the first header timestamp, each file records 10 seconds
+
+
+@pytest.fixture(params=["little","big"])
+def parts(request,make_mdf):
+    fnames = []
+    for idx,offset in enumerate(OFFSETS):
+        trigger_events = [{"trigger_time":5.0,"pre_trigger_time":0.5,"post_trigger_time":0.5}]
+        fname,expected = make_mdf(name="Recorder1-{0:03d}.mdf".format(idx+1),n=1000,bord=request.param,trigger_events=trigger_events,
+                                  timestamp=TIMESTAMP+datetime.timedelta(seconds=offset))
+        fnames.append(fname)
+    #the files are ordered by their header timestamps, not by the given order
+    return [fnames[1],fnames[2],fnames[0]],expected
+
+
+def _expected_columns(expected,sel=None):
+    t = np.concatenate([expected["time"]+offset for offset in OFFSETS])
+    speed = np.tile(expected["Speed"],len(OFFSETS))
+    if sel is not None:
+        return t[sel(t)],speed[sel(t)]
+    return t,speed
+
+
+def test_offsets(parts):
+    fnames,expected = parts
+    m = multi_mdf(fnames)
+    assert m.get_time_offsets() == OFFSETS
+    assert [mdf_obj.fname for mdf_obj in m.mdfs] == sorted(fnames)
+    assert m.timestamp == TIMESTAMP
+
+
+def test_get_columns_across_files(parts):
+    fnames,expected = parts
+    m = multi_mdf(fnames)
+    t,speed = m.get_columns(["Speed"],raw=True)["Speed"]
+    et,espeed = _expected_columns(expected)
+    assert np.allclose(t,et)
+    assert np.array_equal(speed,espeed)
+    #a range across the first file boundary and one that skips the first two files
+    for strt,stp in [(9.5,10.5),(26.0,27.0),(12.0,None),(None,0.5)]:
+        t,speed = m.get_columns(["Speed"],start=strt,stop=stp,raw=True)["Speed"]
+        sel = lambda t:((t >= strt-1e-9) if strt is not None else True) & ((t <= stp+1e-9) if stp is not None else True)
+        et,espeed = _expected_columns(expected,sel)
+        assert np.allclose(t,et)
+        assert np.array_equal(speed,espeed)
+    t,speed = m.get_columns(["Speed"],start=10.0,stop=10.05,useabsolutetime=True)["Speed"]
+    assert t[0] == np.datetime64(TIMESTAMP+datetime.timedelta(seconds=10))
+
+
+def test_iter_columns_and_records(parts):
+    fnames,expected = parts
+    m = multi_mdf(fnames)
+    chunks = list(m.iter_columns(["Speed"],start=25.0,chunk_size=300,raw=True))
+    assert [len(t) for t,vals in chunks] == [300,300,300,100]
+    assert np.allclose(chunks[0][0][:2],[25.0,25.01])
+    recs = list(m.get_records_with_timestamp())
+    assert len(recs) == 3000
+    assert list(recs[1000].keys())[0] == datetime.timedelta(seconds=10)
+    assert list(recs[2999].keys())[0] == datetime.timedelta(seconds=34.99)
+
+
+def test_layout_mismatch(parts,tmp_path):
+    fnames,expected = parts
+    data,can_expected = build_can_mdf()
+    fname = str(tmp_path / "can.mdf")
+    with open(fname,"wb") as f:
+        f.write(data)
+    with pytest.raises(ValueError):
+        multi_mdf(fnames+[fname,])
+    with pytest.raises(ValueError):
+        multi_mdf([])
+
+
+def test_concat(parts,tmp_path):
+    fnames,expected = parts
+    m = multi_mdf(fnames)
+    out_fname = str(tmp_path / "concat.mdf")
+    m.concat(out_fname,chunk_size=333)
+    c = mdf(out_fname)
+    assert c.hdblock.timestamp == TIMESTAMP
+    assert c.byte_order == m.mdfs[0].byte_order
+    cols = c.get_columns(["Speed","Temp"])
+    t,speed = cols["Speed"]
+    et,espeed = _expected_columns(expected)
+    assert np.allclose(t,et)
+    assert np.allclose(speed,espeed*0.1)
+    assert np.allclose(cols["Temp"][1],np.tile(expected["Temp"],len(OFFSETS))*0.5+1.0)
+    assert [tev["trigger_time"] for tev in c.get_trigger_events()] == [5.0+offset for offset in OFFSETS]
+    #the joined file reads like the view over the parts
+    t,temp = m.get_columns(["Temp"],start=9.0,stop=26.0)["Temp"]
+    ct,ctemp = c.get_columns(["Temp"],start=9.0,stop=26.0)["Temp"]
+    assert np.allclose(t,ct)
+    assert np.array_equal(temp,ctemp)
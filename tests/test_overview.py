@@ -0,0 +1,40 @@
+# test_overview.py
+
+import numpy as np
+import pytest
+
+from mdfminer.mdf import mdf
+
+
+def _check_envelope(m,short_name,t,vals,start,stop,width):
+    bins,mins,maxs,means = m.get_overview(short_name,start=start,stop=stop,width=width)
+    assert len(bins) == width
+    mask = (t >= start) & (t <= stop)
+    assert np.nanmin(mins) == vals[mask].min()
+    assert np.nanmax(maxs) == vals[mask].max()
+
+
+@pytest.mark.parametrize("start,stop,width",[(0.0,49.99,10),(0.0,49.99,4000),(1.0,1.2,100)])
+def test_overview(make_mdf,start,stop,width):
+    fname,expected = make_mdf(n=5000)
+    m = mdf(fname)
+    _check_envelope(m,"Speed",expected["time"],expected["Speed"]*0.1,start,stop,width)
+
+
+@pytest.mark.parametrize("start,stop,width",[(0.0,49.99,10),(1.0,1.2,100)])
+def test_overview_text_table(make_mdf,start,stop,width):
+    #the physical values of a text table are strings, the envelope is drawn from the stored values
+    fname,expected = make_mdf(n=5000,speed_table={0:"zero",1:"one"})
+    m = mdf(fname)
+    assert m.get_columns(["Speed"])["Speed"][1].dtype.kind == "O"
+    _check_envelope(m,"Speed",expected["time"],expected["Speed"],start,stop,width)
+
+
+def test_overview_of_strings_raises(make_mdf):
+    fname,expected = make_mdf()
+    m = mdf(fname)
+    m.derive("Label","where(Temp>0,'hi','lo')",engine="numpy")
+    with pytest.raises(ValueError):
+        m.get_overview("Label")
+    #the other channels of the data group still have an overview
+    assert len(m.get_overview("Temp",width=10)[0]) == 10
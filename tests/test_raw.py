@@ -0,0 +1,73 @@
+# test_raw.py
+
+import datetime
+
+import numpy as np
+import pytest
+
+from mdfminer.mdf import mdf
+
+from conftest import build_can_mdf
+
+
+SPEED_TABLE = {0:"zero",2:"two",4:"four"}
+
+
+@pytest.mark.parametrize("bord",["little","big"])
+def test_raw_and_physical_columns(make_mdf,bord):
+    fname,expected = make_mdf(n=500,bord=bord)
+    m = mdf(fname)
+    raw = m.get_columns(["Speed","Temp"],raw=True)
+    phys = m.get_columns(["Speed","Temp"])
+    #the stored types in native byte order, timestamps are physical in both modes
+    assert raw["Speed"][1].dtype == np.dtype(np.uint16)
+    assert raw["Temp"][1].dtype == np.dtype(np.float32)
+    assert np.array_equal(raw["Speed"][1],expected["Speed"])
+    assert np.array_equal(raw["Temp"][1],expected["Temp"])
+    assert np.array_equal(raw["Speed"][0],phys["Speed"][0])
+    assert np.allclose(raw["Speed"][0],expected["time"])
+    for short_name in ["Speed","Temp"]:
+        ch = m.get_channel_by_short_name(short_name)
+        assert np.array_equal(ch.convert(raw[short_name][1]),phys[short_name][1])
+        assert np.array_equal(ch.convert(raw[short_name][1].tolist()),phys[short_name][1])
+        assert np.array_equal(m.channel(short_name,raw=True),raw[short_name][1])
+    assert np.allclose(phys["Temp"][1],expected["Temp"]*0.5+1.0)
+    chunks = list(m.iter_columns(["Speed"],start=1.0,stop=2.0,chunk_size=30,raw=True))
+    assert np.array_equal(np.concatenate([vals[0] for t,vals in chunks]),expected["Speed"][100:201])
+
+
+def test_raw_and_physical_records(make_mdf):
+    fname,expected = make_mdf(n=50)
+    m = mdf(fname)
+    raw = [list(rec.items())[0] for rec in m.get_records_with_timestamp(raw=True)]
+    phys = [list(rec.items())[0] for rec in m.get_records_with_timestamp()]
+    assert [t for t,vals in raw] == [t for t,vals in phys] == [datetime.timedelta(seconds=t) for t in expected["time"]]
+    assert [vals[0] for t,vals in raw] == expected["Speed"].tolist()
+    assert [vals[1] for t,vals in raw] == expected["Temp"].tolist()
+    for idx,short_name in enumerate(["Speed","Temp"]):
+        ch = m.get_channel_by_short_name(short_name)
+        assert np.allclose(ch.convert([vals[idx] for t,vals in raw]),[vals[idx] for t,vals in phys])
+
+
+def test_raw_text_table(make_mdf):
+    fname,expected = make_mdf(n=6,speed_table=SPEED_TABLE)
+    m = mdf(fname)
+    t,raw = m.get_columns(["Speed"],raw=True)["Speed"]
+    t,phys = m.get_columns(["Speed"])["Speed"]
+    #values without a text stay numbers
+    assert raw.tolist() == [0,1,2,3,4,5]
+    assert phys.tolist() == ["zero",1,"two",3,"four",5]
+    assert m.get_channel_by_short_name("Speed").convert(raw).tolist() == phys.tolist()
+    records = [list(rec.values())[0][0] for rec in m.get_records_with_timestamp()]
+    assert records == phys.tolist()
+
+
+def test_convert_without_conversion(tmp_path):
+    data,expected = build_can_mdf(n=20)
+    fname = str(tmp_path / "can.mdf")
+    with open(fname,"wb") as f:
+        f.write(data)
+    m = mdf(fname)
+    raw = m.channel("Brake",raw=True)
+    assert np.array_equal(m.get_channel_by_short_name("Brake").convert(raw),raw)
+    assert np.array_equal(m.channel("Brake"),raw)
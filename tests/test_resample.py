@@ -0,0 +1,78 @@
+# test_resample.py
+
+import numpy as np
+import pytest
+
+from mdfminer.mdf import mdf,change_column,_align_column
+
+from conftest import build_can_mdf,CAN_MESSAGES
+
+
+T = np.array([0.0,1.0,2.0,3.0])
+TT = np.array([-0.5,0.0,0.4,0.6,1.5,3.0,3.5])
+
+
+@pytest.mark.parametrize("method,expected",[("previous",[np.nan,10,10,10,20,40,40]),
+                                            ("linear",[np.nan,10,14,16,25,40,np.nan]),
+                                            ("nearest",[10,10,10,20,20,40,40]),#a tie takes the earlier sample
+                                            ])
+def test_align_column(method,expected):
+    vals = np.array([10,20,30,40],dtype=np.uint16)
+    ret = _align_column(T,vals,TT,method)
+    assert np.allclose(ret,expected,equal_nan=True)
+    assert np.allclose(_align_column(T,change_column.from_values(T,vals),TT,method),expected,equal_nan=True)
+
+
+@pytest.mark.parametrize("method,expected",[("previous",[None,"a","a","a","b","d","d"]),
+                                            ("linear",[None,"a","a","a","b","d","d"]),#text is held, not interpolated
+                                            ("nearest",["a","a","a","b","b","d","d"]),
+                                            ])
+def test_align_text_column(method,expected):
+    vals = np.array(["a","b","c","d"],dtype=object)
+    assert _align_column(T,vals,TT,method).tolist() == expected
+
+
+@pytest.mark.parametrize("method",["previous","linear","nearest"])
+def test_align_empty_column(method):
+    ret = _align_column(np.empty(0),np.empty(0),TT,method)
+    assert len(ret) == len(TT)
+    assert np.isnan(ret).all()
+
+
+def test_align_unknown_method():
+    with pytest.raises(ValueError):
+        _align_column(T,np.arange(4.0),TT,"cubic")
+
+
+@pytest.fixture
+def can_mdf(tmp_path):
+    data,expected = build_can_mdf(n=300)
+    fname = str(tmp_path / "can.mdf")
+    with open(fname,"wb") as f:
+        f.write(data)
+    return mdf(fname),{short_name:(cols["time"],cols[short_name].astype(np.float64))
+                       for key,cols in expected.items() for short_name in cols if short_name in ["Speed_FL","Brake"]}
+
+
+@pytest.mark.parametrize("method",["previous","linear","nearest"])
+def test_resample_raster(can_mdf,method):
+    m,expected = can_mdf
+    t,table = m.resample(["Brake","Speed_FL"],raster=0.007,method=method,chunk_size=50)
+    #the raster spans all groups, Brake starts 5 ms after Speed_FL and ends later
+    strt = expected["Speed_FL"][0][0]
+    stp = expected["Brake"][0][-1]
+    assert np.allclose(t,strt+np.arange(int(np.floor((stp-strt)/0.007))+1)*0.007)
+    assert table.shape == (len(t),2)
+    for idx,short_name in enumerate(["Brake","Speed_FL"]):
+        assert np.allclose(table[:,idx],_align_column(expected[short_name][0],expected[short_name][1],t,method),equal_nan=True)
+
+
+def test_resample_reference_channel(can_mdf):
+    m,expected = can_mdf
+    t,table = m.resample(["Speed_FL"],reference_channel="Brake",method="linear",chunk_size=64)
+    assert np.allclose(t,expected["Brake"][0])
+    assert np.allclose(table[:,0],_align_column(expected["Speed_FL"][0],expected["Speed_FL"][1],t,"linear"),equal_nan=True)
+    chunks = list(m.iter_resample(["Speed_FL","Brake"],reference_channel="Brake",chunk_size=64))
+    assert [len(tt) for tt,table in chunks] == [64,64,64,64,44]
+    with pytest.raises(ValueError):
+        m.resample(["Speed_FL"],raster=0.01,reference_channel="Brake")
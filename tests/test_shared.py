@@ -0,0 +1,116 @@
+# test_shared.py
+
+import os
+import sys
+import json
+import uuid
+import struct
+import threading
+import subprocess
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+import mdfminer
+from mdfminer.mdf import mdf
+from mdfminer.shared import share_columns,shared_columns,remove_shared_columns,_HEADER,STATE_DECODING,STATE_READY
+
+
+CONSUMER = """
+import sys, json
+from mdfminer.shared import shared_columns
+with shared_columns(sys.argv[1],timeout=10) as columns:
+    t,speed = columns.get_column("Speed")
+    print(json.dumps({"time":t.tolist(),"Speed":speed.tolist(),"info":columns.get_channel_info("Speed")}))
+"""
+
+
+def _references(store):
+    return _HEADER.unpack_from(store.shm.buf,0)[0]
+
+
+def _exists(name):
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    shm.close()
+    return True
+
+
+@pytest.fixture
+def store(make_mdf):
+    fname,expected = make_mdf(n=500)
+    store = share_columns(mdf(fname),short_names=["Speed","Temp"],name="mdfminer_{0}".format(uuid.uuid4().hex[:12]))
+    yield store,expected
+    store.close()
+    if _exists(store.name):
+        remove_shared_columns(store.name)
+
+
+def test_share_columns(store):
+    store,expected = store
+    assert _references(store) == 1
+    assert store.get_channel_short_names() == ["Speed","Temp"]
+    t,speed = store.get_column("Speed")
+    assert np.allclose(t,expected["time"])
+    assert np.allclose(speed,expected["Speed"]*0.1)
+    assert not speed.flags.writeable
+    assert store.get_channel_info("Temp")["unit"] == "degC"
+
+
+def test_attach_from_subprocess(store):
+    store,expected = store
+    env = dict(os.environ,PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(mdfminer.__file__))))
+    out = subprocess.run([sys.executable,"-c",CONSUMER,store.name],env=env,capture_output=True,check=True,timeout=60).stdout
+    result = json.loads(out.decode())
+    assert np.allclose(result["time"],expected["time"])
+    assert np.allclose(result["Speed"],expected["Speed"]*0.1)
+    assert result["info"]["unit"] == "km/h"
+    #the consumer closed its reference
+    assert _references(store) == 1
+
+
+def test_references_and_unlink(store):
+    store,expected = store
+    consumer = shared_columns(store.name)
+    assert _references(store) == 2
+    t,temp = consumer.get_column("Temp")
+    assert np.allclose(temp,expected["Temp"]*0.5+1.0)
+    del t,temp
+    consumer.close()
+    consumer.close()
+    assert _references(store) == 1
+    assert _exists(store.name)
+    name = store.name
+    store.close()
+    assert not _exists(name)
+    with pytest.raises(FileNotFoundError):
+        shared_columns(name)
+
+
+def test_attach_waits_until_ready(store):
+    store,expected = store
+    #pretend the creator still decodes
+    struct.pack_into("<q",store.shm.buf,16,STATE_DECODING)
+    with pytest.raises(TimeoutError):
+        shared_columns(store.name,timeout=0.1)
+    assert _references(store) == 1
+    timer = threading.Timer(0.2,lambda:struct.pack_into("<q",store.shm.buf,16,STATE_READY))
+    timer.start()
+    with shared_columns(store.name,timeout=10,poll_interval=0.01) as consumer:
+        assert _references(store) == 2
+        assert consumer.get_channel_short_names() == ["Speed","Temp"]
+    timer.join()
+
+
+def test_remove_leaked_segment(store):
+    store,expected = store
+    #a consumer that exits without close() leaves its reference behind
+    leaked = shared_columns(store.name)
+    store.close()
+    assert _exists(store.name)
+    remove_shared_columns(store.name)
+    assert not _exists(store.name)
+    leaked.close()
@@ -0,0 +1,130 @@
+# test_sources.py
+
+import io
+import os
+import bz2
+import gzip
+import lzma
+import struct
+import random
+
+import numpy as np
+import pytest
+
+from mdfminer import sources
+from mdfminer.mdf import mdf
+
+from conftest import build_mdf
+
+
+@pytest.fixture
+def small_checkpoints(monkeypatch):
+    monkeypatch.setattr(sources,"CHECKPOINT_INTERVAL",64*1024)
+    monkeypatch.setattr(sources,"INPUT_BLOCK_SIZE",4*1024)
+
+
+def _text(size):
+    #compressible, but not so much that bz2 blocks get large
+    rnd = random.Random(1)
+    words = [bytes(rnd.choice(b"abcdefghij") for idx in range(rnd.randint(1,8))) for word in range(500)]
+    return b" ".join(rnd.choice(words) for idx in range(size//5))[:size]
+
+
+def _xz_streams(data,size=100*1024):
+    return b"".join(lzma.compress(data[idx:idx+size]) for idx in range(0,len(data),size))
+
+
+def _bz2_streams(data):
+    return bz2.compress(data[:len(data)//3],1)+bz2.compress(data[len(data)//3:],1)
+
+
+def _check_reads(f,data):
+    assert f.read() == data
+    for offset in [len(data)-10,300*1024,10,200*1024]:
+        f.seek(offset)
+        assert f.read(1000) == data[offset:offset+1000]
+    assert f.seek(0,io.SEEK_END) == len(data)
+
+
+def test_gzip_checkpoints(tmp_path,small_checkpoints):
+    data = os.urandom(64*1024)*8
+    fname = str(tmp_path / "test.mdf.gz")
+    with open(fname,"wb") as f:
+        f.write(gzip.compress(data))
+    with sources.open_source(fname) as f:
+        _check_reads(f,data)
+        assert len(f.index.checkpoints) > 1
+
+
+def test_single_block_xz_streams(tmp_path,small_checkpoints):
+    data = os.urandom(64*1024)*8
+    fname = str(tmp_path / "test.mdf.xz")
+    with open(fname,"wb") as f:
+        f.write(lzma.compress(data))
+    with sources.open_source(fname) as f:
+        assert isinstance(f,sources.compressed_file)
+        _check_reads(f,data)
+
+
+@pytest.mark.parametrize("suffix,compress",[(".xz",_xz_streams),(".bz2",lambda data: bz2.compress(data,1)),(".bz2",_bz2_streams)])
+def test_block_index(tmp_path,suffix,compress):
+    data = _text(1024*1024)
+    fname = str(tmp_path / ("test.mdf"+suffix))
+    with open(fname,"wb") as f:
+        f.write(compress(data))
+    with sources.open_source(fname) as f:
+        assert isinstance(f,sources.block_file)
+        assert len(f.index.blocks) > 2
+        _check_reads(f,data)
+
+
+def test_bz2_false_block_boundary(tmp_path):
+    data = _text(512*1024)
+    fname = str(tmp_path / "test.mdf.bz2")
+    with open(fname,"wb") as f:
+        f.write(bz2.compress(data,1))
+    index = sources._build_bz2_index(fname,(os.path.getsize(fname),0))
+    #split the first block in two as if its data contained the block magic number
+    start,size,uncompressed_size = index.blocks[0]
+    index.blocks[0:1] = [(start,size//2,None),(start+(size//2),size-(size//2),None)]
+    f = sources.block_file(fname=fname,index=index)
+    assert f.read() == data
+    assert len(index.starts) == len(index.blocks)+1
+
+
+def test_zstd_seek_table():
+    frames = [(b"\x28\xb5\x2f\xfd"+bytes(size-4),uncompressed_size) for size,uncompressed_size in [(20,100),(30,200),(25,50)]]
+    table = b"".join(struct.pack("<III",len(frame),uncompressed_size,0) for frame,uncompressed_size in frames)
+    table += struct.pack("<IBI",len(frames),0x80,0x8F92EAB1)
+    data = b"".join(frame for frame,uncompressed_size in frames)+struct.pack("<II",0x184D2A5E,len(table))+table
+    assert sources._read_zstd_seek_table(io.BytesIO(data)) == [(0,20,100),(20,30,200),(50,25,50)]
+    assert sources._read_zstd_seek_table(io.BytesIO(data[:-1]+b"\x00")) is None
+
+
+@pytest.mark.parametrize("suffix,compress",[(".xz",_xz_streams),(".bz2",lambda data: bz2.compress(data,1))])
+def test_compressed_mdf_decodes_blocks_once(tmp_path,monkeypatch,suffix,compress):
+    data,expected = build_mdf(n=100000)
+    fname = str(tmp_path / ("test.mdf"+suffix))
+    with open(fname,"wb") as f:
+        f.write(compress(data))
+    m = mdf(fname)
+    index = sources._get_seek_index(fname)
+    decoded = []
+    decode = index.decode
+    monkeypatch.setattr(index,"decode",lambda f,block: decoded.append(block) or decode(f,block))
+    for start,stop in [(900.0,901.0),(10.0,12.0),(500.0,500.5)]:
+        t,vals = m.get_columns(["Speed"],start=start,stop=stop)["Speed"]
+        sel = (expected["time"] >= start-1e-9) & (expected["time"] <= stop+1e-9)
+        assert np.allclose(vals,expected["Speed"][sel]*0.1)
+    #the binary searches and backward seeks reuse decompressed blocks
+    assert len(decoded) <= len(index.blocks)
+
+
+def test_seek_indexes_are_bounded(tmp_path,monkeypatch):
+    monkeypatch.setattr(sources,"SEEK_INDEX_CACHE_SIZE",2)
+    for idx in range(4):
+        fname = str(tmp_path / "test{0}.mdf.gz".format(idx))
+        with open(fname,"wb") as f:
+            f.write(gzip.compress(b"data"))
+        sources.open_source(fname).close()
+    assert len(sources._seek_indexes) <= 2
@@ -0,0 +1,118 @@
+# test_sqlite.py
+
+import json
+import sqlite3
+
+import numpy as np
+
+from mdfminer.mdf import mdf
+from mdfminer.mdftools import to_sqlite
+
+from conftest import build_record_mdf
+
+
+def _query(db,sql,args=()):
+    with sqlite3.connect(db) as connection:
+        return connection.execute(sql,args).fetchall()
+
+
+def _columns(db,table):
+    return [row[1] for row in _query(db,"PRAGMA table_info({0})".format(table))]
+
+
+def test_to_sqlite_wide(make_mdf,tmp_path):
+    fname,expected = make_mdf(n=300)
+    db = str(tmp_path / "wide.db")
+    assert to_sqlite(mdf(fname),db,short_names=["Speed","Temp"],chunk_size=70) == 300
+    assert _columns(db,"group_0") == ["time","Speed","Temp"]
+    rows = np.array(_query(db,"SELECT time,Speed,Temp FROM group_0 ORDER BY rowid"))
+    assert np.allclose(rows[:,0],expected["time"])
+    assert np.allclose(rows[:,1],expected["Speed"]*0.1)
+    assert np.allclose(rows[:,2],expected["Temp"]*0.5+1.0)
+    channels = _query(db,"SELECT short_name,column_name,unit,conversion,data_group,signal_data_type,number_of_bits,sqlite_type "
+                         "FROM channels WHERE table_name = 'group_0' ORDER BY id")
+    assert [row[:3] for row in channels] == [("Speed","Speed","km/h"),("Temp","Temp","degC")]
+    assert json.loads(channels[0][3]) == {"type":"parametric,linear","parameters":[0.0,0.1]}
+    assert [row[4:] for row in channels] == [(0,0,16,"REAL"),(0,2,32,"REAL")]
+
+
+def test_to_sqlite_long(make_mdf,tmp_path):
+    fname,expected = make_mdf(n=300)
+    db = str(tmp_path / "long.db")
+    assert to_sqlite(mdf(fname),db,short_names=["Speed","Temp"],layout="long",raw=True,chunk_size=70) == 600
+    assert _columns(db,"group_0") == ["time","channel_id","value"]
+    ids = dict(_query(db,"SELECT short_name,id FROM channels WHERE table_name = 'group_0'"))
+    assert _query(db,"SELECT column_name FROM channels") == [(None,),(None,)]
+    rows = _query(db,"SELECT time,value,typeof(value) FROM group_0 WHERE channel_id = ? ORDER BY time",(ids["Speed"],))
+    assert np.allclose([row[0] for row in rows],expected["time"])
+    assert [row[1] for row in rows] == expected["Speed"].tolist()
+    assert set([row[2] for row in rows]) == set(["integer"])
+    rows = _query(db,"SELECT value,typeof(value) FROM group_0 WHERE channel_id = ? ORDER BY time",(ids["Temp"],))
+    assert np.allclose([row[0] for row in rows],expected["Temp"])
+    assert set([row[1] for row in rows]) == set(["real"])
+    indexes = _query(db,"SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'group_0'")
+    assert indexes == [("group_0_channel_time",)]
+
+
+def test_to_sqlite_types(tmp_path):
+    #unsigned integer, float, string and byte array
+    channels = [("time","time",0,64,3),("count","data",64,16,0),("level","data",80,32,2),("label","data",112,32,7),
+                ("payload","data",144,16,8)]
+    n = 20
+    records = np.zeros((n,20),dtype=np.uint8)
+    records[:,:8] = (np.arange(n)*0.1).view(np.uint8).reshape(n,8)
+    records[:,8:10] = np.arange(n,dtype="<u2").view(np.uint8).reshape(n,2)
+    records[:,10:14] = (np.arange(n,dtype="<f4")/4).view(np.uint8).reshape(n,4)
+    records[:,14:17] = np.frombuffer(b"".join([b"L%02d" % idx for idx in range(n)]),dtype=np.uint8).reshape(n,3)
+    records[:,18:20] = np.arange(n,dtype=">u2").view(np.uint8).reshape(n,2)
+    fname = str(tmp_path / "types.mdf")
+    with open(fname,"wb") as f:
+        f.write(build_record_mdf(channels,records))
+    db = str(tmp_path / "types.db")
+    assert to_sqlite(mdf(fname),db,short_names=["count","level","label","payload"]) == n
+    assert _query(db,"SELECT short_name,sqlite_type FROM channels ORDER BY id") == [("count","INTEGER"),("level","REAL"),
+                                                                                   ("label","TEXT"),("payload","BLOB")]
+    assert [row[2] for row in _query(db,"PRAGMA table_info(group_0)")] == ["REAL","INTEGER","REAL","TEXT","BLOB"]
+    rows = _query(db,"SELECT count,typeof(count),level,typeof(level),label,typeof(label),payload,typeof(payload) FROM group_0 ORDER BY rowid")
+    assert [row[0] for row in rows] == list(range(n))
+    assert [row[2] for row in rows] == (np.arange(n)/4).tolist()
+    assert [row[4] for row in rows] == ["L%02d" % idx for idx in range(n)]
+    assert [row[6] for row in rows] == [idx.to_bytes(2,'big') for idx in range(n)]
+    assert set([row[1::2] for row in rows]) == set([("integer","real","text","blob")])
+
+
+def test_to_sqlite_duplicate_names(tmp_path):
+    #the second Speed repeats the first name, speed and Time only differ from a column in case
+    channels = [("time","time",0,64,3),("Speed","data",64,16,0),("speed","data",80,16,0),("Speed","data",96,16,0),
+                ("Time","data",112,16,0)]
+    n = 10
+    records = np.zeros((n,16),dtype=np.uint8)
+    records[:,:8] = (np.arange(n)*0.1).view(np.uint8).reshape(n,8)
+    for idx in range(4):
+        records[:,8+2*idx:10+2*idx] = (np.arange(n,dtype="<u2")+100*idx).view(np.uint8).reshape(n,2)
+    fname = str(tmp_path / "names.mdf")
+    with open(fname,"wb") as f:
+        f.write(build_record_mdf(channels,records))
+    m = mdf(fname)
+    db = str(tmp_path / "names.db")
+    assert to_sqlite(m,db) == n
+    assert _columns(db,"group_0") == ["time","Speed","speed_2","Time_2"]
+    assert _query(db,"SELECT short_name,column_name FROM channels ORDER BY id") == [("Speed","Speed"),("speed","speed_2"),("Time","Time_2")]
+    rows = _query(db,'SELECT "Speed","speed_2","Time_2" FROM group_0 ORDER BY rowid')
+    assert rows == [(idx,idx+100,idx+300) for idx in range(n)]
+
+
+def test_to_sqlite_replaces_tables(make_mdf,tmp_path):
+    fname,expected = make_mdf(n=300)
+    m = mdf(fname)
+    db = str(tmp_path / "replace.db")
+    to_sqlite(m,db,short_names=["Speed","Temp"])
+    assert to_sqlite(m,db,short_names=["Temp"],start=1.0,stop=1.99,layout="long") == 100
+    assert _columns(db,"group_0") == ["time","channel_id","value"]
+    assert _query(db,"SELECT short_name FROM channels WHERE table_name = 'group_0'") == [("Temp",)]
+    rows = _query(db,"SELECT time FROM group_0 ORDER BY time")
+    assert np.allclose([row[0] for row in rows],expected["time"][100:200])
+    to_sqlite(m,db,short_names=["Speed"])
+    assert _columns(db,"group_0") == ["time","Speed"]
+    assert _query(db,"SELECT count(*) FROM group_0") == [(300,)]
+    assert _query(db,"SELECT count(*) FROM channels") == [(1,)]
@@ -0,0 +1,88 @@
+# test_statistics.py
+
+import numpy as np
+import pytest
+
+from mdfminer.mdf import mdf,channel_statistics
+
+
+def _results(stats):
+    ret = stats.get_results()
+    counts,edges = ret.pop("histogram")
+    return ret,counts,edges
+
+
+@pytest.mark.parametrize("vals",[[-61.28,41.5656558,0.1],[-10.0,0.1,-3.0],[5.0,5.0],[0.0,1.0,2.0,3.0]])
+def test_histogram_covers_values(vals):
+    vals = np.array(vals)
+    stats = channel_statistics(histogram_bins=10)
+    stats.update(vals)
+    ret,counts,edges = _results(stats)
+    assert edges[0] <= vals.min()
+    assert edges[-1] > vals.max()
+    assert len(counts) == 10
+    assert np.array_equal(counts,np.histogram(vals,bins=edges)[0])
+    if vals.max() > vals.min():
+        #the range is not doubled without a value outside
+        assert edges[-1]-edges[0] < 4*(vals.max()-vals.min())
+
+
+def test_histogram_widens_on_values_outside():
+    stats = channel_statistics(histogram_bins=4)
+    stats.update(np.array([0.0,1.0]))
+    stats.update(np.array([1.0]))
+    edges = stats.edges.copy()
+    stats.update(np.array([1.5]))
+    assert np.array_equal(stats.edges,edges)
+    stats.update(np.array([9.0]))
+    assert stats.edges[-1] > 9.0
+    assert np.array_equal(stats.histogram,np.histogram([0.0,1.0,1.0,1.5,9.0],bins=stats.edges)[0])
+
+
+@pytest.mark.parametrize("bins",[8,5])
+def test_histogram_merge_matches_single_pass(bins):
+    vals = np.linspace(-3.3,7.7,1001)
+    single = channel_statistics(histogram_bins=bins)
+    single.update(vals)
+    expected,expected_counts,expected_edges = _results(single)
+    for splits in [[500],[1,2,3],[100,900,1000],[0]]:
+        parts = [channel_statistics(histogram_bins=bins) for idx in range(len(splits)+1)]
+        for part,part_vals in zip(parts,np.split(vals,splits)):
+            part.update(part_vals)
+        merged = parts[-1]
+        for part in parts[:-1]:
+            merged.merge(part)
+        ret,counts,edges = _results(merged)
+        assert np.array_equal(edges,expected_edges)
+        assert np.array_equal(counts,expected_counts)
+        assert ret["count"] == expected["count"]
+        assert ret["min"] == expected["min"] and ret["max"] == expected["max"]
+        assert np.isclose(ret["mean"],expected["mean"])
+        assert np.isclose(ret["std"],expected["std"])
+
+
+def test_histogram_chunks_match_single_pass():
+    vals = np.random.default_rng(0).normal(size=10000)
+    single = channel_statistics(histogram_bins=16)
+    single.update(vals)
+    chunked = channel_statistics(histogram_bins=16)
+    for chunk in np.array_split(vals,37):
+        chunked.update(chunk)
+    assert np.array_equal(chunked.edges,single.edges)
+    assert np.array_equal(chunked.histogram,single.histogram)
+
+
+@pytest.mark.parametrize("bins",[0,-2])
+def test_histogram_bins_must_be_positive(bins):
+    with pytest.raises(ValueError):
+        channel_statistics(histogram_bins=bins)
+
+
+def test_describe(make_mdf):
+    fname,expected = make_mdf()
+    results = mdf(fname).describe(["Speed"],histogram_bins=10)
+    vals = expected["Speed"]*0.1
+    assert results["Speed"]["count"] == len(vals)
+    assert np.isclose(results["Speed"]["mean"],vals.mean())
+    counts,edges = results["Speed"]["histogram"]
+    assert np.array_equal(counts,np.histogram(vals,bins=edges)[0])
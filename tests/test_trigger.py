@@ -0,0 +1,52 @@
+# test_trigger.py
+
+import numpy as np
+import pytest
+
+from mdfminer.mdf import mdf,_build_tr_block,_interpret_tr_block
+
+
+#the second event is stored before the first, the third starts before the measurement, the last is after its end
+TRIGGER_EVENTS = [{"trigger_time":6.0,"pre_trigger_time":0.5,"post_trigger_time":0.25},
+                  {"trigger_time":2.0,"pre_trigger_time":0.1,"post_trigger_time":0.2},
+                  {"trigger_time":0.05,"pre_trigger_time":1.0,"post_trigger_time":0.1},
+                  {"trigger_time":20.0,"pre_trigger_time":0.5,"post_trigger_time":0.5},
+                  ]
+
+
+@pytest.mark.parametrize("bord",["little","big"])
+def test_interpret_tr_block(bord):
+    data = _build_tr_block(0x1234,TRIGGER_EVENTS,bord=bord)
+    tr = _interpret_tr_block(data,bord=bord)
+    assert tr["comment_text_pointer"] == 0x1234
+    assert tr["number_of_trigger_events"] == len(TRIGGER_EVENTS)
+    assert tr["trigger_events"] == TRIGGER_EVENTS
+
+
+@pytest.mark.parametrize("bord",["little","big"])
+def test_extract_trigger_windows(make_mdf,bord):
+    fname,expected = make_mdf(n=1000,bord=bord,trigger_events=TRIGGER_EVENTS)
+    m = mdf(fname,instrument=True)
+    assert m.get_trigger_events() == sorted(TRIGGER_EVENTS,key=lambda tev:tev["trigger_time"])
+    windows = m.extract_trigger_windows(["Speed","Temp"],raw=True)
+    assert [window["trigger_time"] for window in windows] == [0.05,2.0,6.0,20.0]
+    decoded = 0
+    for window in windows:
+        strt = window["trigger_time"]-window["pre_trigger_time"]
+        stp = window["trigger_time"]+window["post_trigger_time"]
+        sel = (expected["time"] >= strt-1e-9) & (expected["time"] <= stp+1e-9)
+        decoded += sel.sum()
+        for short_name in ["Speed","Temp"]:
+            t,vals = window["channels"][short_name]
+            assert np.allclose(t,expected["time"][sel])
+            assert np.array_equal(vals,expected[short_name][sel])
+    assert [len(window["channels"]["Speed"][0]) for window in windows] == [16,31,76,0]
+    #only the windows are decoded, not the whole measurement
+    assert m.stats()["records_decoded"] < 2*decoded
+
+
+def test_no_trigger_block(make_mdf):
+    fname,expected = make_mdf()
+    m = mdf(fname)
+    assert m.get_trigger_events() == []
+    assert m.extract_trigger_windows(["Speed"]) == []